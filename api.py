@@ -1,18 +1,128 @@
-from fastapi import FastAPI, UploadFile, File
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse, Response, PlainTextResponse
 from pydantic import BaseModel, StrictInt, StrictFloat
-import joblib
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Literal
+import asyncio
+import functools
+import numpy as np
 import io
+import itertools
+import multiprocessing
+import os
+import threading
+from config import (CSV_CHUNK_ROWS, PREDICT_BATCH_MAX_SIZE, PREDICT_BATCH_MAX_WAIT_US, PREDICT_QUEUE_DEPTH,
+                    MODEL_REGISTRY_STATE_PATH, MODEL_REGISTRY_DIR, MODEL_REGISTRY_POLL_S,
+                    MODEL_SHADOW_MAX_PENDING, PREDICTION_CACHE_ENABLED, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_S,
+                    PREDICTION_CACHE_QUANTIZATION, FLOW_IDLE_TIMEOUT_S, FLOW_ACTIVE_TIMEOUT_S, FLOW_BATCH_SIZE,
+                    JOB_DIR, JOB_WORKERS, JOB_CHUNK_ROWS, JOB_MAX_IN_FLIGHT, JOB_TTL_S, JOB_RESULTS_MAX_ROWS,
+                    JOB_HEARTBEAT_S, JOB_STALE_S,
+                    PROFILER_ENABLED, PROFILER_INTERVAL_MS, PROFILER_MAX_DURATION_S,
+                    VALIDATION_MODE, VALIDATION_MAX_ERRORS, FEATURE_BOUNDS, GZIP_REQUEST_MAX_BYTES)
+from model_utils import predict_probs, decode_probs, build_results, build_columnar
+import metrics
+from metrics import stage, record_predictions, record_prediction
+from profiler import SamplingProfiler
+from model_registry import ModelRegistry, ModelVersionError, ModelVersionNotFoundError
+from serialization import dumps, FastJSONResponse
+from gzip_request import GzipRequestMiddleware, GzipBodyError, GzipBodyTooLargeError
+from validation import to_matrix, validate_matrix
+from batching import MicroBatcher, QueueFullError
+from prediction_cache import PredictionCache
+from jobs import JobManager, JobNotFoundError, init_worker, score_chunk
+from flow_meter import FlowMeter, PcapFormatError, read_pcap, classify_flows
+from batch_formats import (BATCH_CONTENT_TYPES, PREDICTIONS_CONTENT_TYPE, ARROW_STREAM_CONTENT_TYPE,
+                           BatchFormatError, decode_batch, encode_predictions, encode_arrow_predictions)
 
-# Загрузка пайплайна (модель, список признаков, энкодер)
-bundle = joblib.load("model/xgb_pipeline_bundle.pkl")
-model = bundle["model"]
-selected_features = bundle["selected_features"]
-label_encoder = bundle["label_encoder"]
+# Версии пайплайна (модель, список признаков, энкодер) загружаются реестром в load_model при старте
+# приложения, а не при импорте модуля: pandas, joblib и xgboost не попадают в путь импорта api.py.
+# selected_features — схема признаков API (порядок признаков первой загруженной версии),
+# все версии в реестре принимают признаки в этом порядке
+selected_features = None
+load_error = None
+_load_lock = threading.Lock()
+
+def load_model():
+    '''
+    Загружает пайплайн и готовит его к работе через реестр версий (model_registry.py):
+
+    1. Если рядом есть хранилище из model_store.py, таблица узлов отображается в память
+    и делится между воркерами, а pickle не разбирается; иначе загружается бандл
+    2. Создаем бэкенд инференса (config.MODEL_BACKEND, для хранилища — MODEL_STORE_BACKEND)
+    и быстрый путь без pandas
+    3. Делаем прогревочное предсказание, чтобы первый запрос не платил за ленивую инициализацию
+    4. Запускаем фоновую сверку с файлом состояния реестра: новые версии загружаются
+    и подменяются без перезапуска воркера
+
+    Повторные вызовы ничего не делают. Возвращает время загрузки основной версии в секундах
+    '''
+    global selected_features, load_error
+
+    with _load_lock:
+        if registry.routing is not None:
+            return registry.primary.load_time
+
+        try:
+            registry.start()
+        except Exception as e:
+            load_error = str(e)
+            raise
+
+        selected_features = registry.features
+        metrics.MODEL_READY.set(1)
+        load_error = None
+        return registry.primary.load_time
+
+def create_prediction_cache(features):
+    '''
+    Необязательный кэш предсказаний перед моделью (config.PREDICTION_CACHE_*), свой у каждой версии
+    '''
+    if not PREDICTION_CACHE_ENABLED:
+        return None
+    return PredictionCache(features,
+                           max_size=PREDICTION_CACHE_SIZE,
+                           ttl_s=PREDICTION_CACHE_TTL_S,
+                           quantization=PREDICTION_CACHE_QUANTIZATION)
+
+async def ensure_model():
+    '''
+    Дожидается модели в пуле потоков, если запрос пришел до конца фоновой загрузки
+    или приложение запущено без фазы старта (например, TestClient без контекстного менеджера)
+    '''
+    if registry.routing is None:
+        await run_in_threadpool(load_model)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    '''
+    Фаза старта: модель загружается и прогревается в фоне, воркер уже отвечает /health,
+    а /ready возвращает 200 только после прогрева. Задания, прерванные перезапуском воркера,
+    помечаются failed (и удаляются через JOB_TTL_S)
+    '''
+    loading = asyncio.create_task(run_in_threadpool(load_model))
+    await run_in_threadpool(job_manager.cleanup_expired)
+    yield
+    await asyncio.gather(loading, return_exceptions=True)
+    registry.stop()
+    job_manager.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+# Тела загрузок с Content-Encoding: gzip (большие CSV из интерфейса) распаковываются потоком.
+# Мидлвар добавляется первым, поэтому MetricsMiddleware остается внешним и учитывает его ответы 415
+app.add_middleware(GzipRequestMiddleware, max_size=GZIP_REQUEST_MAX_BYTES)
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.exception_handler(GzipBodyError)
+async def gzip_body_error(request: Request, e: GzipBodyError):
+    '''
+    Ошибка распаковки тела запроса при чтении в обработчике: 400 для битого gzip,
+    413, если тело после распаковки больше GZIP_REQUEST_MAX_BYTES
+    '''
+    status_code = 413 if isinstance(e, GzipBodyTooLargeError) else 400
+    return JSONResponse(status_code=status_code, content={"error": str(e)})
 
-app = FastAPI()
 
 class InputData(BaseModel):
     '''
@@ -29,20 +139,60 @@ class InputData(BaseModel):
     Fwd_Packets_s: StrictFloat
     Fwd_IAT_Min: StrictFloat
 
-# Эндпоинт /predict_csv
-@app.post("/predict_csv")
-async def predict_csv(file: UploadFile = File(...)):
+# Соответствие полей InputData названиям признаков в модели
+FEATURE_NAMES = {"Destination_Port": "Destination Port",
+                 "Bwd_Packets_s": "Bwd Packets/s",
+                 "Fwd_IAT_Std": "Fwd IAT Std",
+                 "Flow_IAT_Min": "Flow IAT Min",
+                 "Bwd_Packet_Length_Min": "Bwd Packet Length Min",
+                 "Fwd_Packets_s": "Fwd Packets/s",
+                 "Fwd_IAT_Min": "Fwd IAT Min"}
+FIELD_NAMES = {feature: field for field, feature in FEATURE_NAMES.items()}
+
+registry = ModelRegistry(MODEL_REGISTRY_STATE_PATH,
+                         field_names=FIELD_NAMES,
+                         cache_factory=create_prediction_cache,
+                         poll_interval_s=MODEL_REGISTRY_POLL_S,
+                         shadow_max_pending=MODEL_SHADOW_MAX_PENDING)
+
+def score_rows(rows, role="primary"):
     '''
-    Функция для предсказания модели на основе данных из CSV‑файла:
+    Скоринг батча строк (признаки в порядке selected_features) одним вызовом модели.
+    role — какая версия скорит батч: основная или кандидат в режиме split.
+    Возвращает список словарей с предсказаниями для MicroBatcher
+    '''
+    routing = registry.routing
+    version = routing.candidate if role == "candidate" and routing.candidate is not None else routing.primary
+    with stage("predict_microbatch", "predict"):
+        results = version.fast_predictor.predict_rows(rows)
+    metrics.ROWS_PER_REQUEST.labels("predict_microbatch").observe(len(rows))
+    registry.shadow(rows, [result["prediction"] for result in results], version)
+    return results
 
-    1. Принимаем CSV‑файл
-    2. Проверяем расширение файла
-    3. Проверяем MIME‑тип
-    4. Проверяем, что файл не пустой
-    5. Проверяем, что все нужные признаки присутствуют
-    6. Приводим данные к типу float
+batcher = MicroBatcher(score_rows,
+                       max_batch_size=PREDICT_BATCH_MAX_SIZE,
+                       max_wait_us=PREDICT_BATCH_MAX_WAIT_US,
+                       max_queue_depth=PREDICT_QUEUE_DEPTH)
+# Запросы /predict, которые в режиме split достались кандидату, собираются в свои батчи
+candidate_batcher = MicroBatcher(functools.partial(score_rows, role="candidate"),
+                                 max_batch_size=PREDICT_BATCH_MAX_SIZE,
+                                 max_wait_us=PREDICT_BATCH_MAX_WAIT_US,
+                                 max_queue_depth=PREDICT_QUEUE_DEPTH)
+metrics.BATCHER_ROWS.set_function(lambda: batcher.in_flight + candidate_batcher.in_flight)
 
-    Возвращаем числовые метки, строковые классы, вероятности
+
+def create_job_executor():
+    '''
+    Пул процессов для фоновых заданий: каждый процесс загружает модель один раз (init_worker).
+    Контекст spawn, чтобы не копировать через fork потоки и состояние воркера uvicorn
+    '''
+    return ProcessPoolExecutor(JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=init_worker)
+
+
+def check_csv_upload(file: UploadFile):
+    '''
+    Проверяет расширение и MIME‑тип загруженного файла.
+    Возвращает JSONResponse с ошибкой или None, если файл подходит
     '''
     if not file.filename.lower().endswith(".csv"):
         return JSONResponse(
@@ -54,78 +204,652 @@ async def predict_csv(file: UploadFile = File(...)):
             status_code=400,
             content={"error": f"Неверный MIME-тип: {file.content_type}. Ожидается text/csv"})
 
-    contents = await file.read()
+    return None
+
+# Формат списка результатов: rows — объект на строку, columnar — массивы по колонкам
+ResultShape = Literal["rows", "columnar"]
+
+def format_results(labels, probs, confidences, class_names, shape):
+    '''
+    Собирает результаты в выбранном формате
+    '''
+    if shape == "columnar":
+        return build_columnar(labels, probs, confidences, class_names)
+    return build_results(labels, probs, confidences, class_names)
+
+def validate_rows(endpoint, X, not_number=None, row_offset=0, mode=None, features=None):
+    '''
+    Проверка батча признаков в порядке features (по умолчанию selected_features; validation.py)
+    с настройками VALIDATION_* и FEATURE_BOUNDS из config.py (mode — режим вместо VALIDATION_MODE).
+    Строки с ошибками учитываются в метриках.
+    Возвращает float32-матрицу для модели и отчет о проверке
+    '''
+    with stage(endpoint, "validate"):
+        X, report = validate_matrix(X, features or selected_features, FEATURE_BOUNDS, mode or VALIDATION_MODE,
+                                    VALIDATION_MAX_ERRORS, not_number, row_offset)
+    if report["rows_invalid"]:
+        metrics.INVALID_ROWS.labels(endpoint).inc(report["rows_invalid"])
+    return X, report
+
+def check_frame(endpoint, df, row_offset=0):
+    '''
+    Приводит столбцы selected_features из DataFrame к числам без исключений на нечисловых значениях
+    и проверяет батч (validate_rows)
+    '''
+    with stage(endpoint, "astype"):
+        X, not_number = to_matrix(df, selected_features)
+    return validate_rows(endpoint, X, not_number, row_offset)
+
+def validate_job_rows(X, features, not_number, row_offset):
+    '''
+    Проверка чанка фонового задания в порядке признаков версии задания (features): всегда в режиме mask,
+    чтобы результаты совпадали со строками файла 1:1, а строки с ошибками попали в отчет validation статуса
+    '''
+    return validate_rows("jobs", X, not_number, row_offset, mode="mask", features=features)
+
+job_manager = JobManager(create_job_executor, score_chunk, JOB_DIR,
+                         chunk_rows=JOB_CHUNK_ROWS, max_in_flight=JOB_MAX_IN_FLIGHT, ttl_s=JOB_TTL_S,
+                         validate_fn=validate_job_rows, max_errors=VALIDATION_MAX_ERRORS,
+                         heartbeat_s=JOB_HEARTBEAT_S, stale_s=JOB_STALE_S)
+metrics.JOBS_RUNNING.set_function(lambda: job_manager.running)
+# Сэмплирующий профилировщик воркера (/profiler)
+profiler = SamplingProfiler()
+
+
+def rejected_response(validation):
+    '''
+    Ответ 400, если в батче не осталось строк для скоринга
+    '''
+    error = "Нет строк без ошибок"
+    if validation["errors"]:
+        first = validation["errors"][0]
+        error += f", например строка {first['row']}: {first['errors']}"
+    return FastJSONResponse(status_code=400, content={"error": error, "validation": validation})
+
+def score_frame(endpoint, X, version):
+    '''
+    Скоринг проверенной матрицы признаков в порядке selected_features версией version с замером этапов
+    predict (бустер) и decode (argmax и inverse_transform).
+    Возвращает лейблы, вероятности, уверенности
+    '''
+    with stage(endpoint, "predict"):
+        probs = predict_probs(version, X)
+    with stage(endpoint, "decode"):
+        labels, confidences = decode_probs(probs, version.label_encoder)
+    record_predictions(endpoint, probs.argmax(axis=1), version.label_encoder.classes_)
+    registry.shadow(X, labels, version)
+    return labels, probs, confidences
+
+def version_headers(version):
+    '''
+    Заголовок с именем версии, которая оценила запрос (для сравнения версий в режиме split)
+    '''
+    return {"X-Model-Version": version.name}
+
+# Эндпоинт /predict_csv
+@app.post("/predict_csv")
+async def predict_csv(file: UploadFile = File(...), shape: ResultShape = "rows"):
+    '''
+    Функция для предсказания модели на основе данных из CSV‑файла:
+
+    1. Принимаем CSV‑файл
+    2. Проверяем расширение файла
+    3. Проверяем MIME‑тип
+    4. Проверяем, что файл не пустой
+    5. Проверяем, что все нужные признаки присутствуют
+    6. Приводим данные к числам и проверяем всю матрицу сразу (NaN, inf, нечисловые значения,
+    границы FEATURE_BOUNDS): строки с ошибками отбрасываются или маскируются (VALIDATION_MODE)
+
+    Возвращаем числовые метки, строковые классы, вероятности.
+    При shape=columnar results — объект с массивами classes, predictions, confidence, probabilities.
+    validation — отчет о проверке: индексы строк с ошибками (invalid_rows) и сообщения по строкам (errors)
+    '''
+    import pandas as pd
+
+    error = check_csv_upload(file)
+    if error:
+        return error
+
+    with stage("predict_csv", "upload_read"):
+        contents = await file.read()
     if not contents:
         return JSONResponse(status_code=400, content={"error": "Файл пуст или не загружен"})
 
     try:
-        df = pd.read_csv(io.BytesIO(contents))
+        await ensure_model()
+        version = registry.pick()
+        with stage("predict_csv", "read_csv"):
+            df = await run_in_threadpool(pd.read_csv, io.BytesIO(contents))
 
         if df.empty:
             return JSONResponse(status_code=400, content={"error": "CSV-файл не содержит данных"})
 
-        missing = [col for col in selected_features if col not in df.columns]
+        with stage("predict_csv", "feature_check"):
+            missing = [col for col in selected_features if col not in df.columns]
         if missing:
             return JSONResponse(status_code=400, content={"error": f"Отсутствуют признаки: {missing}"})
 
-        df = df[selected_features]
+        X, validation = await run_in_threadpool(check_frame, "predict_csv", df)
+        if not len(X):
+            return rejected_response(validation)
 
-        try:
-            df = df.astype({col: float for col in df.columns})
-        except Exception as e:
-            return JSONResponse(status_code=400, content={"error": f"Ошибка преобразования типов: {str(e)}"})
+        labels, probs, confidences = await run_in_threadpool(score_frame, "predict_csv", X, version)
+        with stage("predict_csv", "build_response"):
+            results = format_results(labels, probs, confidences, version.label_encoder.classes_, shape)
+
+        with stage("predict_csv", "serialize"):
+            return FastJSONResponse({"results": results, "validation": validation}, headers=version_headers(version))
+
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"Ошибка сервера: {str(e)}"})
+
+def stream_predictions(chunks, version, shape="rows"):
+    '''
+    Генератор NDJSON: для каждого чанка строк делает предсказание
+    и отдает по одной JSON‑строке на объект (при shape=columnar — одну строку
+    с колоночным объектом на чанк), пока следующие чанки еще не прочитаны.
+    Если в чанке есть строки с ошибками, перед его результатами отдается строка {"validation": ...}
+    с индексами этих строк от начала файла. Ошибка в середине файла отдается отдельной строкой {"error": ...}
+    '''
+    row_offset = 0
+    try:
+        for chunk in chunks:
+            X, validation = check_frame("predict_csv_stream", chunk, row_offset)
+            if validation["rows_invalid"]:
+                yield dumps({"validation": validation}) + b"\n"
+            row_offset += len(chunk)
+            if not len(X):
+                continue
+
+            labels, probs, confidences = score_frame("predict_csv_stream", X, version)
+            with stage("predict_csv_stream", "serialize"):
+                class_names = version.label_encoder.classes_
+                if shape == "columnar":
+                    body = dumps(build_columnar(labels, probs, confidences, class_names)) + b"\n"
+                else:
+                    results = build_results(labels, probs, confidences, class_names)
+                    body = b"".join(dumps(row) + b"\n" for row in results)
+            yield body
+
+    except Exception as e:
+        yield dumps({"error": f"Ошибка сервера: {str(e)}"}) + b"\n"
+
+# Эндпоинт /predict_csv_stream
+@app.post("/predict_csv_stream")
+async def predict_csv_stream(file: UploadFile = File(...), shape: ResultShape = "rows"):
+    '''
+    Функция для потокового предсказания модели по большому CSV‑файлу:
 
-        preds = model.predict(df)
-        labels = label_encoder.inverse_transform(preds)
-        probs = model.predict_proba(df)
-        class_names = label_encoder.classes_
+    1. Принимаем CSV‑файл и выполняем те же проверки, что и /predict_csv
+    2. Читаем файл чанками по CSV_CHUNK_ROWS строк, не загружая его в память целиком
+    3. Проверяем признаки по первому чанку
+    4. Проверяем каждый чанк так же, как /predict_csv, и делаем предсказание по нему отдельно
 
-        results = []
-        for label, prob in zip(labels, probs):
-            results.append({"prediction": str(label),
-                            "confidence": float(max(prob)),
-                            "probabilities": {str(cls): float(p) for cls, p in zip(class_names, prob)}})
+    Возвращаем NDJSON (application/x-ndjson): одна строка на объект
+    с предсказанием, уверенностью и вероятностями
+    (при shape=columnar — одна строка с колоночным объектом на чанк)
+    и строка {"validation": ...} перед результатами чанка, в котором есть строки с ошибками
+    '''
+    import pandas as pd
 
-        return {"results": results}
+    error = check_csv_upload(file)
+    if error:
+        return error
 
+    try:
+        await ensure_model()
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": f"Ошибка сервера: {str(e)}"})
 
+    try:
+        reader = pd.read_csv(file.file, chunksize=CSV_CHUNK_ROWS)
+        first_chunk = await run_in_threadpool(next, reader, None)
+    except pd.errors.EmptyDataError:
+        return JSONResponse(status_code=400, content={"error": "Файл пуст или не загружен"})
+    except Exception as e:
+        return JSONResponse(status_code=400, content={"error": f"Ошибка чтения CSV: {str(e)}"})
+
+    if first_chunk is None or first_chunk.empty:
+        return JSONResponse(status_code=400, content={"error": "CSV-файл не содержит данных"})
+
+    missing = [col for col in selected_features if col not in first_chunk.columns]
+    if missing:
+        return JSONResponse(status_code=400, content={"error": f"Отсутствуют признаки: {missing}"})
+
+    version = registry.pick()
+    return StreamingResponse(stream_predictions(itertools.chain([first_chunk], reader), version, shape),
+                             media_type="application/x-ndjson", headers=version_headers(version))
+
+def stream_flow_predictions(packets, version):
+    '''
+    Генератор NDJSON для /predict_pcap: пакеты собираются в потоки, завершенные потоки
+    скорятся батчами по FLOW_BATCH_SIZE, и на каждый поток отдается строка
+    с его идентификатором и предсказанием. Последняя строка — {"stats": ...} со счетчиками таблицы потоков
+    '''
+    meter = FlowMeter(FLOW_IDLE_TIMEOUT_S, FLOW_ACTIVE_TIMEOUT_S)
+    try:
+        for flows, probs in classify_flows(meter.process(packets), version, selected_features, FLOW_BATCH_SIZE):
+            pred_idx = probs.argmax(axis=1)
+            record_predictions("predict_pcap", pred_idx, version.class_keys)
+            results = build_results(version.class_names[pred_idx], probs,
+                                    probs[np.arange(len(pred_idx)), pred_idx], version.class_keys)
+            yield b"".join(dumps({"flow": flow.describe(), **result}) + b"\n" for flow, result in zip(flows, results))
+        yield dumps({"stats": meter.stats()}) + b"\n"
+
+    except Exception as e:
+        yield dumps({"error": f"Ошибка сервера: {str(e)}"}) + b"\n"
+
+# Эндпоинт /predict_pcap
+@app.post("/predict_pcap")
+async def predict_pcap(file: UploadFile = File(...)):
+    '''
+    Функция для предсказания модели по захвату трафика без внешнего flow meter:
+
+    1. Принимаем файл libpcap (.pcap)
+    2. Читаем пакеты потоком и собираем двунаправленные потоки IPv4 TCP/UDP
+    3. Вычисляем для каждого потока признаки selected_features инкрементально
+    4. Скорим завершенные потоки батчами
+
+    Возвращаем NDJSON: одна строка на поток (flow — адреса, порты, протокол, начало и число пакетов,
+    плюс предсказание, уверенность и вероятности), последняя строка — счетчики таблицы потоков
+    '''
+    if not file.filename.endswith((".pcap", ".cap")):
+        return JSONResponse(status_code=400, content={"error": f"Неверное расширение файла: {file.filename}. Ожидается .pcap"})
+
+    try:
+        await ensure_model()
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"Ошибка сервера: {str(e)}"})
+
+    try:
+        packets = await run_in_threadpool(read_pcap, file.file)
+    except PcapFormatError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    version = registry.pick()
+    return StreamingResponse(stream_flow_predictions(packets, version), media_type="application/x-ndjson",
+                             headers=version_headers(version))
+
+# Эндпоинт /predict_batch
+@app.post("/predict_batch")
+async def predict_batch(request: Request, shape: ResultShape = "rows"):
+    '''
+    Функция для предсказания модели по бинарному колоночному батчу без разбора текста:
+
+    1. Формат тела определяется по Content-Type: матрица float32 с заголовком
+    (application/x-flow-matrix), Arrow IPC (stream/file) или Parquet
+    2. Проверяем, что все нужные признаки присутствуют
+    3. Собираем матрицу float32 в порядке selected_features (матрица в нужном порядке не копируется)
+    4. Проверяем матрицу так же, как /predict_csv (NaN, inf, границы FEATURE_BOUNDS)
+    5. Делаем предсказание в пуле потоков, не блокируя event loop
+
+    Формат ответа выбирается по Accept: application/x-flow-predictions (индексы классов
+    и матрица вероятностей), application/vnd.apache.arrow.stream или JSON как у /predict_csv
+    (с тем же параметром shape и отчетом validation). В бинарных ответах число строк
+    с ошибками — в заголовке X-Invalid-Rows, подробности — в JSON-ответе
+    '''
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in BATCH_CONTENT_TYPES:
+        return JSONResponse(status_code=415,
+                            content={"error": f"Неверный Content-Type: {content_type}. Ожидается один из {list(BATCH_CONTENT_TYPES)}"})
+
+    with stage("predict_batch", "upload_read"):
+        body = await request.body()
+    if not body:
+        return JSONResponse(status_code=400, content={"error": "Тело запроса пустое"})
+
+    try:
+        await ensure_model()
+        with stage("predict_batch", "decode_body"):
+            X = await run_in_threadpool(decode_batch, body, content_type, selected_features)
+    except KeyError as e:
+        return JSONResponse(status_code=400, content={"error": f"Отсутствуют признаки: {e.args[0]}"})
+    except BatchFormatError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    if not len(X):
+        return JSONResponse(status_code=400, content={"error": "Батч не содержит данных"})
+
+    X, validation = await run_in_threadpool(validate_rows, "predict_batch", X)
+    if not len(X):
+        return rejected_response(validation)
+
+    try:
+        version = registry.pick()
+        with stage("predict_batch", "predict"):
+            probs = await run_in_threadpool(version.predict_proba, X)
+        pred_idx = probs.argmax(axis=1)
+        class_names = version.class_names
+        record_predictions("predict_batch", pred_idx, version.class_keys)
+        registry.shadow(X, class_names[pred_idx], version)
+
+        accept = request.headers.get("accept", "")
+        headers = {**version_headers(version), "X-Invalid-Rows": str(validation["rows_invalid"])}
+        with stage("predict_batch", "serialize"):
+            if PREDICTIONS_CONTENT_TYPE in accept:
+                return Response(encode_predictions(pred_idx, probs, class_names), media_type=PREDICTIONS_CONTENT_TYPE,
+                                headers=headers)
+            if ARROW_STREAM_CONTENT_TYPE in accept:
+                return Response(encode_arrow_predictions(pred_idx, probs, class_names),
+                                media_type=ARROW_STREAM_CONTENT_TYPE, headers=headers)
+
+            confidences = probs[np.arange(len(pred_idx)), pred_idx]
+            return FastJSONResponse({"results": format_results(class_names[pred_idx], probs, confidences,
+                                                               version.class_keys, shape),
+                                     "validation": validation}, headers=headers)
+
+    except BatchFormatError as e:
+        return JSONResponse(status_code=406, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"Ошибка сервера: {str(e)}"})
+
+# Эндпоинт /jobs
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    '''
+    Функция для фонового предсказания по очень большому CSV‑файлу:
+
+    1. Принимаем CSV‑файл и выполняем те же проверки, что и /predict_csv (признаки — по заголовку)
+    2. Сохраняем файл в каталог задания и сразу возвращаем id задания
+    3. Файл скорится чанками по JOB_CHUNK_ROWS строк в пуле процессов; строки проверяются
+    как в /predict_csv, но всегда в режиме mask (ошибочные значения — пропуски, строки не отбрасываются)
+
+    Прогресс и отчет о проверке (validation) — GET /jobs/{job_id},
+    готовые результаты по страницам — GET /jobs/{job_id}/results
+    '''
+    import pandas as pd
+
+    error = check_csv_upload(file)
+    if error:
+        return error
+
+    try:
+        await ensure_model()
+        header = await run_in_threadpool(pd.read_csv, file.file, nrows=0)
+        file.file.seek(0)
+    except pd.errors.EmptyDataError:
+        return JSONResponse(status_code=400, content={"error": "Файл пуст или не загружен"})
+    except Exception as e:
+        return JSONResponse(status_code=400, content={"error": f"Ошибка чтения CSV: {str(e)}"})
+
+    missing = [col for col in selected_features if col not in header.columns]
+    if missing:
+        return JSONResponse(status_code=400, content={"error": f"Отсутствуют признаки: {missing}"})
+
+    try:
+        version = registry.pick()
+        job_id = await run_in_threadpool(job_manager.create, file.file,
+                                         {"model_version": version.name, "classes": version.class_keys})
+        job_manager.start(job_id, version.selected_features, score_args=(version.spec, version.mtime))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"Ошибка сервера: {str(e)}"})
+
+    return {"job_id": job_id,
+            "status": job_manager.status(job_id)["status"],
+            "status_url": f"/jobs/{job_id}",
+            "results_url": f"/jobs/{job_id}/results"}
+
+# Эндпоинт /jobs/{job_id}
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    '''
+    Статус задания: queued, running, done или failed, число готовых строк, доля прочитанного файла
+    и отчет о проверке готовых строк validation (индексы строк с ошибками и сообщения, как у /predict_csv)
+    '''
+    try:
+        return job_manager.status(job_id)
+    except JobNotFoundError:
+        return JSONResponse(status_code=404, content={"error": f"Задание {job_id} не найдено"})
+
+# Эндпоинт /jobs/{job_id}/results
+@app.get("/jobs/{job_id}/results")
+async def job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(10_000, ge=1),
+                      shape: ResultShape = "rows"):
+    '''
+    Готовые результаты задания по страницам, пока оно еще выполняется:
+    строки с offset, не больше limit (и JOB_RESULTS_MAX_ROWS).
+    next_offset — смещение следующей страницы; задание дочитано, когда status = done
+    и next_offset = rows_done
+    '''
+    try:
+        await ensure_model()
+        status = job_manager.status(job_id)
+        pred_idx, probs, next_offset = await run_in_threadpool(job_manager.results, job_id, offset,
+                                                               min(limit, JOB_RESULTS_MAX_ROWS))
+    except JobNotFoundError:
+        return JSONResponse(status_code=404, content={"error": f"Задание {job_id} не найдено"})
+
+    # Классы версии, которая скорила задание (после переключения основной версии они могут отличаться)
+    class_keys = status.get("classes") or registry.primary.class_keys
+    if probs is None:
+        results = format_results(pred_idx, np.empty((0, len(class_keys)), dtype=np.float32),
+                                 np.empty(0, dtype=np.float32), class_keys, shape)
+    else:
+        results = format_results(np.asarray(class_keys)[pred_idx], probs,
+                                 probs[np.arange(len(pred_idx)), pred_idx], class_keys, shape)
+
+    return FastJSONResponse({"job_id": job_id,
+                             "status": status["status"],
+                             "rows_done": status["rows_done"],
+                             "offset": offset,
+                             "next_offset": next_offset,
+                             "results": results})
+
+# Эндпоинт /jobs/{job_id} (DELETE)
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    '''
+    Отменяет задание и удаляет его файлы
+    '''
+    try:
+        job_manager.delete(job_id)
+    except JobNotFoundError:
+        return JSONResponse(status_code=404, content={"error": f"Задание {job_id} не найдено"})
+    return {"job_id": job_id, "status": "deleted"}
+
 # Эндпоинт /predict
 @app.post('/predict')
-def predict(data: InputData):
+async def predict(data: InputData):
     '''
     Функция для предсказания модели на основе вводимых данных:
 
     1. Принимаем JSON с признаками одного объекта
-    2. Преобразуем в DataFrame
-    3. Переименовываем поля, чтобы они совпадали с названиями признаков в модели
+    2. Переносим поля напрямую в float32-строку в порядке selected_features (без DataFrame)
+    3. Отправляем строку в микробатчер, который скорит одновременные запросы одним вызовом модели
+    (при PREDICT_BATCH_MAX_SIZE = 1 скорим сразу в обработчике). В режиме split запросы,
+    доставшиеся кандидату, идут в его микробатчер
 
     Возвращаем числовые метки, строковые классы, вероятности
     '''
     try:
-        df = pd.DataFrame([data.model_dump()])
-        df = df.rename(columns={"Destination_Port": "Destination Port",
-                                "Bwd_Packets_s": "Bwd Packets/s",
-                                "Fwd_IAT_Std": "Fwd IAT Std",
-                                "Flow_IAT_Min": "Flow IAT Min",
-                                "Bwd_Packet_Length_Min": "Bwd Packet Length Min",
-                                "Fwd_Packets_s": "Fwd Packets/s",
-                                "Fwd_IAT_Min": "Fwd IAT Min"})
+        await ensure_model()
 
-        try:
-            df = df.astype({col: float for col in df.columns})
-        except Exception as e:
-            return {"error": f"Ошибка преобразования типов: {str(e)}"}
+        version = registry.pick()
+        if batcher.max_batch_size <= 1:
+            result = await run_in_threadpool(version.fast_predictor.result_one, data)
+            if registry.routing.candidate is not None:
+                row = [[getattr(data, name) for name in version.fast_predictor.field_names]]
+                registry.shadow(np.asarray(row, dtype=np.float32), [result["prediction"]], version)
+        else:
+            row = [getattr(data, name) for name in version.fast_predictor.field_names]
 
-        pred = model.predict(df)[0]
-        pred_label = label_encoder.inverse_transform([pred])[0]
-        probs = model.predict_proba(df)[0]
-        class_names = label_encoder.classes_
+            try:
+                if version is registry.routing.primary:
+                    result = await batcher.submit(row)
+                else:
+                    result = await candidate_batcher.submit(row)
+            except QueueFullError as e:
+                return JSONResponse(status_code=503, content={"error": f"Сервер перегружен: {str(e)}"})
+
+        record_prediction("predict", result["prediction"])
+        return FastJSONResponse(result)
 
-        return jsonable_encoder({"prediction": str(pred_label),
-                                 "confidence": float(max(probs)),
-                                 "probabilities": {str(cls): float(p) for cls, p in zip(class_names, probs)}})
-    
     except Exception as e:
         return {"error": f"Ошибка сервера: {str(e)}"}
+
+# Эндпоинт /health
+@app.get('/health')
+def health():
+    '''
+    Проверка живости: процесс запущен и принимает запросы (модель может еще загружаться)
+    '''
+    return {"status": "ok"}
+
+# Эндпоинт /ready
+@app.get('/ready')
+def ready():
+    '''
+    Проверка готовности: модель загружена и прогрета.
+    До этого возвращаем 503, чтобы балансировщик не отправлял запросы в воркер
+    '''
+    if load_error is not None:
+        return JSONResponse(status_code=503, content={"status": "error", "error": load_error})
+
+    primary = registry.primary
+    if primary is None:
+        return JSONResponse(status_code=503, content={"status": "loading"})
+
+    return {"status": "ready",
+            "backend": primary.backend.name,
+            "model_version": primary.name,
+            "load_time_s": round(primary.load_time, 4)}
+
+# Эндпоинт /cache_stats
+@app.get('/cache_stats')
+def cache_stats():
+    '''
+    Счетчики кэша предсказаний: попадания, промахи, вытеснения, истекшие записи
+    и строки, схлопнутые внутри батча
+    '''
+    primary = registry.primary
+    if primary is None or primary.prediction_cache is None:
+        return {"enabled": False}
+
+    return {"enabled": True, "model_version": primary.name, **primary.prediction_cache.stats()}
+
+def registry_path(path):
+    '''
+    Путь к файлу версии внутри MODEL_REGISTRY_DIR или None, если путь выходит за этот каталог
+    '''
+    root = os.path.realpath(MODEL_REGISTRY_DIR)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        return None
+    return os.path.join(MODEL_REGISTRY_DIR, os.path.relpath(full, root))
+
+def update_registry(change, *args):
+    '''
+    Меняет желаемое состояние реестра. Возвращает новое состояние или JSONResponse с ошибкой
+    '''
+    try:
+        return change(*args)
+    except ModelVersionNotFoundError as e:
+        return JSONResponse(status_code=404, content={"error": f"Версия {e.args[0]} не найдена"})
+    except ModelVersionError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+
+# Эндпоинт /models
+@app.get('/models')
+def models():
+    '''
+    Версии модели этого воркера: основная, кандидат и режим сравнения, задержка вызова модели
+    по версиям (p50/p99), доля совпадений теневой версии с основной, ошибки загрузки
+    и желаемое состояние из файла реестра (общего для всех воркеров)
+    '''
+    return registry.describe()
+
+# Эндпоинт /models/{name}
+@app.post('/models/{name}', status_code=202)
+def add_model(name: str, bundle: str, store: str = Query(None), activate: bool = False):
+    '''
+    Регистрирует версию модели из файлов в MODEL_REGISTRY_DIR: бандл joblib
+    и необязательное хранилище model_store. Воркеры загружают и прогревают ее в фоне,
+    при activate=true она становится основной после прогрева. Готовность — GET /models
+    '''
+    bundle_path = registry_path(bundle)
+    store_path = registry_path(store) if store else None
+    if bundle_path is None or (store and store_path is None):
+        return JSONResponse(status_code=400, content={"error": f"Файлы версии должны лежать в каталоге {MODEL_REGISTRY_DIR}"})
+    if not os.path.isfile(bundle_path) and not (store_path and os.path.isdir(store_path)):
+        return JSONResponse(status_code=400, content={"error": f"Файл бандла не найден: {bundle}"})
+
+    try:
+        return registry.add_version(name, {"bundle": bundle_path, "store": store_path}, activate)
+    except ModelVersionError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+@app.delete('/models/{name}', status_code=202)
+def remove_model(name: str):
+    '''
+    Убирает версию из реестра (основную версию убрать нельзя)
+    '''
+    return update_registry(registry.remove, name)
+
+@app.post('/models/{name}/activate', status_code=202)
+def activate_model(name: str):
+    '''
+    Делает версию основной: каждый воркер переключается атомарно, когда версия у него загружена
+    '''
+    return update_registry(registry.activate, name)
+
+@app.post('/models/{name}/compare', status_code=202)
+def compare_model(name: str, mode: Literal["shadow", "split"] = "shadow",
+                  fraction: float = Query(1.0, gt=0, le=1)):
+    '''
+    Сравнивает версию с основной:
+
+    * shadow — доля fraction батчей дополнительно скорится этой версией в фоне,
+    ответ дает основная версия; в GET /models — доля совпавших классов
+    * split — доля fraction запросов обслуживается этой версией (заголовок X-Model-Version)
+    '''
+    return update_registry(registry.compare, name, mode, fraction)
+
+@app.delete('/models/{name}/compare', status_code=202)
+def stop_compare_model(name: str):
+    '''
+    Прекращает сравнение версии с основной
+    '''
+    return update_registry(registry.stop_compare, name)
+
+# Эндпоинт /metrics
+@app.get('/metrics')
+def prometheus_metrics():
+    '''
+    Метрики воркера в текстовом формате Prometheus: время этапов запросов, строки в запросе и всего,
+    запросы в обработке, распределение классов, время загрузки модели.
+    При нескольких воркерах uvicorn у каждого свои счетчики (метка pid в api_worker_info)
+    '''
+    return Response(metrics.REGISTRY.render(), media_type=metrics.REGISTRY.content_type)
+
+# Эндпоинт /profiler (POST /profiler/start, POST /profiler/stop)
+@app.get('/profiler')
+def profiler_status():
+    '''
+    Состояние сэмплирующего профилировщика и самые частые функции на вершине стека
+    '''
+    if not PROFILER_ENABLED:
+        return JSONResponse(status_code=404, content={"error": "Профилировщик выключен (config.PROFILER_ENABLED)"})
+    return {**profiler.status(), "top": profiler.top()}
+
+@app.post('/profiler/start')
+def profiler_start(interval_ms: float = Query(PROFILER_INTERVAL_MS, gt=0),
+                   duration_s: float = Query(PROFILER_MAX_DURATION_S, gt=0)):
+    '''
+    Включает сэмплирующий профилировщик на duration_s секунд (не больше PROFILER_MAX_DURATION_S)
+    '''
+    if not PROFILER_ENABLED:
+        return JSONResponse(status_code=404, content={"error": "Профилировщик выключен (config.PROFILER_ENABLED)"})
+    try:
+        profiler.start(interval_ms / 1000, min(duration_s, PROFILER_MAX_DURATION_S))
+    except RuntimeError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    return profiler.status()
+
+@app.post('/profiler/stop')
+def profiler_stop():
+    '''
+    Останавливает профилировщик и возвращает свернутые стеки (flamegraph.pl, speedscope)
+    '''
+    if not PROFILER_ENABLED:
+        return JSONResponse(status_code=404, content={"error": "Профилировщик выключен (config.PROFILER_ENABLED)"})
+    return PlainTextResponse(profiler.stop())
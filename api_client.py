@@ -0,0 +1,76 @@
+import gzip
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import encode_multipart_formdata
+from urllib3.util.retry import Retry
+
+
+class ApiRetry(Retry):
+    '''
+    Повторы по статусу ответа: GET и DELETE — при любом статусе из status_forcelist,
+    POST — только при 503 (сервер отказал до обработки запроса). После 502/504 от прокси
+    POST мог уже выполниться, поэтому не повторяется
+    '''
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method == "POST" and status_code != 503:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class ApiClient:
+    '''
+    HTTP-клиент интерфейса к API:
+
+    1. Один requests.Session с пулом keep-alive соединений (до pool_size на хост):
+    запросы переиспользуют TCP-соединения вместо установки нового на каждый клик
+    2. Таймауты на подключение и чтение по умолчанию для каждого запроса
+    3. Повторы с экспоненциальной задержкой при ошибке подключения и ответах 502/503/504
+    (с учетом Retry-After), POST — только при ошибке подключения и ответе 503 (ApiRetry).
+    Запрос, который мог дойти до сервера и не дождался ответа, не повторяется:
+    POST /jobs не создаст задание дважды
+    4. Тело загружаемого файла от gzip_min_bytes сжимается gzip (Content-Encoding: gzip,
+    на стороне API его распаковывает gzip_request.GzipRequestMiddleware)
+
+    Клиент потокобезопасен для параллельных запросов (пул urllib3), поэтому один экземпляр
+    делится всеми сессиями Streamlit
+    '''
+    def __init__(self, base_url, pool_size=16, connect_timeout_s=3.0, read_timeout_s=120.0,
+                 retries=3, backoff_s=0.2, gzip_min_bytes=64 * 2**10, gzip_level=1):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout_s, read_timeout_s)
+        self.gzip_min_bytes = gzip_min_bytes
+        self.gzip_level = gzip_level
+
+        retry = ApiRetry(total=retries, connect=retries, read=False, status=retries,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET", "POST", "DELETE"}),
+                      backoff_factor=backoff_s, respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, self.base_url + path, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def post_file(self, path, filename, data, content_type="text/csv", params=None):
+        '''
+        Загрузка файла в поле file (multipart/form-data), как files= в requests.
+        Тело собирается один раз, поэтому при повторе не пересобирается и не пересжимается
+        '''
+        body, multipart_type = encode_multipart_formdata({"file": (filename, data, content_type)})
+        headers = {"Content-Type": multipart_type}
+        if len(body) >= self.gzip_min_bytes:
+            body = gzip.compress(body, compresslevel=self.gzip_level)
+            headers["Content-Encoding"] = "gzip"
+        return self.post(path, data=body, headers=headers, params=params)
+
+    def close(self):
+        self.session.close()
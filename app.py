@@ -1,7 +1,14 @@
 import streamlit as st
 import pandas as pd
 import requests
-from config import API_URL, EXAMPLE_CSV_PATH, CONFIDENCE_THRESHOLDS
+import time
+from config import (API_URL, EXAMPLE_CSV_PATH, CONFIDENCE_THRESHOLDS, CSV_JOB_THRESHOLD_BYTES, JOB_POLL_INTERVAL_S,
+                    INPUT_RANGES, RESULTS_PAGE_SIZES, CONFIDENCE_HISTOGRAM_BINS, CSV_RESULTS_CACHE_ENTRIES,
+                    API_POOL_SIZE, API_CONNECT_TIMEOUT_S, API_READ_TIMEOUT_S, API_RETRIES, API_RETRY_BACKOFF_S,
+                    API_GZIP_MIN_BYTES, JOB_POLL_TIMEOUT_S)
+from api_client import ApiClient
+from results_view import (CONFIDENCE_LEVELS, merge_columnar, results_frame, class_summary, confidence_histogram,
+                          page)
 
 # Настройки страницы
 st.set_page_config(page_title='Анализ сетевого трафика', layout='centered')
@@ -19,115 +26,299 @@ with open(EXAMPLE_CSV_PATH, 'rb') as file:
 
 uploaded_file = st.file_uploader('Загрузите CSV-файл', type=['csv'])
 
+
+class ApiError(Exception):
+    '''
+    Ошибка API для показа в интерфейсе (исключения не попадают в кэш st.cache_data)
+    '''
+
+
+def api_error(response):
+    try:
+        error_detail = response.json().get("error", "Неизвестная ошибка")
+        return ApiError(f"Ошибка сервера: {response.status_code} — {error_detail}")
+    except Exception:
+        return ApiError(f"Ошибка сервера: {response.status_code}")
+
+
+@st.cache_resource
+def api_client():
+    '''
+    Общий для всех сессий клиент API с пулом keep-alive соединений, таймаутами и повторами
+    '''
+    return ApiClient(API_URL,
+                     pool_size=API_POOL_SIZE,
+                     connect_timeout_s=API_CONNECT_TIMEOUT_S,
+                     read_timeout_s=API_READ_TIMEOUT_S,
+                     retries=API_RETRIES,
+                     backoff_s=API_RETRY_BACKOFF_S,
+                     gzip_min_bytes=API_GZIP_MIN_BYTES)
+
+
+def show_error(response):
+    st.error(f"❌ {api_error(response)}")
+
+
+def show_confidence(confidence):
+    if confidence < CONFIDENCE_THRESHOLDS["low"]:
+        st.warning('⚠️ Низкая уверенность — рекомендуется ручная проверка')
+    elif confidence < CONFIDENCE_THRESHOLDS["medium"]:
+        st.info('🟠 Средняя уверенность')
+    else:
+        st.success('🟢 Высокая уверенность')
+
+
+def show_probabilities(probabilities):
+    probs_df = pd.DataFrame({'Класс': list(probabilities.keys()),
+                             'Вероятность': list(probabilities.values())})
+    st.bar_chart(probs_df.set_index('Класс'))
+
+
+def run_csv_job(name, data, on_progress=None):
+    '''
+    Большой CSV отправляется фоновым заданием (/jobs): статус опрашивается, готовые результаты
+    забираются по страницам в колоночном формате, пока файл еще скорится.
+    Если задание не продвигается дольше JOB_POLL_TIMEOUT_S секунд, опрос прекращается с ошибкой.
+    Возвращает колоночные результаты и отчет о проверке строк из статуса задания (режим mask)
+    '''
+    client = api_client()
+    response = client.post_file("/jobs", name, data)
+    if response.status_code != 202:
+        raise api_error(response)
+
+    job_id = response.json()["job_id"]
+    pages, offset = [], 0
+    progress, deadline = None, time.monotonic() + JOB_POLL_TIMEOUT_S
+    while True:
+        response = client.get(f"/jobs/{job_id}")
+        if response.status_code != 200:
+            raise api_error(response)
+
+        status = response.json()
+        if status["status"] == "failed":
+            raise ApiError(f"Ошибка: {status['error']}")
+
+        response = client.get(f"/jobs/{job_id}/results", params={"offset": offset, "shape": "columnar"})
+        if response.status_code != 200:
+            raise api_error(response)
+        page = response.json()
+        pages.append(page["results"])
+        offset = page["next_offset"]
+        if on_progress is not None:
+            on_progress(status["progress"], offset)
+
+        if status["status"] == "done" and offset >= status["rows_done"]:
+            return merge_columnar(pages), status.get("validation")
+        if (status["progress"], offset) != progress:
+            progress, deadline = (status["progress"], offset), time.monotonic() + JOB_POLL_TIMEOUT_S
+        elif time.monotonic() > deadline:
+            raise ApiError(f"Ошибка: задание {job_id} не продвигается дольше {JOB_POLL_TIMEOUT_S} с")
+        if not page["results"]["predictions"]:
+            time.sleep(JOB_POLL_INTERVAL_S)
+
+
+def predict_csv(name, data):
+    '''
+    Небольшой CSV скорится одним запросом /predict_csv в колоночном формате.
+    Возвращает колоночные результаты и отчет о проверке строк
+    '''
+    response = api_client().post_file("/predict_csv", name, data, params={"shape": "columnar"})
+    if response.status_code != 200:
+        raise api_error(response)
+
+    result = response.json()
+    if "error" in result:
+        raise ApiError(f"Ошибка: {result['error']}")
+    return merge_columnar([result["results"]]), result.get("validation")
+
+
+@st.cache_data(show_spinner=False, max_entries=CSV_RESULTS_CACHE_ENTRIES)
+def score_csv(file_id, name, _upload, _on_progress=None):
+    '''
+    Результаты по загруженному файлу, закэшированные по его id: перезапуски скрипта
+    (страницы таблицы, фильтры) не отправляют файл в API повторно.
+    Возвращает таблицу results_frame и отчет о проверке строк
+    '''
+    if _upload.size > CSV_JOB_THRESHOLD_BYTES:
+        columnar, validation = run_csv_job(name, _upload.getvalue(), _on_progress)
+    else:
+        columnar, validation = predict_csv(name, _upload.getvalue())
+
+    if columnar is None:
+        raise ApiError("Ошибка: в файле нет строк с предсказаниями")
+    return results_frame(columnar, validation, CONFIDENCE_THRESHOLDS), validation
+
+
+def show_validation(validation):
+    '''
+    Строки, не прошедшие проверку в API, с сообщениями по признакам
+    '''
+    if not validation or not validation["rows_invalid"]:
+        return
+
+    action = 'не оценены' if validation["mode"] == "reject" else 'оценены с пропусками вместо ошибочных значений'
+    with st.expander(f'⚠️ Строки с ошибками: {validation["rows_invalid"]} ({action})'):
+        st.dataframe(pd.DataFrame([{"Строка": error["row"] + 1, "Признак": feature, "Ошибка": message}
+                                   for error in validation["errors"]
+                                   for feature, message in error["errors"].items()]),
+                     hide_index=True, use_container_width=True)
+        if len(validation["errors"]) < validation["rows_invalid"]:
+            st.caption(f'Показаны первые {len(validation["errors"])} строк с ошибками')
+
+
+def show_csv_results(df, validation):
+    '''
+    Сводка по результатам вместо вывода каждой строки: распределение классов, гистограмма
+    уверенности по CONFIDENCE_THRESHOLDS и таблица по страницам. График вероятностей —
+    только для выбранной строки
+    '''
+    st.subheader('Результаты предсказания по CSV')
+    classes = list(df["Класс"].cat.categories)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric('Строк с предсказанием', f'{len(df):,}'.replace(',', ' '))
+    col2.metric('Строк с ошибками', validation["rows_invalid"] if validation else 0)
+    col3.metric('Низкая уверенность', int((df["Уровень"] == CONFIDENCE_LEVELS[0]).sum()))
+    col4.metric('Средняя уверенность', f'{df["Уверенность"].mean():.2f}')
+    show_validation(validation)
+
+    st.markdown('**Распределение классов**')
+    summary = class_summary(df)
+    col_left, col_right = st.columns([1, 1])
+    with col_left:
+        st.bar_chart(summary["Строк"])
+    with col_right:
+        st.dataframe(summary.assign(Доля=summary["Доля"] * 100),
+                     column_config={"Доля": st.column_config.NumberColumn('Доля, %', format='%.1f'),
+                                    "Средняя уверенность": st.column_config.NumberColumn(format='%.2f')})
+
+    st.markdown('**Уверенность модели**')
+    st.bar_chart(confidence_histogram(df["Уверенность"], CONFIDENCE_THRESHOLDS, CONFIDENCE_HISTOGRAM_BINS),
+                 color=["#ff4b4b", "#ffa421", "#21c354"])
+    st.caption(f'Низкая — ниже {CONFIDENCE_THRESHOLDS["low"]} (рекомендуется ручная проверка), '
+               f'средняя — ниже {CONFIDENCE_THRESHOLDS["medium"]}')
+
+    st.markdown('**Строки**')
+    filter_classes, filter_levels = st.columns(2)
+    selected_classes = filter_classes.multiselect('Классы', classes, key='csv_classes')
+    selected_levels = filter_levels.multiselect('Уровень уверенности', CONFIDENCE_LEVELS, key='csv_levels')
+    view = df
+    if selected_classes:
+        view = view[view["Класс"].isin(selected_classes)]
+    if selected_levels:
+        view = view[view["Уровень"].isin(selected_levels)]
+
+    size_col, page_col = st.columns(2)
+    page_size = size_col.selectbox('Строк на странице', RESULTS_PAGE_SIZES, key='csv_page_size')
+    pages = max(1, -(-len(view) // page_size))
+    if st.session_state.get('csv_page', 1) > pages:
+        st.session_state['csv_page'] = pages
+    number = page_col.number_input(f'Страница (из {pages})', min_value=1, max_value=pages, step=1, key='csv_page')
+
+    current = page(view, number, page_size)
+    st.dataframe(current, hide_index=True, use_container_width=True,
+                 column_config={"Уверенность": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0,
+                                                                               format='%.2f')})
+
+    if len(current) and st.toggle('Показать вероятности по строке', key='csv_row_details'):
+        row = st.selectbox('Строка', current["Строка"], key='csv_row')
+        selected = current[current["Строка"] == row].iloc[0]
+        col_left, col_right = st.columns([2, 1])
+        with col_left:
+            st.write(f'Класс: `{selected["Класс"]}`')
+            st.write(f'Уверенность: **{selected["Уверенность"]:.2f}**')
+            show_confidence(selected["Уверенность"])
+        with col_right:
+            show_probabilities({cls: float(selected[cls]) for cls in classes})
+
+
 if uploaded_file:
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         predict_clicked = st.button('**Предсказать по CSV**', key='predict_csv', use_container_width=True)
 
+    # Результаты показываются и после перезапусков скрипта, пока загружен тот же файл
     if predict_clicked:
-        with st.spinner('Модель думает...'):
-            files = {"file": (uploaded_file.name,
-                              uploaded_file.getvalue(),
-                              "text/csv")}
-            response = requests.post(f"{API_URL}/predict_csv", files=files)
+        st.session_state['csv_file_id'] = uploaded_file.file_id
 
-        if response.status_code == 200:
-            result = response.json()
-            if "error" in result:
-                st.error(f"❌ Ошибка: {result['error']}")
-            else:
-                st.toast('Предсказание завершено!')
-                st.subheader('Результаты предсказания по CSV')
-
-                for i, row in enumerate(result["results"]):
-                    col_left, col_right = st.columns([2, 1])
-                    with col_left:
-                        st.markdown(f'**Строка {i+1}:**')
-                        st.write(f'Класс: `{row["prediction"]}`')
-                        st.write(f'Уверенность: **{row["confidence"]:.2f}**')
-
-                        if row["confidence"] < CONFIDENCE_THRESHOLDS["low"]:
-                            st.warning('⚠️ Низкая уверенность — рекомендуется ручная проверка')
-                        elif row["confidence"] < CONFIDENCE_THRESHOLDS["medium"]:
-                            st.info('🟠 Средняя уверенность')
-                        else:
-                            st.success('🟢 Высокая уверенность')
-
-                    with col_right:
-                        probs_df = pd.DataFrame({
-                            'Класс': list(row["probabilities"].keys()),
-                            'Вероятность': list(row["probabilities"].values())
-                        })
-                        st.bar_chart(probs_df.set_index('Класс'))
-
-                    st.markdown('---')
+    if st.session_state.get('csv_file_id') == uploaded_file.file_id:
+        progress = st.empty()
+        try:
+            with st.spinner('Модель думает...'):
+                df, validation = score_csv(uploaded_file.file_id, uploaded_file.name, uploaded_file,
+                                           lambda fraction, rows: progress.progress(fraction,
+                                                                                    text=f'Обработано строк: {rows}'))
+        except ApiError as e:
+            del st.session_state['csv_file_id']
+            st.error(f"❌ {e}")
+        except requests.RequestException as e:
+            del st.session_state['csv_file_id']
+            st.error(f"❌ API недоступен: {e}")
         else:
-            try:
-                error_detail = response.json().get("error", "Неизвестная ошибка")
-                st.error(f"❌ Ошибка сервера: {response.status_code} — {error_detail}")
-            except Exception:
-                st.error(f"❌ Ошибка сервера: {response.status_code}")
+            progress.empty()
+            if predict_clicked:
+                st.toast('Предсказание завершено!')
+            show_csv_results(df, validation)
+
+
+def feature_input(label, value, help):
+    '''
+    Поле ввода признака с диапазоном из INPUT_RANGES (внутри границ FEATURE_BOUNDS, которые проверяет API)
+    '''
+    min_value, max_value = INPUT_RANGES[label]
+    return st.number_input(label, min_value=min_value, max_value=max_value, value=value, help=help)
 
 
 # Ручной ввод
 st.subheader('📝 Ввод вручную')
 
 features = {
-    "Destination_Port": st.number_input('Destination Port', min_value=0, max_value=65535, value=443,
-                                        help='Порт назначения, используемый в сетевом соединении'),
-    "Init_Win_bytes_forward": st.number_input('Init_Win_bytes_forward', min_value=0, max_value=1_000_000, value=8192,
-                                              help='Начальный размер окна в байтах в прямом направлении'),
-    "Init_Win_bytes_backward": st.number_input('Init_Win_bytes_backward', min_value=0, max_value=1_000_000, value=8192,
-                                               help='Начальный размер окна в байтах в обратном направлении'),
-    "Bwd_Packets_s": st.number_input('Bwd Packets/s', min_value=0.0, max_value=1_000_000.0, value=1500.0,
-                                     help='Скорость пакетов в обратном направлении (пакеты в секунду)'),
-    "min_seg_size_forward": st.number_input('min_seg_size_forward', min_value=0, max_value=1500, value=40,
-                                            help='Минимальный размер сегмента в прямом направлении'),
-    "Fwd_IAT_Std": st.number_input('Fwd IAT Std', min_value=0.0, max_value=1_000_000.0, value=5000.0,
-                                   help='Стандартное отклонение интервалов между пакетами в прямом направлении'),
-    "Flow_IAT_Min": st.number_input('Flow IAT Min', min_value=0.0, max_value=1_000_000.0, value=1000.0,
-                                    help='Минимальный интервал между любыми пакетами в потоке'),
-    "Bwd_Packet_Length_Min": st.number_input('Bwd Packet Length Min', min_value=0, max_value=1500, value=60,
-                                             help='Минимальная длина пакета в обратном направлении'),
-    "Fwd_Packets_s": st.number_input('Fwd Packets/s', min_value=0.0, max_value=1_000_000.0, value=2000.0,
-                                     help='Скорость пакетов в прямом направлении (пакеты в секунду)'),
-    "Fwd_IAT_Min": st.number_input('Fwd IAT Min', min_value=0.0, max_value=1_000_000.0, value=1000.0,
-                                   help='Минимальный интервал между пакетами в прямом направлении')}
+    "Destination_Port": feature_input('Destination Port', 443,
+                                      help='Порт назначения, используемый в сетевом соединении'),
+    "Init_Win_bytes_forward": feature_input('Init_Win_bytes_forward', 8192,
+                                            help='Начальный размер окна в байтах в прямом направлении'),
+    "Init_Win_bytes_backward": feature_input('Init_Win_bytes_backward', 8192,
+                                             help='Начальный размер окна в байтах в обратном направлении'),
+    "Bwd_Packets_s": feature_input('Bwd Packets/s', 1500.0,
+                                   help='Скорость пакетов в обратном направлении (пакеты в секунду)'),
+    "min_seg_size_forward": feature_input('min_seg_size_forward', 40,
+                                          help='Минимальный размер сегмента в прямом направлении'),
+    "Fwd_IAT_Std": feature_input('Fwd IAT Std', 5000.0,
+                                 help='Стандартное отклонение интервалов между пакетами в прямом направлении'),
+    "Flow_IAT_Min": feature_input('Flow IAT Min', 1000.0,
+                                  help='Минимальный интервал между любыми пакетами в потоке'),
+    "Bwd_Packet_Length_Min": feature_input('Bwd Packet Length Min', 60,
+                                           help='Минимальная длина пакета в обратном направлении'),
+    "Fwd_Packets_s": feature_input('Fwd Packets/s', 2000.0,
+                                   help='Скорость пакетов в прямом направлении (пакеты в секунду)'),
+    "Fwd_IAT_Min": feature_input('Fwd IAT Min', 1000.0,
+                                 help='Минимальный интервал между пакетами в прямом направлении')}
 
 col1, col2, col3 = st.columns([1, 2, 1])
 with col2:
     predict_clicked = st.button('**Предсказать по введенным данным**', key='predict_manual', use_container_width=True)
 
 if predict_clicked:
-    with st.spinner('Модель думает...'):
-        response = requests.post(f"{API_URL}/predict", json=features)
+    try:
+        with st.spinner('Модель думает...'):
+            response = api_client().post("/predict", json=features)
+    except requests.RequestException as e:
+        st.error(f"❌ API недоступен: {e}")
+    else:
+        if response.status_code == 200:
+            result = response.json()
+            if "error" in result:
+                st.error(f"❌ Ошибка: {result['error']}")
+            else:
+                st.toast('Предсказание завершено!')
+                col_left, col_right = st.columns([2, 1])
+                with col_left:
+                    st.subheader('Результаты предсказания по введенным данным')
+                    st.write(f'Класс: **{result["prediction"]}**')
+                    st.write(f'Уверенность модели: **{result["confidence"]:.2f}**')
+                    show_confidence(result["confidence"])
 
-    if response.status_code == 200:
-        result = response.json()
-        if "error" in result:
-            st.error(f"❌ Ошибка: {result['error']}")
+                with col_right:
+                    show_probabilities(result["probabilities"])
         else:
-            st.toast('Предсказание завершено!')
-            col_left, col_right = st.columns([2, 1])
-            with col_left:
-                st.subheader('Результаты предсказания по введенным данным')
-                st.write(f'Класс: **{result["prediction"]}**')
-                st.write(f'Уверенность модели: **{result["confidence"]:.2f}**')
-
-                if result["confidence"] < CONFIDENCE_THRESHOLDS["low"]:
-                    st.warning('⚠️ Низкая уверенность — рекомендуется ручная проверка')
-                elif result["confidence"] < CONFIDENCE_THRESHOLDS["medium"]:
-                    st.info('🟠 Средняя уверенность')
-                else:
-                    st.success('🟢 Высокая уверенность')
-
-            with col_right:
-                probs_df = pd.DataFrame({'Класс': list(result["probabilities"].keys()),
-                                         'Вероятность': list(result["probabilities"].values())})
-                st.bar_chart(probs_df.set_index('Класс'))
-    else:
-        try:
-            error_detail = response.json().get("error", "Неизвестная ошибка")
-            st.error(f"❌ Ошибка сервера: {response.status_code} — {error_detail}")
-        except Exception:
-            st.error(f"❌ Ошибка сервера: {response.status_code}")
+            show_error(response)
@@ -0,0 +1,263 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+
+class XGBoostBackend:
+    '''
+    Стандартный бэкенд: нативный бустер XGBoost через inplace_predict
+    (без sklearn-обертки и без DMatrix)
+    '''
+    name = "xgboost"
+
+    def __init__(self, model):
+        self.booster = model.get_booster()
+        try:
+            self.iteration_range = (0, model.best_iteration + 1)
+        except AttributeError:
+            self.iteration_range = (0, 0)
+
+    def predict_proba(self, X):
+        '''
+        Матрица вероятностей для признаков в порядке selected_features
+        '''
+        X = np.asarray(X, dtype=np.float32)
+        return self.booster.inplace_predict(X, iteration_range=self.iteration_range, validate_features=False)
+
+
+class ArrayTreeBackend:
+    '''
+    Бэкенд на плоской таблице узлов: каждое дерево бустера дополняется до полного
+    бинарного дерева глубины max_depth и хранится в общих массивах
+    (признак и порог внутренних узлов, направление для NaN, значения листьев).
+    Обход идет векторно в NumPy сразу для всех строк и всех деревьев:
+    индекс потомка считается арифметически (2 * i + 1 + направо), без таблиц ссылок.
+
+    Листья, которые в исходном дереве находятся выше max_depth, копируются вниз
+    через фиктивные сплиты с порогом +inf
+    '''
+    name = "array"
+    max_supported_depth = 12
+    block_rows = 2048
+
+    def __init__(self, feature, threshold, default_left, leaf_value, tree_class, base_margin):
+        # Деревья группируются по классам, чтобы листья одного класса суммировались
+        # непрерывным срезом и результат строки не зависел от размера батча.
+        # Уже упорядоченные массивы (например, отображенные в память) не копируются
+        if np.any(np.diff(tree_class) < 0):
+            order = np.argsort(tree_class, kind="stable")
+            feature, threshold = feature[order], threshold[order]
+            default_left, leaf_value, tree_class = default_left[order], leaf_value[order], tree_class[order]
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.leaf_value = leaf_value
+        self.tree_class = tree_class
+        self.base_margin = base_margin
+        self.num_trees, self.num_internal = feature.shape
+        self.max_depth = int(np.log2(self.num_internal + 1))
+        self.num_class = len(base_margin)
+        self._tree_offset = np.arange(self.num_trees, dtype=np.int64) * self.num_internal
+        self._leaf_offset = np.arange(self.num_trees, dtype=np.int64) * (self.num_internal + 1) - self.num_internal
+        self._class_bounds = np.searchsorted(self.tree_class, np.arange(self.num_class + 1))
+
+    @classmethod
+    def from_booster(cls, booster, iteration_range=(0, 0)):
+        '''
+        Экспортирует бустер multi:softprob в таблицу узлов через JSON-дамп модели
+        '''
+        model_json = json.loads(booster.save_raw("json"))
+        learner = model_json["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "multi:softprob":
+            raise ValueError(f"Бэкенд array поддерживает только multi:softprob, а не {objective}")
+
+        gbtree = learner["gradient_booster"]["model"]
+        num_class = int(learner["learner_model_param"]["num_class"])
+        base_score = np.array(learner["learner_model_param"]["base_score"].strip("[]").split(","), dtype=np.float32)
+        base_margin = np.broadcast_to(base_score, (num_class,)).copy()
+
+        trees = gbtree["trees"]
+        tree_info = gbtree["tree_info"]
+        indptr = gbtree.get("iteration_indptr")
+        begin, end = iteration_range
+        if end > 0 and indptr:
+            trees = trees[indptr[begin]:indptr[end]]
+            tree_info = tree_info[indptr[begin]:indptr[end]]
+
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Категориальные сплиты не поддерживаются бэкендом array")
+
+        depth = max(_tree_depth(tree["left_children"], tree["right_children"]) for tree in trees)
+        if depth > cls.max_supported_depth:
+            raise ValueError(f"Глубина деревьев {depth} больше {cls.max_supported_depth}")
+        depth = max(depth, 1)
+
+        num_internal = 2 ** depth - 1
+        feature = np.zeros((len(trees), num_internal), dtype=np.int32)
+        threshold = np.full((len(trees), num_internal), np.inf, dtype=np.float32)
+        default_left = np.ones((len(trees), num_internal), dtype=bool)
+        leaf_value = np.zeros((len(trees), num_internal + 1), dtype=np.float32)
+
+        for t, tree in enumerate(trees):
+            left, right = tree["left_children"], tree["right_children"]
+            stack = [(0, 0)]
+            while stack:
+                node, pos = stack.pop()
+                if pos >= num_internal:
+                    leaf_value[t, pos - num_internal] = tree["split_conditions"][node]
+                elif left[node] == -1:
+                    stack += [(node, 2 * pos + 1), (node, 2 * pos + 2)]
+                else:
+                    feature[t, pos] = tree["split_indices"][node]
+                    threshold[t, pos] = tree["split_conditions"][node]
+                    default_left[t, pos] = tree["default_left"][node]
+                    stack += [(left[node], 2 * pos + 1), (right[node], 2 * pos + 2)]
+
+        return cls(feature=feature,
+                   threshold=threshold,
+                   default_left=default_left,
+                   leaf_value=leaf_value,
+                   tree_class=np.asarray(tree_info, dtype=np.int32),
+                   base_margin=base_margin)
+
+    def save(self, path):
+        '''
+        Сохраняет таблицу узлов в .npz
+        '''
+        np.savez(path, feature=self.feature, threshold=self.threshold, default_left=self.default_left,
+                 leaf_value=self.leaf_value, tree_class=self.tree_class, base_margin=self.base_margin)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Загружает таблицу узлов из .npz
+        '''
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    def predict_margin(self, X):
+        '''
+        Сырые суммы листьев по классам (до softmax)
+        '''
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        num_features = X.shape[1]
+        feature = self.feature.ravel()
+        threshold = self.threshold.ravel()
+        default_left = self.default_left.ravel()
+        leaf_value = self.leaf_value.ravel()
+        has_nan = bool(np.isnan(X).any())
+
+        margin = np.empty((len(X), self.num_class), dtype=np.float32)
+        for start in range(0, len(X), self.block_rows):
+            block = X[start:start + self.block_rows]
+            values_flat = block.ravel()
+            row_offset = (np.arange(len(block), dtype=np.int64) * num_features)[:, None]
+            pos = np.zeros((len(block), self.num_trees), dtype=np.int64)
+
+            for _ in range(self.max_depth):
+                node = pos + self._tree_offset
+                values = values_flat.take(row_offset + feature.take(node))
+                go_right = ~(values < threshold.take(node))
+                if has_nan:
+                    go_right &= ~(np.isnan(values) & default_left.take(node))
+                pos = 2 * pos + 1 + go_right
+
+            leaves = leaf_value.take(pos + self._leaf_offset)
+            for cls in range(self.num_class):
+                begin, end = self._class_bounds[cls], self._class_bounds[cls + 1]
+                margin[start:start + len(block), cls] = leaves[:, begin:end].sum(axis=1)
+
+        return margin + self.base_margin
+
+    def predict_proba(self, X):
+        '''
+        Матрица вероятностей (softmax по классам)
+        '''
+        margin = self.predict_margin(X)
+        margin -= margin.max(axis=1, keepdims=True)
+        np.exp(margin, out=margin)
+        margin /= margin.sum(axis=1, keepdims=True)
+        return margin
+
+
+class AutoBackend:
+    '''
+    Комбинированный бэкенд: небольшие батчи (до max_rows строк) считает таблица узлов,
+    у которой почти нет накладных расходов на вызов, а большие — нативный бустер
+    '''
+    name = "auto"
+
+    def __init__(self, array_backend, xgboost_backend, max_rows=16):
+        self.array_backend = array_backend
+        self.xgboost_backend = xgboost_backend
+        self.max_rows = max_rows
+
+    def predict_proba(self, X):
+        if len(X) <= self.max_rows:
+            return self.array_backend.predict_proba(X)
+        return self.xgboost_backend.predict_proba(X)
+
+
+def _tree_depth(left, right):
+    depth, level = 0, [0]
+    while True:
+        level = [child for node in level for child in (left[node], right[node]) if child != -1]
+        if not level:
+            return depth
+        depth += 1
+
+
+BACKENDS = (XGBoostBackend.name, ArrayTreeBackend.name, AutoBackend.name)
+
+
+def load_array_backend(model, tree_table_path=None):
+    '''
+    Загружает таблицу узлов; если tree_table_path еще не существует,
+    бустер экспортируется один раз и таблица сохраняется
+    '''
+    if tree_table_path and os.path.exists(tree_table_path):
+        return ArrayTreeBackend.load(tree_table_path)
+
+    backend = ArrayTreeBackend.from_booster(model.get_booster(), XGBoostBackend(model).iteration_range)
+    if tree_table_path:
+        backend.save(tree_table_path)
+    return backend
+
+
+def load_backend(name, model, tree_table_path=None, auto_max_rows=16, array_backend=None):
+    '''
+    Создает бэкенд инференса по имени из config.MODEL_BACKEND:
+
+    * xgboost — нативный бустер из бандла
+    * array — таблица узлов, вычисляемая в NumPy
+    * auto — array для батчей до auto_max_rows строк, xgboost для остальных
+
+    array_backend — уже загруженная таблица узлов (например, из хранилища model_store)
+    '''
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд: {name}. Доступны: {list(BACKENDS)}")
+
+    if name == XGBoostBackend.name:
+        return XGBoostBackend(model)
+
+    if array_backend is None:
+        array_backend = load_array_backend(model, tree_table_path)
+
+    if name == ArrayTreeBackend.name:
+        return array_backend
+
+    return AutoBackend(array_backend, XGBoostBackend(model), auto_max_rows)
+
+
+if __name__ == "__main__":
+    # Экспорт таблицы узлов: python backends.py model/xgb_pipeline_bundle.pkl model/xgb_tree_table.npz
+    import joblib
+
+    bundle_path, table_path = sys.argv[1:3]
+    model = joblib.load(bundle_path)["model"]
+    load_array_backend(model).save(table_path)
+    print(f"Таблица узлов сохранена в {table_path}")
@@ -0,0 +1,182 @@
+import io
+import json
+import struct
+
+import numpy as np
+
+# Типы содержимого для /predict_batch
+MATRIX_CONTENT_TYPE = "application/x-flow-matrix"
+PREDICTIONS_CONTENT_TYPE = "application/x-flow-predictions"
+ARROW_STREAM_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_CONTENT_TYPE = "application/vnd.apache.arrow.file"
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+BATCH_CONTENT_TYPES = (MATRIX_CONTENT_TYPE, ARROW_STREAM_CONTENT_TYPE, ARROW_FILE_CONTENT_TYPE, PARQUET_CONTENT_TYPE)
+
+MATRIX_MAGIC = b"FLWM"
+PREDICTIONS_MAGIC = b"FLWP"
+
+
+class BatchFormatError(ValueError):
+    '''
+    Тело запроса не соответствует заявленному формату
+    '''
+
+
+def _pack(magic, header, *arrays):
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return b"".join([magic, struct.pack("<I", len(header_bytes)), header_bytes,
+                     *(np.ascontiguousarray(array).tobytes() for array in arrays)])
+
+
+def _unpack(data, magic):
+    data = memoryview(data)
+    if len(data) < 8 or bytes(data[:4]) != magic:
+        raise BatchFormatError(f"Ожидается заголовок {magic.decode()}")
+    (header_len,) = struct.unpack("<I", data[4:8])
+    if len(data) < 8 + header_len:
+        raise BatchFormatError("Заголовок обрезан")
+    try:
+        header = json.loads(bytes(data[8:8 + header_len]).decode("utf-8"))
+    except ValueError as e:
+        raise BatchFormatError(f"Некорректный JSON в заголовке: {str(e)}")
+    if not isinstance(header, dict):
+        raise BatchFormatError("Заголовок должен быть JSON-объектом")
+    return header, data[8 + header_len:]
+
+
+def encode_matrix(X, columns):
+    '''
+    Кодирует матрицу признаков в формат application/x-flow-matrix:
+
+    * 4 байта — сигнатура FLWM
+    * uint32 little-endian — длина JSON-заголовка
+    * JSON-заголовок {"columns": [...], "rows": n}
+    * n * len(columns) значений float32 little-endian по строкам
+    '''
+    X = np.asarray(X, dtype="<f4")
+    return _pack(MATRIX_MAGIC, {"columns": list(columns), "rows": int(X.shape[0])}, X)
+
+
+def decode_matrix(data):
+    '''
+    Декодирует application/x-flow-matrix без копирования данных.
+    Возвращает матрицу float32 (только для чтения) и список колонок
+    '''
+    header, payload = _unpack(data, MATRIX_MAGIC)
+    columns, rows = header.get("columns"), header.get("rows")
+    if not isinstance(columns, list) or not isinstance(rows, int):
+        raise BatchFormatError("В заголовке нужны поля columns (список) и rows (число)")
+    if len(payload) != rows * len(columns) * 4:
+        raise BatchFormatError(f"Размер данных {len(payload)} байт не совпадает с {rows} x {len(columns)} float32")
+    return np.frombuffer(payload, dtype="<f4").reshape(rows, len(columns)), columns
+
+
+def encode_predictions(pred_idx, probs, class_names):
+    '''
+    Кодирует результат в формат application/x-flow-predictions:
+
+    * 4 байта — сигнатура FLWP
+    * uint32 little-endian — длина JSON-заголовка
+    * JSON-заголовок {"classes": [...], "rows": n, "label_dtype": "uint8" | "uint16"}
+    * n индексов классов
+    * n * len(classes) вероятностей float32 little-endian по строкам
+    '''
+    label_dtype = "uint8" if len(class_names) <= 256 else "uint16"
+    header = {"classes": [str(cls) for cls in class_names], "rows": int(len(pred_idx)), "label_dtype": label_dtype}
+    return _pack(PREDICTIONS_MAGIC, header,
+                 np.asarray(pred_idx).astype(np.dtype(label_dtype).newbyteorder("<")),
+                 np.asarray(probs, dtype="<f4"))
+
+
+def decode_predictions(data):
+    '''
+    Декодирует application/x-flow-predictions.
+    Возвращает индексы классов, матрицу вероятностей и список классов
+    '''
+    header, payload = _unpack(data, PREDICTIONS_MAGIC)
+    rows, classes = header["rows"], header["classes"]
+    label_dtype = np.dtype(header["label_dtype"]).newbyteorder("<")
+    labels_size = rows * label_dtype.itemsize
+    pred_idx = np.frombuffer(payload[:labels_size], dtype=label_dtype)
+    probs = np.frombuffer(payload[labels_size:], dtype="<f4").reshape(rows, len(classes))
+    return pred_idx, probs, classes
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise BatchFormatError("Форматы Arrow и Parquet требуют установленного пакета pyarrow")
+    return pyarrow
+
+
+def decode_arrow_table(data, content_type):
+    '''
+    Читает Arrow IPC (stream или file) или Parquet в таблицу pyarrow
+    '''
+    pa = _pyarrow()
+    try:
+        if content_type == PARQUET_CONTENT_TYPE:
+            import pyarrow.parquet as pq
+            return pq.read_table(pa.BufferReader(data))
+        if content_type == ARROW_FILE_CONTENT_TYPE:
+            return pa.ipc.open_file(pa.BufferReader(data)).read_all()
+        return pa.ipc.open_stream(pa.BufferReader(data)).read_all()
+    except pa.ArrowException as e:
+        raise BatchFormatError(f"Ошибка чтения {content_type}: {str(e)}")
+
+
+def table_to_matrix(table, selected_features):
+    '''
+    Собирает матрицу float32 из колонок таблицы Arrow в порядке selected_features:
+    каждая колонка копируется один раз прямо в итоговую матрицу, пропуски становятся NaN
+    '''
+    missing = [col for col in selected_features if col not in table.column_names]
+    if missing:
+        raise KeyError(missing)
+
+    X = np.empty((table.num_rows, len(selected_features)), dtype=np.float32)
+    for i, col in enumerate(selected_features):
+        column = table.column(col)
+        try:
+            X[:, i] = column.to_numpy()
+        except Exception as e:
+            raise BatchFormatError(f"Колонка {col} не приводится к float32: {str(e)}")
+    return X
+
+
+def encode_arrow_predictions(pred_idx, probs, class_names):
+    '''
+    Кодирует результат в Arrow IPC stream: колонка label_index (uint8 или uint16)
+    и по колонке float32 на вероятность каждого класса. Словарь классов — в метаданных схемы
+    '''
+    pa = _pyarrow()
+    label_dtype = np.uint8 if len(class_names) <= 256 else np.uint16
+    columns = {"label_index": pa.array(np.asarray(pred_idx, dtype=label_dtype))}
+    for i, cls in enumerate(class_names):
+        columns[str(cls)] = pa.array(np.ascontiguousarray(probs[:, i], dtype=np.float32))
+    table = pa.table(columns).replace_schema_metadata(
+        {"classes": json.dumps([str(cls) for cls in class_names], ensure_ascii=False)})
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def decode_batch(data, content_type, selected_features):
+    '''
+    Декодирует тело /predict_batch в матрицу float32 в порядке selected_features.
+    Если колонки матрицы уже идут в нужном порядке, данные не копируются.
+    При отсутствии признаков бросает KeyError со списком недостающих
+    '''
+    if content_type == MATRIX_CONTENT_TYPE:
+        X, columns = decode_matrix(data)
+        if columns == list(selected_features):
+            return X
+        missing = [col for col in selected_features if col not in columns]
+        if missing:
+            raise KeyError(missing)
+        return X[:, [columns.index(col) for col in selected_features]]
+
+    return table_to_matrix(decode_arrow_table(data, content_type), selected_features)
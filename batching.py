@@ -0,0 +1,88 @@
+import asyncio
+
+import numpy as np
+
+
+class QueueFullError(Exception):
+    '''
+    Очередь микробатчера заполнена, запрос нужно отклонить
+    '''
+
+
+class MicroBatcher:
+    '''
+    Собирает одиночные запросы, пришедшие одновременно, в один батч:
+
+    1. Каждый запрос кладет строку признаков в текущий батч и ждет future
+    2. Батч отправляется в модель, когда набралось max_batch_size строк
+    или прошло max_wait_us микросекунд с момента появления первой строки
+    3. score_fn вызывается один раз на батч в пуле потоков, чтобы не блокировать event loop
+    4. Результаты раздаются ожидающим запросам в исходном порядке
+
+    Если строк в очереди больше max_queue_depth, submit бросает QueueFullError
+    '''
+    def __init__(self, score_fn, max_batch_size=64, max_wait_us=2000, max_queue_depth=4096):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1_000_000
+        self.max_queue_depth = max_queue_depth
+        self._pending = []
+        self._timer = None
+        self._in_flight = 0
+        self._tasks = set()
+
+    @property
+    def in_flight(self):
+        '''
+        Количество строк, ожидающих или проходящих скоринг
+        '''
+        return self._in_flight
+
+    async def submit(self, row):
+        '''
+        Добавляет строку признаков в батч и ждет результат для нее
+        '''
+        if self._in_flight >= self.max_queue_depth:
+            raise QueueFullError(f"В очереди уже {self._in_flight} строк")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+        self._in_flight += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        try:
+            return await future
+        finally:
+            self._in_flight -= 1
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._score(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, batch):
+        rows = np.asarray([row for row, _ in batch], dtype=np.float32)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, self.score_fn, rows)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
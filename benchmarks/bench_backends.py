@@ -0,0 +1,51 @@
+'''
+Бенчмарк бэкендов инференса (config.MODEL_BACKEND): CPU-время на строку
+и строки в секунду при разных размерах батча.
+
+Запуск из корня проекта:
+    python benchmarks/bench_backends.py --rows 1 16 256 10000
+'''
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backends import BACKENDS, load_backend
+
+
+def measure(backend, X, repeats):
+    '''
+    Возвращает CPU-время и реальное время одного вызова в секундах
+    '''
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for _ in range(repeats):
+        backend.predict_proba(X)
+    return (time.process_time() - cpu_start) / repeats, (time.perf_counter() - wall_start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bundle", default="model/xgb_pipeline_bundle.pkl")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 16, 256, 10000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    bundle = joblib.load(args.bundle)
+    backends = [load_backend(name, bundle["model"]) for name in BACKENDS]
+
+    rng = np.random.default_rng(42)
+    print(f"{'rows':>6} | {'backend':>8} | {'cpu us/row':>10} | {'rows/s':>10}")
+    for n_rows in args.rows:
+        X = rng.uniform(0, 65535, size=(n_rows, len(bundle["selected_features"]))).astype(np.float32)
+        for name, backend in zip(BACKENDS, backends):
+            cpu, wall = measure(backend, X, args.repeats)
+            print(f"{n_rows:>6} | {name:>8} | {cpu / n_rows * 1e6:>10.1f} | {n_rows / wall:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
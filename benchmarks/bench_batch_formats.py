@@ -0,0 +1,78 @@
+'''
+Бенчмарк форматов батча: /predict_csv (текстовый CSV, JSON по строкам) против
+/predict_batch с матрицей float32, Arrow IPC и Parquet на входе и бинарным ответом.
+Размер тела запроса и ответа выводится вместе со временем.
+
+Запуск из корня проекта:
+    python benchmarks/bench_batch_formats.py --rows 100000
+'''
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import api
+from batch_formats import (MATRIX_CONTENT_TYPE, PREDICTIONS_CONTENT_TYPE, ARROW_STREAM_CONTENT_TYPE,
+                           PARQUET_CONTENT_TYPE, encode_matrix)
+from bench_csv_stream import make_frame
+
+
+def make_bodies(df):
+    '''
+    Один и тот же батч в каждом из форматов
+    '''
+    import pyarrow as pa
+
+    arrow = io.BytesIO()
+    table = pa.Table.from_pandas(df.astype(np.float32), preserve_index=False)
+    with pa.ipc.new_stream(arrow, table.schema) as writer:
+        writer.write_table(table)
+
+    parquet = io.BytesIO()
+    df.astype(np.float32).to_parquet(parquet, index=False)
+
+    return {"csv": df.to_csv(index=False).encode(),
+            "matrix": encode_matrix(df.to_numpy(), list(df.columns)),
+            "arrow": arrow.getvalue(),
+            "parquet": parquet.getvalue()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    api.load_model()
+    df = make_frame(api.selected_features, args.rows)
+    bodies = make_bodies(df)
+    client = TestClient(api.app)
+
+    requests = {"csv": lambda: client.post("/predict_csv", files={"file": ("bench.csv", bodies["csv"], "text/csv")}),
+                "matrix": lambda: client.post("/predict_batch", content=bodies["matrix"],
+                                              headers={"Content-Type": MATRIX_CONTENT_TYPE,
+                                                       "Accept": PREDICTIONS_CONTENT_TYPE}),
+                "arrow": lambda: client.post("/predict_batch", content=bodies["arrow"],
+                                             headers={"Content-Type": ARROW_STREAM_CONTENT_TYPE,
+                                                      "Accept": PREDICTIONS_CONTENT_TYPE}),
+                "parquet": lambda: client.post("/predict_batch", content=bodies["parquet"],
+                                               headers={"Content-Type": PARQUET_CONTENT_TYPE,
+                                                        "Accept": PREDICTIONS_CONTENT_TYPE})}
+
+    print(f"{'format':>8} | {'request, MB':>11} | {'response, MB':>12} | {'time, s':>7} | {'rows/s':>9}")
+    for name, send in requests.items():
+        start = time.perf_counter()
+        response = send()
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.text
+        print(f"{name:>8} | {len(bodies[name]) / 2**20:>11.2f} | {len(response.content) / 2**20:>12.2f} | "
+              f"{elapsed:>7.2f} | {args.rows / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+'''
+Бенчмарк микробатчинга /predict: пропускная способность и задержки
+одиночных запросов при разных max_batch_size и числе одновременных клиентов.
+Скоринг идет через api.score_rows с реальным бандлом модели.
+
+Запуск из корня проекта:
+    python benchmarks/bench_batching.py --concurrency 64 --requests 5000
+'''
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import api
+from batching import MicroBatcher
+
+
+async def run(batcher, rows, concurrency):
+    '''
+    Запускает concurrency клиентов, которые по очереди отправляют строки.
+    Возвращает общее время и список задержек каждого запроса
+    '''
+    latencies = []
+    queue = iter(rows)
+
+    async def client():
+        for row in queue:
+            start = time.perf_counter()
+            await batcher.submit(row)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--max-wait-us", type=int, default=2000)
+    args = parser.parse_args()
+
+    api.load_model()
+    rng = np.random.default_rng(42)
+    rows = rng.uniform(0, 65535, size=(args.requests, len(api.selected_features))).tolist()
+
+    print(f"{'batch':>5} | {'req/s':>8} | {'p50, ms':>8} | {'p99, ms':>8}")
+    for batch_size in args.batch_sizes:
+        batcher = MicroBatcher(api.score_rows, max_batch_size=batch_size,
+                               max_wait_us=args.max_wait_us, max_queue_depth=args.requests)
+        total, latencies = asyncio.run(run(batcher, rows, args.concurrency))
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        print(f"{batch_size:>5} | {args.requests / total:>8.0f} | {p50:>8.2f} | {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
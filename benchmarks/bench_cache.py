@@ -0,0 +1,67 @@
+'''
+Бенчмарк кэша предсказаний на синтетическом флуде: множество почти одинаковых
+потоков (один порт, одинаковые Init_Win_bytes и min_seg_size_forward, близкие скорости).
+Сравнивает скоринг без кэша и с кэшем (с квантованием скоростей) и выводит счетчики кэша.
+
+Запуск из корня проекта:
+    python benchmarks/bench_cache.py --rows 100000 --batch 1000
+'''
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backends import load_backend
+from prediction_cache import PredictionCache, CachedBackend
+
+QUANTIZATION = {"Bwd Packets/s": 100.0, "Fwd Packets/s": 100.0, "Fwd IAT Std": 100.0,
+                "Flow IAT Min": 10.0, "Fwd IAT Min": 10.0}
+
+
+def make_flood(selected_features, n_rows, n_patterns=20, seed=42):
+    '''
+    n_patterns шаблонов атаки, к скоростям и интервалам которых добавлен небольшой шум
+    '''
+    rng = np.random.default_rng(seed)
+    patterns = rng.uniform(0, 65535, size=(n_patterns, len(selected_features)))
+    X = patterns[rng.integers(0, n_patterns, size=n_rows)]
+    jitter = np.array([col in QUANTIZATION for col in selected_features])
+    X[:, jitter] += rng.normal(0, 5, size=(n_rows, jitter.sum()))
+    return X.astype(np.float32)
+
+
+def run(backend, X, batch):
+    start = time.perf_counter()
+    for i in range(0, len(X), batch):
+        backend.predict_proba(X[i:i + batch])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bundle", default="model/xgb_pipeline_bundle.pkl")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    bundle = joblib.load(args.bundle)
+    backend = load_backend("xgboost", bundle["model"])
+    X = make_flood(bundle["selected_features"], args.rows)
+
+    plain = run(backend, X, args.batch)
+    cache = PredictionCache(bundle["selected_features"], quantization=QUANTIZATION)
+    cached = run(CachedBackend(backend, cache), X, args.batch)
+
+    print(f"no cache:   {args.rows / plain:>10.0f} rows/s")
+    print(f"with cache: {args.rows / cached:>10.0f} rows/s")
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
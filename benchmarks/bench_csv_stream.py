@@ -0,0 +1,128 @@
+'''
+Бенчмарк потоковой обработки CSV: /predict_csv против /predict_csv_stream.
+Поднимает локальный uvicorn для каждого эндпоинта и замеряет время до первого
+результата, общее время и пиковую память процесса сервера (VmHWM, только Linux).
+
+Запуск из корня проекта:
+    python benchmarks/bench_csv_stream.py --rows 100000
+'''
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FEATURES = ['Destination Port', 'Init_Win_bytes_forward', 'Init_Win_bytes_backward',
+            'Bwd Packets/s', 'min_seg_size_forward', 'Fwd IAT Std',
+            'Flow IAT Min', 'Bwd Packet Length Min', 'Fwd Packets/s', 'Fwd IAT Min']
+
+sys.path.append(ROOT)
+from config import INPUT_RANGES
+
+
+def make_frame(features, n_rows, seed=42):
+    '''
+    Синтетический батч, который проходит проверку API: значения равномерно в диапазонах
+    INPUT_RANGES, для признаков с целыми границами — целые
+    '''
+    rng = np.random.default_rng(seed)
+    data = {}
+    for feature in features:
+        low, high = INPUT_RANGES.get(feature, (0.0, 1000.0))
+        values = rng.uniform(low, high, n_rows)
+        data[feature] = np.floor(values) if isinstance(low, int) else values
+    return pd.DataFrame(data)
+
+
+def write_csv(path, n_rows, seed=42):
+    '''
+    Записывает синтетический CSV с нужными признаками
+    '''
+    make_frame(FEATURES, n_rows, seed).to_csv(path, index=False)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers=1):
+    '''
+    Запускает uvicorn с api:app и ждет, пока сервер начнет принимать запросы
+    '''
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "api:app", "--port", str(port),
+                             "--workers", str(workers), "--log-level", "warning"],
+                            cwd=ROOT)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("uvicorn не запустился")
+
+
+def peak_rss_mb(pid):
+    '''
+    Пиковая резидентная память процесса в МБ (None вне Linux)
+    '''
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def run(endpoint, path):
+    '''
+    Отправляет файл и читает ответ потоком.
+    Возвращает время до первого байта, общее время и пик памяти сервера
+    '''
+    port = free_port()
+    proc = start_server(port)
+    try:
+        start = time.perf_counter()
+        first_byte = None
+        with open(path, "rb") as f, httpx.Client(timeout=None) as client:
+            with client.stream("POST", f"http://127.0.0.1:{port}{endpoint}",
+                               files={"file": ("bench.csv", f, "text/csv")}) as response:
+                assert response.status_code == 200, response.read()[:500]
+                for _ in response.iter_bytes():
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - start
+        total = time.perf_counter() - start
+        return first_byte, total, peak_rss_mb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.csv")
+        write_csv(path, args.rows)
+
+        print(f"{'endpoint':>20} | {'first result, ms':>16} | {'total, s':>8} | {'rows/s':>10} | {'peak RSS, MB':>12}")
+        for endpoint in ("/predict_csv", "/predict_csv_stream"):
+            first_byte, total, peak = run(endpoint, path)
+            print(f"{endpoint:>20} | {first_byte * 1000:>16.1f} | {total:>8.2f} | {args.rows / total:>10.0f} | {peak or 0:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+'''
+Бенчмарк извлечения потоков из pcap: синтетический захват с заданным числом потоков
+и пакетов на поток (часть потоков закрывается FIN, часть остается до таймаута).
+Выводит пакеты в секунду для разбора и сборки потоков отдельно и вместе со скорингом,
+пиковое число потоков в таблице и оценку ее памяти (плюс пик tracemalloc для сравнения).
+
+Запуск из корня проекта:
+    python benchmarks/bench_flow_meter.py --flows 20000 --packets-per-flow 10
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import api
+from flow_meter import FlowMeter, read_pcap, write_pcap, build_frame, classify_flows, PROTO_UDP, TCP_FIN
+
+
+def synthetic_packets(flows, packets_per_flow, seed=42):
+    '''
+    Пакеты перемешанных потоков, упорядоченные по времени
+    '''
+    rng = np.random.default_rng(seed)
+    starts = np.sort(rng.uniform(0, 60, flows)) * 1_000_000
+    events = []
+    for i, start in enumerate(starts.astype(np.int64)):
+        src, dst = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", "192.168.0.1"
+        sport, dport = 1024 + i % 60000, int(rng.choice([22, 53, 80, 443, 8080]))
+        proto = PROTO_UDP if dport == 53 else 6
+        ts = start + np.cumsum(rng.integers(50, 50_000, packets_per_flow))
+        for j, t in enumerate(ts):
+            forward = j % 2 == 0
+            last = j >= packets_per_flow - 2 and i % 2 == 0
+            frame = build_frame(*((src, dst, sport, dport) if forward else (dst, src, dport, sport)), proto=proto,
+                                payload_len=int(rng.integers(0, 1400)), window=8192 if forward else 4096,
+                                flags=TCP_FIN if last and proto != PROTO_UDP else 0)
+            events.append((int(t), frame))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flows", type=int, default=20000)
+    parser.add_argument("--packets-per-flow", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".pcap", delete=False) as f:
+        write_pcap(f, synthetic_packets(args.flows, args.packets_per_flow))
+        path = f.name
+
+    try:
+        print(f"Захват: {args.flows} потоков, {os.path.getsize(path) / 2**20:.1f} MB")
+
+        meter = FlowMeter()
+        tracemalloc.start()
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            flows = sum(1 for _ in meter.process(read_pcap(f)))
+        elapsed = time.perf_counter() - start
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = meter.stats()
+        print(f"Сборка потоков:  {stats['packets'] / elapsed:>9.0f} пакетов/с, {flows} потоков "
+              f"(под tracemalloc, реальная скорость выше)")
+        print(f"Таблица потоков: пик {stats['peak_flows']} потоков, оценка {meter.table_bytes() / 2**20:.1f} MB, "
+              f"tracemalloc {traced_peak / 2**20:.1f} MB")
+
+        meter = FlowMeter()
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            flows = sum(1 for _ in meter.process(read_pcap(f)))
+        elapsed = time.perf_counter() - start
+        print(f"Сборка потоков:  {meter.packets / elapsed:>9.0f} пакетов/с")
+
+        api.load_model()
+        meter = FlowMeter()
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            scored = sum(len(batch) for batch, _ in classify_flows(meter.process(read_pcap(f)), api.registry.primary,
+                                                                   api.selected_features))
+        elapsed = time.perf_counter() - start
+        print(f"Со скорингом:    {meter.packets / elapsed:>9.0f} пакетов/с, {scored / elapsed:.0f} потоков/с")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+'''
+Микробенчмарк инференса: два прохода бустера (predict + predict_proba)
+против одного прохода через model_utils.predict_from_df.
+
+Запуск из корня проекта:
+    python benchmarks/bench_inference.py --rows 1 1000 100000
+'''
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model_utils import predict_from_df
+
+
+def make_flows(selected_features, n_rows, seed=42):
+    '''
+    Генерирует синтетические потоки с колонками selected_features
+    '''
+    rng = np.random.default_rng(seed)
+    data = rng.uniform(0, 65535, size=(n_rows, len(selected_features)))
+    return pd.DataFrame(data, columns=selected_features)
+
+
+def double_pass(df, model, label_encoder, selected_features):
+    '''
+    Прежняя схема: бустер вызывается дважды
+    '''
+    df = df[selected_features]
+    preds = model.predict(df)
+    probs = model.predict_proba(df)
+    labels = label_encoder.inverse_transform(preds)
+    return labels, probs, probs.max(axis=1)
+
+
+def measure(func, df, bundle, repeats):
+    '''
+    Возвращает медианное время одного вызова в секундах
+    '''
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(df, bundle["model"], bundle["label_encoder"], bundle["selected_features"])
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bundle", default="model/xgb_pipeline_bundle.pkl")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 1000, 100000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    bundle = joblib.load(args.bundle)
+
+    print(f"{'rows':>8} | {'variant':>11} | {'ms/request':>10} | {'rows/s':>12}")
+    for n_rows in args.rows:
+        df = make_flows(bundle["selected_features"], n_rows)
+        for name, func in (("double_pass", double_pass), ("single_pass", predict_from_df)):
+            seconds = measure(func, df, bundle, args.repeats)
+            print(f"{n_rows:>8} | {name:>11} | {seconds * 1000:>10.3f} | {n_rows / seconds:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
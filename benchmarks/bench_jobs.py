@@ -0,0 +1,111 @@
+'''
+Бенчмарк фоновых заданий: большой CSV через /predict_csv (один запрос)
+и через /jobs (пул процессов, опрос статуса и чтение результатов страницами).
+Пока файл скорится, другой клиент раз в 10 мс дергает /health — по его задержке видно,
+свободен ли event loop для остальных запросов.
+
+Запуск из корня проекта:
+    python benchmarks/bench_jobs.py --rows 1000000
+'''
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import httpx
+import numpy as np
+
+from bench_csv_stream import free_port, start_server, write_csv
+
+
+class HealthProbe(threading.Thread):
+    '''
+    Фоновый клиент: задержки /health, пока не остановлен
+    '''
+    def __init__(self, base):
+        super().__init__(daemon=True)
+        self.base = base
+        self.latencies = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        with httpx.Client(timeout=600) as client:
+            while not self.stopped.is_set():
+                start = time.perf_counter()
+                client.get(f"{self.base}/health")
+                self.latencies.append(time.perf_counter() - start)
+                time.sleep(0.01)
+
+
+def predict_csv(client, base, path):
+    with open(path, "rb") as f:
+        response = client.post(f"{base}/predict_csv", params={"shape": "columnar"},
+                               files={"file": ("bench.csv", f, "text/csv")})
+    assert response.status_code == 200, response.text
+    return len(response.json()["results"]["predictions"])
+
+
+def predict_job(client, base, path):
+    with open(path, "rb") as f:
+        response = client.post(f"{base}/jobs", files={"file": ("bench.csv", f, "text/csv")})
+    assert response.status_code == 202, response.text
+    job_id = response.json()["job_id"]
+
+    rows, offset = 0, 0
+    while True:
+        response = client.get(f"{base}/jobs/{job_id}")
+        assert response.status_code == 200, response.text
+        status = response.json()
+        assert status["status"] != "failed", status["error"]
+        response = client.get(f"{base}/jobs/{job_id}/results", params={"offset": offset, "limit": 50_000,
+                                                                       "shape": "columnar"})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        rows += len(page["results"]["predictions"])
+        offset = page["next_offset"]
+        if status["status"] == "done" and offset >= status["rows_done"]:
+            client.delete(f"{base}/jobs/{job_id}")
+            return rows
+        if not page["results"]["predictions"]:
+            time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.csv")
+        write_csv(path, args.rows)
+        print(f"CSV: {args.rows} строк, {os.path.getsize(path) / 2**20:.1f} MB")
+
+        port = free_port()
+        base = f"http://127.0.0.1:{port}"
+        proc = start_server(port)
+        try:
+            with httpx.Client(timeout=600) as client:
+                while client.get(f"{base}/ready").status_code != 200:
+                    time.sleep(0.1)
+
+                print(f"{'mode':>12} | {'time, s':>7} | {'rows/s':>9} | {'/health p50, ms':>15} | {'/health max, ms':>15}")
+                for name, fn in (("predict_csv", predict_csv), ("jobs", predict_job)):
+                    probe = HealthProbe(base)
+                    probe.start()
+                    start = time.perf_counter()
+                    rows = fn(client, base, path)
+                    elapsed = time.perf_counter() - start
+                    probe.stopped.set()
+                    probe.join()
+                    assert rows == args.rows
+                    latencies = np.array(probe.latencies) * 1000
+                    print(f"{name:>12} | {elapsed:>7.2f} | {rows / elapsed:>9.0f} | "
+                          f"{np.percentile(latencies, 50):>15.1f} | {latencies.max():>15.1f}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
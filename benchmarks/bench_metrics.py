@@ -0,0 +1,85 @@
+'''
+Бенчмарк накладных расходов метрик: стоимость замера этапа (stage), учета одиночного
+предсказания и батча, а также ASGI-мидлвара на один запрос — в сравнении с «пустым» приложением.
+
+Запуск из корня проекта:
+    python benchmarks/bench_metrics.py --iterations 200000
+'''
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metrics
+from metrics import stage, record_prediction, record_predictions, MetricsMiddleware
+
+
+def per_call_ns(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+async def asgi_per_call_ns(app, iterations):
+    scope = {"type": "http", "method": "POST", "path": "/predict", "app": FakeApp}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+class Route:
+    path, name, methods = "/predict", "predict", {"POST"}
+
+
+class FakeApp:
+    router = type("Router", (), {"routes": [Route()]})
+
+
+async def empty_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    def timed_stage():
+        with stage("bench", "predict"):
+            pass
+
+    classes = [f"class_{i}" for i in range(15)]
+    batch = np.random.default_rng(42).integers(0, 15, 10_000)
+
+    print(f"{'operation':>32} | {'ns/op':>8}")
+    print(f"{'stage() context manager':>32} | {per_call_ns(timed_stage, n):>8.0f}")
+    print(f"{'record_prediction (1 row)':>32} | {per_call_ns(lambda: record_prediction('bench', 'BENIGN'), n):>8.0f}")
+    print(f"{'record_predictions (10k rows)':>32} | "
+          f"{per_call_ns(lambda: record_predictions('bench', batch, classes), n // 100):>8.0f}")
+
+    bare = asyncio.run(asgi_per_call_ns(empty_app, n))
+    wrapped = asyncio.run(asgi_per_call_ns(MetricsMiddleware(empty_app), n))
+    print(f"{'ASGI app without middleware':>32} | {bare:>8.0f}")
+    print(f"{'ASGI app with MetricsMiddleware':>32} | {wrapped:>8.0f}")
+    print(f"\nНакладные расходы мидлвара: {wrapped - bare:.0f} нс на запрос; "
+          f"/metrics: {len(metrics.REGISTRY.render())} байт")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+'''
+Бенчмарк сериализации ответа для большого батча: прежний путь (float() на каждое число,
+jsonable_encoder FastAPI и json.dumps) против tolist + orjson по строкам
+и колоночного формата (shape=columnar), где матрица вероятностей пишется напрямую из NumPy.
+Во второй части — строки в секунду для /predict_csv целиком в обоих форматах.
+
+Запуск из корня проекта:
+    python benchmarks/bench_serialization.py --rows 100000
+'''
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import api
+from model_utils import build_results, build_columnar
+from serialization import dumps
+from bench_csv_stream import make_frame
+
+
+def legacy_serialize(labels, probs, confidences, class_names):
+    class_names = [str(cls) for cls in class_names]
+    results = [{"prediction": str(label),
+                "confidence": float(conf),
+                "probabilities": dict(zip(class_names, map(float, prob)))}
+               for label, prob, conf in zip(labels, probs, confidences)]
+    return json.dumps(jsonable_encoder({"results": results}), ensure_ascii=False).encode("utf-8")
+
+
+def rows_serialize(labels, probs, confidences, class_names):
+    return dumps({"results": build_results(labels, probs, confidences, class_names)})
+
+
+def columnar_serialize(labels, probs, confidences, class_names):
+    return dumps({"results": build_columnar(labels, probs, confidences, class_names)})
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    api.load_model()
+    X = make_frame(api.selected_features, args.rows).to_numpy(dtype=np.float32)
+    probs = api.registry.primary.predict_proba(X)
+    pred_idx = probs.argmax(axis=1)
+    labels = api.registry.primary.class_names[pred_idx]
+    confidences = probs[np.arange(len(pred_idx)), pred_idx]
+    class_names = api.registry.primary.class_keys
+
+    print(f"Сериализация {args.rows} строк")
+    print(f"{'mode':>9} | {'time, s':>7} | {'rows/s':>10} | {'size, MB':>8}")
+    for name, fn in (("legacy", legacy_serialize), ("rows", rows_serialize), ("columnar", columnar_serialize)):
+        elapsed, body = best_of(lambda: fn(labels, probs, confidences, class_names), args.repeat)
+        print(f"{name:>9} | {elapsed:>7.3f} | {args.rows / elapsed:>10.0f} | {len(body) / 2**20:>8.2f}")
+
+    csv = pd.DataFrame(X, columns=api.selected_features).to_csv(index=False).encode()
+    client = TestClient(api.app)
+    print(f"\n/predict_csv, {args.rows} строк")
+    print(f"{'shape':>9} | {'time, s':>7} | {'rows/s':>10}")
+    for shape in ("rows", "columnar"):
+        elapsed, response = best_of(lambda: client.post(f"/predict_csv?shape={shape}",
+                                                        files={"file": ("bench.csv", csv, "text/csv")}), args.repeat)
+        assert response.status_code == 200, response.text
+        print(f"{shape:>9} | {elapsed:>7.3f} | {args.rows / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+'''
+Бенчмарк скоринга одного потока: путь через pandas (DataFrame, rename, astype,
+inverse_transform) против FastPredictor. Накладные расходы вне модели замеряются
+отдельно: вызов бустера подменяется готовой матрицей вероятностей, чтобы шум
+самого бустера не смешивался с затратами на подготовку данных.
+
+Запуск из корня проекта:
+    python benchmarks/bench_single.py --repeats 5000
+'''
+import argparse
+import copy
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import api
+from model_utils import predict_from_df
+
+PAYLOAD = api.InputData(Destination_Port=443, Init_Win_bytes_forward=8192, Init_Win_bytes_backward=8192,
+                        Bwd_Packets_s=1500.0, min_seg_size_forward=40, Fwd_IAT_Std=5000.0,
+                        Flow_IAT_Min=1000.0, Bwd_Packet_Length_Min=60, Fwd_Packets_s=2000.0, Fwd_IAT_Min=1000.0)
+
+
+class StubModel:
+    '''
+    Модель, которая сразу возвращает готовые вероятности
+    '''
+    def __init__(self, probs):
+        self.probs = probs
+
+    def predict_proba(self, X):
+        return self.probs
+
+
+def pandas_path(data, model=None):
+    model = model or api.registry.primary.model
+    df = pd.DataFrame([data.model_dump()]).rename(columns=api.FEATURE_NAMES)
+    df = df.astype({col: float for col in df.columns})
+    return predict_from_df(df, model, api.registry.primary.label_encoder, api.selected_features)
+
+
+def measure(func, arg, repeats):
+    '''
+    Медианное время одного вызова в микросекундах
+    '''
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        func(arg)
+        timings[i] = time.perf_counter() - start
+    return float(np.median(timings)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5000)
+    args = parser.parse_args()
+
+    api.load_model()
+    fast_predictor = api.registry.primary.fast_predictor
+    row = np.array([[getattr(PAYLOAD, name) for name in fast_predictor.field_names]], dtype=np.float32)
+    probs = fast_predictor.predict_probs(row)
+
+    stub_model = StubModel(probs)
+    stub_fast = copy.copy(fast_predictor)
+    stub_fast.predict_probs = lambda X: probs
+
+    print(f"booster only: {measure(fast_predictor.predict_probs, row, args.repeats):.1f} us")
+    print(f"{'variant':>8} | {'total, us':>10} | {'overhead, us':>12}")
+    variants = (("pandas", pandas_path, lambda data: pandas_path(data, stub_model)),
+                ("fast", fast_predictor.predict_one, stub_fast.predict_one))
+    for name, func, overhead_func in variants:
+        total = measure(func, PAYLOAD, args.repeats)
+        overhead = measure(overhead_func, PAYLOAD, args.repeats)
+        print(f"{name:>8} | {total:>10.1f} | {overhead:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+'''
+Бенчмарк холодного старта API: время от запуска процесса uvicorn
+до ответа /health, до готовности /ready и до первого успешного /predict.
+Результаты можно дописывать в JSON-файл, чтобы сравнивать релизы.
+
+Запуск из корня проекта:
+    python benchmarks/bench_startup.py --runs 5 --output startup.json
+'''
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+from bench_csv_stream import ROOT, free_port
+from bench_workers import PAYLOAD
+
+
+def wait_for(client, method, url, deadline, **kwargs):
+    '''
+    Повторяет запрос, пока он не вернет 200. Возвращает момент успешного ответа
+    '''
+    while time.perf_counter() < deadline:
+        try:
+            if client.request(method, url, **kwargs).status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{url} не ответил вовремя")
+
+
+def cold_start(timeout=120):
+    '''
+    Один холодный старт. Возвращает словарь с временами в секундах
+    '''
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+                            cwd=ROOT)
+    try:
+        deadline = start + timeout
+        with httpx.Client(timeout=5) as client:
+            health = wait_for(client, "GET", f"{base}/health", deadline)
+            ready = wait_for(client, "GET", f"{base}/ready", deadline)
+            first = wait_for(client, "POST", f"{base}/predict", deadline, json=PAYLOAD)
+            load_time = client.get(f"{base}/ready").json()["load_time_s"]
+        return {"health_s": health - start,
+                "ready_s": ready - start,
+                "first_prediction_s": first - start,
+                "model_load_s": load_time}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="JSON-файл, в который дописывается результат запуска")
+    args = parser.parse_args()
+
+    runs = [cold_start() for _ in range(args.runs)]
+    summary = {key: float(np.median([run[key] for run in runs])) for key in runs[0]}
+
+    for key, value in summary.items():
+        print(f"{key:>20}: {value * 1000:8.1f} ms (median of {args.runs})")
+
+    if args.output:
+        record = {"revision": git_revision(), "timestamp": time.time(), "median": summary, "runs": runs}
+        try:
+            with open(args.output, encoding="utf-8") as f:
+                history = json.load(f)
+        except FileNotFoundError:
+            history = []
+        history.append(record)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
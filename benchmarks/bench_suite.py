@@ -0,0 +1,304 @@
+'''
+Воспроизводимый набор бенчмарков сервиса скоринга на синтетических потоках
+со схемой selected_features (1, 1k, 100k и 10M строк по умолчанию):
+
+* predict_from_df — пропускная способность модели в процессе (строки в секунду)
+* /predict — p50/p99 задержки и запросы в секунду при разной конкурентности
+* /predict_csv — строки в секунду и пиковая память (VmHWM) сервера на каждый размер
+
+Все HTTP-замеры идут против локального uvicorn. Результат сохраняется в JSON
+вместе с ревизией git и окружением; --compare печатает изменения относительно прошлого прогона.
+
+Запуск из корня проекта:
+    python benchmarks/bench_suite.py --output bench_results.json
+    python benchmarks/bench_suite.py --sizes 1 1000 100000 --compare bench_results.json
+'''
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from bench_csv_stream import ROOT, FEATURES, free_port, start_server, peak_rss_mb
+from bench_startup import git_revision
+
+sys.path.append(ROOT)
+
+# Признаки, которые в данных CICFlowMeter целочисленные (в InputData — StrictInt)
+INT_FEATURES = {"Destination Port", "Init_Win_bytes_forward", "Init_Win_bytes_backward",
+                "min_seg_size_forward", "Bwd Packet Length Min"}
+CSV_WRITE_CHUNK = 1_000_000
+
+
+def make_flows(n_rows, seed=42):
+    '''
+    Синтетические потоки: порты из частых сервисов и эфемерного диапазона, типичные окна TCP,
+    скорости и интервалы с логнормальным разбросом (как у реального трафика)
+    '''
+    rng = np.random.default_rng(seed)
+    ports = np.array([80, 443, 22, 21, 53, 8080, 3389, 445, 139, 123])
+    windows = np.array([-1, 0, 229, 256, 8192, 29200, 65535])
+    data = {"Destination Port": np.where(rng.random(n_rows) < 0.8, rng.choice(ports, n_rows),
+                                         rng.integers(1024, 65536, n_rows)),
+            "Init_Win_bytes_forward": rng.choice(windows, n_rows),
+            "Init_Win_bytes_backward": rng.choice(windows, n_rows),
+            "Bwd Packets/s": rng.lognormal(3, 3, n_rows),
+            "min_seg_size_forward": rng.choice([20, 32, 40], n_rows),
+            "Fwd IAT Std": np.where(rng.random(n_rows) < 0.3, 0.0, rng.lognormal(9, 3, n_rows)),
+            "Flow IAT Min": rng.lognormal(4, 3, n_rows),
+            "Bwd Packet Length Min": np.where(rng.random(n_rows) < 0.5, 0, rng.integers(0, 1460, n_rows)),
+            "Fwd Packets/s": rng.lognormal(3, 3, n_rows),
+            "Fwd IAT Min": rng.lognormal(4, 3, n_rows)}
+    return pd.DataFrame({col: np.round(data[col], 3) for col in FEATURES})
+
+
+def write_flows_csv(path, n_rows, seed=42):
+    '''
+    Пишет CSV чанками, чтобы 10M строк не собирались в памяти целиком.
+    Уже существующий файл переиспользуется (данные детерминированы по seed)
+    '''
+    if os.path.exists(path):
+        return path
+    tmp_path = f"{path}.tmp"
+    for i, start in enumerate(range(0, n_rows, CSV_WRITE_CHUNK)):
+        chunk = make_flows(min(CSV_WRITE_CHUNK, n_rows - start), seed + i)
+        chunk.to_csv(tmp_path, index=False, header=i == 0, mode="w" if i == 0 else "a")
+    os.replace(tmp_path, path)
+    return path
+
+
+def bench_predict_from_df(sizes, repeat):
+    '''
+    Пропускная способность model_utils.predict_from_df без HTTP
+    '''
+    import joblib
+    from config import MODEL_BUNDLE_PATH
+    from model_utils import predict_from_df
+
+    bundle = joblib.load(MODEL_BUNDLE_PATH)
+    model, label_encoder, selected = bundle["model"], bundle["label_encoder"], bundle["selected_features"]
+    predict_from_df(make_flows(10)[selected], model, label_encoder, selected)
+
+    results = []
+    for n_rows in sizes:
+        df = make_flows(n_rows)[selected]
+        times = []
+        for _ in range(1 if n_rows >= 1_000_000 else repeat):
+            start = time.perf_counter()
+            predict_from_df(df, model, label_encoder, selected)
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        results.append({"rows": n_rows, "seconds": best, "rows_per_s": n_rows / best})
+        print(f"predict_from_df {n_rows:>10} rows: {best * 1000:>10.2f} ms, {n_rows / best:>12.0f} rows/s")
+    return results
+
+
+def payloads(n=1000):
+    '''
+    Тела /predict из синтетических потоков (поля InputData, целые признаки — int)
+    '''
+    import api
+
+    records = []
+    for row in make_flows(n, seed=7).to_dict("records"):
+        records.append({api.FIELD_NAMES.get(col, col): int(value) if col in INT_FEATURES else float(value)
+                        for col, value in row.items()})
+    return records
+
+
+async def load_predict(url, concurrency, duration, bodies):
+    '''
+    concurrency клиентов шлют /predict в течение duration секунд.
+    Возвращает задержки успешных запросов (секунды), число ошибок и фактическую длительность
+    '''
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post(url, json=bodies[i % len(bodies)])
+                if response.status_code == 200 and "error" not in response.json():
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+                i += concurrency
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        return latencies, errors, time.perf_counter() - start
+
+
+def wait_ready(base, timeout=120):
+    deadline = time.time() + timeout
+    with httpx.Client(timeout=5) as client:
+        while time.time() < deadline:
+            try:
+                if client.get(f"{base}/ready").status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+    raise RuntimeError("Сервер не стал готов")
+
+
+def bench_predict(concurrency_levels, duration):
+    '''
+    p50/p99 задержки /predict на одном воркере uvicorn при разной конкурентности
+    '''
+    bodies = payloads()
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = start_server(port)
+    results = []
+    try:
+        wait_ready(base)
+        asyncio.run(load_predict(f"{base}/predict", 4, 1, bodies))
+        for concurrency in concurrency_levels:
+            latencies, errors, elapsed = asyncio.run(load_predict(f"{base}/predict", concurrency, duration, bodies))
+            latencies = np.array(latencies) * 1000
+            result = {"concurrency": concurrency,
+                      "requests": len(latencies),
+                      "errors": errors,
+                      "requests_per_s": len(latencies) / elapsed,
+                      "p50_ms": float(np.percentile(latencies, 50)),
+                      "p99_ms": float(np.percentile(latencies, 99)),
+                      "max_ms": float(latencies.max())}
+            results.append(result)
+            print(f"/predict concurrency {concurrency:>4}: {result['requests_per_s']:>8.0f} req/s, "
+                  f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, errors {errors}")
+    finally:
+        proc.terminate()
+        proc.wait()
+    return results
+
+
+def bench_predict_csv(sizes, data_dir):
+    '''
+    /predict_csv (колоночный ответ) на свежем сервере для каждого размера:
+    строки в секунду и пиковая резидентная память процесса сервера
+    '''
+    results = []
+    for n_rows in sizes:
+        path = write_flows_csv(os.path.join(data_dir, f"flows_{n_rows}.csv"), n_rows)
+        port = free_port()
+        base = f"http://127.0.0.1:{port}"
+        proc = start_server(port)
+        try:
+            wait_ready(base)
+            baseline_rss = peak_rss_mb(proc.pid)
+            start = time.perf_counter()
+            with open(path, "rb") as f, httpx.Client(timeout=None) as client:
+                response = client.post(f"{base}/predict_csv", params={"shape": "columnar"},
+                                       files={"file": ("flows.csv", f, "text/csv")})
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 200, response.text[:500]
+            assert len(response.json()["results"]["predictions"]) == n_rows
+            result = {"rows": n_rows,
+                      "file_mb": os.path.getsize(path) / 2**20,
+                      "seconds": elapsed,
+                      "rows_per_s": n_rows / elapsed,
+                      "idle_rss_mb": baseline_rss,
+                      "peak_rss_mb": peak_rss_mb(proc.pid)}
+            results.append(result)
+            print(f"/predict_csv {n_rows:>10} rows: {elapsed:>8.2f} s, {result['rows_per_s']:>10.0f} rows/s, "
+                  f"peak RSS {result['peak_rss_mb'] or 0:.0f} MB")
+        finally:
+            proc.terminate()
+            proc.wait()
+    return results
+
+
+def environment():
+    import xgboost
+
+    return {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "xgboost": xgboost.__version__}
+
+
+def compare(current, baseline_path):
+    '''
+    Печатает изменения ключевых метрик относительно прошлого прогона (последней записи в файле)
+    '''
+    with open(baseline_path, encoding="utf-8") as f:
+        history = json.load(f)
+    baseline = history[-1] if isinstance(history, list) else history
+    print(f"\nСравнение с {baseline.get('revision')} ({time.ctime(baseline.get('timestamp', 0))}):")
+
+    for section, key, metric, higher_is_better in (("predict_from_df", "rows", "rows_per_s", True),
+                                                    ("predict", "concurrency", "p50_ms", False),
+                                                    ("predict", "concurrency", "p99_ms", False),
+                                                    ("predict", "concurrency", "requests_per_s", True),
+                                                    ("predict_csv", "rows", "rows_per_s", True),
+                                                    ("predict_csv", "rows", "peak_rss_mb", False)):
+        old = {run[key]: run for run in baseline["results"].get(section, [])}
+        for run in current["results"].get(section, []):
+            if run[key] not in old or not old[run[key]].get(metric) or run.get(metric) is None:
+                continue
+            change = run[metric] / old[run[key]][metric] - 1
+            worse = change < 0 if higher_is_better else change > 0
+            flag = "  <- хуже" if worse and abs(change) > 0.1 else ""
+            print(f"  {section:>15} {key}={run[key]:<10} {metric:>14}: "
+                  f"{old[run[key]][metric]:>12.2f} -> {run[metric]:>12.2f} ({change:+.1%}){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 1_000, 100_000, 10_000_000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=10, help="длительность нагрузки /predict на уровень, с")
+    parser.add_argument("--repeat", type=int, default=5, help="повторы predict_from_df (берется лучший)")
+    parser.add_argument("--data-dir", help="каталог для синтетических CSV (переиспользуются между прогонами)")
+    parser.add_argument("--skip", nargs="*", default=[], choices=["predict_from_df", "predict", "predict_csv"])
+    parser.add_argument("--output", help="JSON-файл, в который дописывается результат прогона")
+    parser.add_argument("--compare", help="JSON-файл прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    record = {"revision": git_revision(),
+              "timestamp": time.time(),
+              "environment": environment(),
+              "parameters": {"sizes": args.sizes, "concurrency": args.concurrency, "duration_s": args.duration},
+              "results": {}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        if "predict_from_df" not in args.skip:
+            record["results"]["predict_from_df"] = bench_predict_from_df(args.sizes, args.repeat)
+        if "predict" not in args.skip:
+            record["results"]["predict"] = bench_predict(args.concurrency, args.duration)
+        if "predict_csv" not in args.skip:
+            record["results"]["predict_csv"] = bench_predict_csv(args.sizes, data_dir)
+
+    if args.compare:
+        compare(record, args.compare)
+
+    if args.output:
+        try:
+            with open(args.output, encoding="utf-8") as f:
+                history = json.load(f)
+        except FileNotFoundError:
+            history = []
+        history.append(record)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+'''
+Бенчмарк проверки входных батчей (validation.py) против скоринга тех же строк:
+разбор столбцов через pandas (to_numeric + astype, без проверок) и через to_matrix, validate_matrix
+в режимах reject и mask и вызов модели. Доля строк с ошибками (NaN, inf, текст,
+значения вне FEATURE_BOUNDS) задается --invalid.
+
+Запуск из корня проекта:
+    python benchmarks/bench_validation.py --rows 1000000 --invalid 0.01
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import api
+from config import FEATURE_BOUNDS, VALIDATION_MAX_ERRORS
+from validation import to_matrix, validate_matrix
+from bench_csv_stream import make_frame as valid_frame
+
+
+def make_frame(features, rows, invalid, seed=42):
+    '''
+    Синтетический батч в диапазонах INPUT_RANGES с долей invalid испорченных строк
+    '''
+    rng = np.random.default_rng(seed)
+    df = valid_frame(features, rows, seed)
+
+    bad = rng.choice(rows, int(rows * invalid), replace=False)
+    kinds = np.array_split(bad, 4)
+    df.iloc[kinds[0], 0] = np.nan
+    df.iloc[kinds[1], 1] = np.inf
+    df.iloc[kinds[2], 2] = -2
+    if len(kinds[3]):
+        df[features[3]] = df[features[3]].astype(object)
+        df.iloc[kinds[3], 3] = "n/a"
+    return df
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--invalid", type=float, default=0.01, help="доля строк с ошибками")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    api.load_model()
+    features = api.selected_features
+    version = api.registry.primary
+    df = make_frame(features, args.rows, args.invalid)
+    X, not_number = to_matrix(df, features)
+
+    stages = [("pandas to_numeric", lambda: df[features].apply(pd.to_numeric, errors="coerce").astype(float)),
+              ("to_matrix", lambda: to_matrix(df, features)),
+              ("validate reject", lambda: validate_matrix(X, features, FEATURE_BOUNDS, "reject",
+                                                          VALIDATION_MAX_ERRORS, not_number)),
+              ("validate mask", lambda: validate_matrix(X, features, FEATURE_BOUNDS, "mask",
+                                                        VALIDATION_MAX_ERRORS, not_number))]
+    checked, report = validate_matrix(X, features, FEATURE_BOUNDS, "reject", VALIDATION_MAX_ERRORS, not_number)
+    stages.append(("predict_proba", lambda: version.predict_proba(checked)))
+
+    print(f"{args.rows} строк, строк с ошибками: {report['rows_invalid']}")
+    print(f"{'stage':>22} | {'time, s':>7} | {'rows/s':>11}")
+    timings = {}
+    for name, fn in stages:
+        elapsed, _ = best_of(fn, args.repeat)
+        timings[name] = elapsed
+        print(f"{name:>22} | {elapsed:>7.3f} | {args.rows / elapsed:>11.0f}")
+
+    share = (timings["to_matrix"] + timings["validate reject"]) / timings["predict_proba"]
+    print(f"\nПроверка (to_matrix + validate reject) от времени скоринга: {share:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+'''
+Нагрузочный тест многопроцессного режима: пропускная способность /predict
+и память воркеров uvicorn при разном числе воркеров.
+
+Память считается как сумма PSS (proportional set size) всех процессов сервера:
+страницы, отображенные из общего хранилища модели, делятся между воркерами
+и учитываются в PSS пропорционально. Только Linux.
+
+Для каждого числа воркеров (по умолчанию 1, 2 и число ядер) выводятся измеренные запросы в секунду,
+ускорение относительно первого прогона, бэкенд инференса из /ready и суммарный PSS.
+
+Запуск из корня проекта (хранилище модели должно быть экспортировано заранее):
+    python model_store.py model/xgb_pipeline_bundle.pkl model/xgb_pipeline_store
+    python benchmarks/bench_workers.py --concurrency 64 --duration 10
+'''
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from bench_csv_stream import free_port, start_server
+
+PAYLOAD = {"Destination_Port": 443, "Init_Win_bytes_forward": 8192, "Init_Win_bytes_backward": 8192,
+           "Bwd_Packets_s": 1500.0, "min_seg_size_forward": 40, "Fwd_IAT_Std": 5000.0,
+           "Flow_IAT_Min": 1000.0, "Bwd_Packet_Length_Min": 60, "Fwd_Packets_s": 2000.0, "Fwd_IAT_Min": 1000.0}
+
+
+def process_tree(pid):
+    '''
+    pid процесса и всех его потомков
+    '''
+    pids = [pid]
+    for child in pids:
+        try:
+            with open(f"/proc/{child}/task/{child}/children") as f:
+                pids += [int(p) for p in f.read().split()]
+        except OSError:
+            pass
+    return pids
+
+
+def total_pss_mb(pid):
+    '''
+    Суммарный PSS процесса и его потомков в МБ (None вне Linux)
+    '''
+    total = 0
+    for child in process_tree(pid):
+        try:
+            with open(f"/proc/{child}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1])
+        except OSError:
+            return None
+    return total / 1024
+
+
+async def wait_ready(url, timeout=60):
+    '''
+    Ждет, пока сервер загрузит модель и начнет отвечать
+    '''
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                if (await client.post(url, json=PAYLOAD)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Сервер не ответил")
+
+
+async def load(url, concurrency, duration):
+    '''
+    concurrency клиентов шлют /predict в течение duration секунд.
+    Возвращает число успешных запросов в секунду
+    '''
+    done = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal done
+            while time.perf_counter() < deadline:
+                if (await client.post(url, json=PAYLOAD)).status_code == 200:
+                    done += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return done / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'workers':>7} | {'backend':>7} | {'req/s':>8} | {'scaling':>7} | {'PSS, MB':>8}")
+    baseline = None
+    for workers in args.workers:
+        port = free_port()
+        proc = start_server(port, workers)
+        try:
+            url = f"http://127.0.0.1:{port}/predict"
+            asyncio.run(wait_ready(url))
+            backend = httpx.get(f"http://127.0.0.1:{port}/ready").json()["backend"]
+            rps = asyncio.run(load(url, args.concurrency, args.duration))
+            pss = total_pss_mb(proc.pid)
+        finally:
+            proc.terminate()
+            proc.wait()
+        baseline = baseline or rps
+        print(f"{workers:>7} | {backend:>7} | {rps:>8.0f} | {rps / baseline:>7.2f} | {pss or 0:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,142 @@
 API_URL = "http://fastapi:8000"
 
+# HTTP-клиент интерфейса (api_client.py): общий пул keep-alive соединений к API_URL на все сессии Streamlit,
+# таймауты подключения и чтения, до API_RETRIES повторов при ошибке подключения и ответах 502/503/504
+# (POST — только при ошибке подключения и 503) с экспоненциальной задержкой
+# (backoff_factor = API_RETRY_BACKOFF_S в urllib3 Retry).
+# Загружаемые файлы от API_GZIP_MIN_BYTES сжимаются gzip; API распаковывает их потоком
+# и отклоняет тела больше GZIP_REQUEST_MAX_BYTES после распаковки
+API_POOL_SIZE = 16
+API_CONNECT_TIMEOUT_S = 3.0
+API_READ_TIMEOUT_S = 120.0
+API_RETRIES = 3
+API_RETRY_BACKOFF_S = 0.2
+API_GZIP_MIN_BYTES = 64 * 2**10
+GZIP_REQUEST_MAX_BYTES = 4 * 2**30
+
 EXAMPLE_CSV_PATH = "data/example.csv"
 
 CONFIDENCE_THRESHOLDS = {"low": 0.6,
                          "medium": 0.85,
-                         "high": 1.0}
\ No newline at end of file
+                         "high": 1.0}
+
+# Проверка входных батчей (/predict_csv, /predict_csv_stream, /predict_batch, /jobs): нечисловые значения, NaN, inf,
+# границы FEATURE_BOUNDS ({признак: (минимум, максимум)}, None — без границы) и целочисленность признаков с целыми границами.
+# Границы задают только то, что гарантирует формат CICFlowMeter (и flow_meter.py), и покрывают все строки
+# обучающего CIC-IDS2017 (train_pipeline.py пишет наблюдаемые диапазоны и число строк вне границ в отчет):
+# порт — 16 бит, Init_Win_bytes_* = -1, если окно не наблюдалось (в том числе для UDP), min_seg_size_forward —
+# int в Java (в датасете есть отрицательные значения), длины пакетов не ограничены MTU (TSO/GRO),
+# у интервалов и скоростей бывают отрицательные значения (часы захвата), поэтому границ у них нет.
+# VALIDATION_MODE = "reject" — строки с ошибками не скорятся, "mask" — ошибочные значения заменяются пропуском (NaN)
+# и строка скорится (фоновые задания /jobs всегда в режиме mask).
+# В ответе — индексы строк с ошибками и сообщения для первых VALIDATION_MAX_ERRORS строк
+VALIDATION_MODE = "reject"
+VALIDATION_MAX_ERRORS = 100
+FEATURE_BOUNDS = {"Destination Port": (0, 65535),
+                  "Init_Win_bytes_forward": (-1, 65535),
+                  "Init_Win_bytes_backward": (-1, 65535),
+                  "Bwd Packets/s": (None, None),
+                  "min_seg_size_forward": (-2**31, 2**31 - 1),
+                  "Fwd IAT Std": (0.0, None),
+                  "Flow IAT Min": (None, None),
+                  "Bwd Packet Length Min": (0, None),
+                  "Fwd Packets/s": (None, None),
+                  "Fwd IAT Min": (None, None)}
+
+# Диапазоны полей ручного ввода в app.py (и синтетических данных бенчмарков); уже, чем FEATURE_BOUNDS
+INPUT_RANGES = {"Destination Port": (0, 65535),
+                "Init_Win_bytes_forward": (-1, 65535),
+                "Init_Win_bytes_backward": (-1, 65535),
+                "Bwd Packets/s": (0.0, 1_000_000.0),
+                "min_seg_size_forward": (0, 1500),
+                "Fwd IAT Std": (0.0, 1_000_000.0),
+                "Flow IAT Min": (0.0, 1_000_000.0),
+                "Bwd Packet Length Min": (0, 1500),
+                "Fwd Packets/s": (0.0, 1_000_000.0),
+                "Fwd IAT Min": (0.0, 1_000_000.0)}
+
+# Размер чанка (в строках) для потокового чтения CSV в /predict_csv_stream
+CSV_CHUNK_ROWS = 10_000
+
+# Микробатчинг одиночных запросов /predict:
+# максимальный размер батча, максимальное ожидание (мкс) и глубина очереди (строк).
+# PREDICT_BATCH_MAX_SIZE = 1 отключает батчинг: каждый запрос скорится сразу быстрым путем
+PREDICT_BATCH_MAX_SIZE = 64
+PREDICT_BATCH_MAX_WAIT_US = 2000
+PREDICT_QUEUE_DEPTH = 4096
+
+# Бэкенд инференса: "xgboost" (нативный бустер), "array" (таблица узлов в NumPy)
+# или "auto" (array для батчей до AUTO_BACKEND_MAX_ROWS строк, xgboost для остальных).
+# Таблица узлов экспортируется из бандла один раз и сохраняется в TREE_TABLE_PATH.
+# MODEL_STORE_BACKEND — бэкенд версий, загруженных из хранилища model_store (несколько воркеров):
+# с "array" все воркеры скорят по одной отображенной в память таблице узлов, а бустер не загружается
+MODEL_BACKEND = "xgboost"
+MODEL_STORE_BACKEND = "array"
+TREE_TABLE_PATH = "model/xgb_tree_table.npz"
+AUTO_BACKEND_MAX_ROWS = 16
+
+# Бандл модели и хранилище для нескольких воркеров (python model_store.py <бандл> <хранилище>).
+# Если хранилище существует, API загружается из него, иначе из бандла
+MODEL_BUNDLE_PATH = "model/xgb_pipeline_bundle.pkl"
+MODEL_STORE_PATH = "model/xgb_pipeline_store"
+
+# Кэш предсказаний перед моделью (LRU + TTL). Ключ — строка признаков в порядке selected_features;
+# для признаков из PREDICTION_CACHE_QUANTIZATION значение округляется до указанного шага,
+# например {"Bwd Packets/s": 10.0, "Fwd Packets/s": 10.0, "Fwd IAT Std": 100.0}
+PREDICTION_CACHE_ENABLED = False
+PREDICTION_CACHE_SIZE = 100_000
+PREDICTION_CACHE_TTL_S = 300
+PREDICTION_CACHE_QUANTIZATION = {}
+
+# Извлечение потоков из pcap (flow_meter.py, /predict_pcap): поток завершается после FLOW_IDLE_TIMEOUT_S
+# без пакетов или через FLOW_ACTIVE_TIMEOUT_S после начала (как flow timeout в CICFlowMeter);
+# завершенные потоки скорятся батчами по FLOW_BATCH_SIZE
+FLOW_IDLE_TIMEOUT_S = 60
+FLOW_ACTIVE_TIMEOUT_S = 120
+FLOW_BATCH_SIZE = 1024
+
+# Фоновые задания для больших CSV (/jobs): файлы и результаты хранятся в JOB_DIR
+# (общий каталог для всех воркеров uvicorn), чанки по JOB_CHUNK_ROWS строк скорятся
+# в пуле из JOB_WORKERS процессов, не больше JOB_MAX_IN_FLIGHT чанков задания одновременно.
+# Завершенные задания удаляются через JOB_TTL_S, страница результатов — до JOB_RESULTS_MAX_ROWS строк.
+# Поток задания обновляет heartbeat раз в JOB_HEARTBEAT_S секунд; незавершенное задание, процесс которого
+# остановлен или heartbeat которого старше JOB_STALE_S, помечается failed и тоже удаляется через JOB_TTL_S
+JOB_DIR = "jobs"
+JOB_WORKERS = 2
+JOB_CHUNK_ROWS = 50_000
+JOB_MAX_IN_FLIGHT = 2
+JOB_TTL_S = 3600
+JOB_HEARTBEAT_S = 10
+JOB_STALE_S = 60
+JOB_RESULTS_MAX_ROWS = 50_000
+
+# Интерфейс: CSV больше CSV_JOB_THRESHOLD_BYTES отправляется фоновым заданием,
+# статус опрашивается раз в JOB_POLL_INTERVAL_S секунд; если за JOB_POLL_TIMEOUT_S секунд
+# задание не продвинулось, опрос прекращается с ошибкой
+CSV_JOB_THRESHOLD_BYTES = 5 * 2**20
+JOB_POLL_INTERVAL_S = 0.5
+JOB_POLL_TIMEOUT_S = 120
+
+# Результаты по CSV в интерфейсе: сводка, гистограмма уверенности из CONFIDENCE_HISTOGRAM_BINS интервалов
+# и таблица по страницам (варианты размера страницы — RESULTS_PAGE_SIZES). Результаты последних
+# CSV_RESULTS_CACHE_ENTRIES файлов кэшируются (st.cache_data), перезапуски скрипта не отправляют файл повторно
+RESULTS_PAGE_SIZES = (50, 200, 1000)
+CONFIDENCE_HISTOGRAM_BINS = 20
+CSV_RESULTS_CACHE_ENTRIES = 4
+
+# Сэмплирующий профилировщик (/profiler/start, /profiler/stop): включается по запросу,
+# снимает стеки всех потоков раз в PROFILER_INTERVAL_MS мс не дольше PROFILER_MAX_DURATION_S секунд.
+# Эндпоинты доступны только при PROFILER_ENABLED = True
+PROFILER_ENABLED = False
+PROFILER_INTERVAL_MS = 5
+PROFILER_MAX_DURATION_S = 60
+
+# Реестр версий модели (/models): желаемое состояние (версии, основная, кандидат и режим сравнения)
+# хранится в MODEL_REGISTRY_STATE_PATH, общем для всех воркеров uvicorn. Каждый воркер сверяется с ним
+# раз в MODEL_REGISTRY_POLL_S секунд и перезагружает версию, если ее бандл перезаписан.
+# Через API загружаются только файлы из MODEL_REGISTRY_DIR; в теневом режиме в очереди сравнения
+# не больше MODEL_SHADOW_MAX_PENDING батчей, остальные пропускаются
+MODEL_REGISTRY_STATE_PATH = "model/registry.json"
+MODEL_REGISTRY_DIR = "model"
+MODEL_REGISTRY_POLL_S = 2.0
+MODEL_SHADOW_MAX_PENDING = 8
@@ -0,0 +1,410 @@
+import argparse
+import math
+import socket
+import struct
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Сигнатуры libpcap: порядок байтов и точность времени (микро- или наносекунды)
+PCAP_MAGIC = {b"\xd4\xc3\xb2\xa1": ("<", 1), b"\xa1\xb2\xc3\xd4": (">", 1),
+              b"\x4d\x3c\xb2\xa1": ("<", 1000), b"\xa1\xb2\x3c\x4d": (">", 1000)}
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = (0x8100, 0x88a8)
+PROTO_TCP = 6
+PROTO_UDP = 17
+
+TCP_FIN = 0x01
+TCP_RST = 0x04
+
+_IPV4 = struct.Struct("!BxHHHxBxx4s4s")
+_PORTS = struct.Struct("!HH")
+_TCP = struct.Struct("!HHxxxxxxxxBBH")
+
+
+class PcapFormatError(ValueError):
+    '''
+    Файл не является захватом libpcap поддерживаемого формата
+    '''
+
+
+def read_pcap(f):
+    '''
+    Читает заголовок файла libpcap (микро- и наносекундного, любого порядка байтов)
+    и возвращает генератор пакетов: для каждой записи — время в микросекундах,
+    тип канального уровня и сырой кадр. Ошибка формата заголовка бросается сразу
+    '''
+    header = f.read(24)
+    if len(header) < 24:
+        raise PcapFormatError("Файл короче заголовка pcap")
+    if header[:4] == PCAPNG_MAGIC:
+        raise PcapFormatError("Формат pcapng не поддерживается, сконвертируйте файл: editcap -F pcap in.pcapng out.pcap")
+    if header[:4] not in PCAP_MAGIC:
+        raise PcapFormatError("Неизвестная сигнатура pcap")
+
+    endian, ns_divisor = PCAP_MAGIC[header[:4]]
+    (linktype,) = struct.unpack(endian + "I", header[20:24])
+    linktype &= 0x0fffffff
+    return _read_records(f, struct.Struct(endian + "IIII"), linktype, ns_divisor)
+
+
+def _read_records(f, record, linktype, ns_divisor):
+    while True:
+        record_header = f.read(16)
+        if len(record_header) < 16:
+            return
+        ts_sec, ts_frac, incl_len, _ = record.unpack(record_header)
+        frame = f.read(incl_len)
+        if len(frame) < incl_len:
+            return
+        yield ts_sec * 1_000_000 + ts_frac // ns_divisor, linktype, frame
+
+
+def write_pcap(f, packets, linktype=LINKTYPE_ETHERNET):
+    '''
+    Записывает пакеты (время в микросекундах, кадр) в файл libpcap.
+    Нужна для тестов и бенчмарков на синтетическом трафике
+    '''
+    f.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, linktype))
+    for ts_us, frame in packets:
+        f.write(struct.pack("<IIII", ts_us // 1_000_000, ts_us % 1_000_000, len(frame), len(frame)))
+        f.write(frame)
+
+
+def build_frame(src, dst, sport, dport, proto=PROTO_TCP, payload_len=0, window=0, flags=0, tcp_header_len=20):
+    '''
+    Собирает кадр Ethernet/IPv4 с сегментом TCP или UDP (адреса — строки вида "10.0.0.1")
+    '''
+    if proto == PROTO_TCP:
+        transport = struct.pack("!HHIIBBHHH", sport, dport, 0, 0, (tcp_header_len // 4) << 4, flags, window, 0, 0)
+        transport += b"\x00" * (tcp_header_len - 20)
+    else:
+        transport = struct.pack("!HHHH", sport, dport, 8 + payload_len, 0)
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(transport) + payload_len, 0, 0, 64, proto, 0,
+                     socket.inet_aton(src), socket.inet_aton(dst))
+    return b"\x00" * 12 + struct.pack("!H", ETHERTYPE_IPV4) + ip + transport + b"\x00" * payload_len
+
+
+def parse_frame(frame, linktype):
+    '''
+    Разбирает кадр до транспортного уровня. Возвращает кортеж
+    (src, dst, sport, dport, proto, длина полезной нагрузки, длина заголовка транспорта, окно TCP, флаги TCP)
+    или None для пакетов, которые не относятся к потокам IPv4 TCP/UDP
+    '''
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 14
+        ethertype = frame[12] << 8 | frame[13] if len(frame) >= 14 else 0
+        while ethertype in ETHERTYPE_VLAN and len(frame) >= offset + 4:
+            ethertype = frame[offset + 2] << 8 | frame[offset + 3]
+            offset += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        offset = 16
+        ethertype = frame[14] << 8 | frame[15] if len(frame) >= 16 else 0
+    elif linktype == LINKTYPE_RAW:
+        offset = 0
+        ethertype = ETHERTYPE_IPV4 if frame and frame[0] >> 4 == 4 else 0
+    else:
+        return None
+
+    if ethertype != ETHERTYPE_IPV4 or len(frame) < offset + 20:
+        return None
+
+    version_ihl, total_len, _, fragment, proto, src, dst = _IPV4.unpack_from(frame, offset)
+    ip_header_len = (version_ihl & 0x0f) * 4
+    if fragment & 0x1fff:
+        return None
+    offset += ip_header_len
+    ip_payload_len = total_len - ip_header_len
+
+    if proto == PROTO_TCP:
+        if len(frame) < offset + 20:
+            return None
+        sport, dport, data_offset, flags, window = _TCP.unpack_from(frame, offset)
+        header_len = (data_offset >> 4) * 4
+        return src, dst, sport, dport, proto, ip_payload_len - header_len, header_len, window, flags
+    if proto == PROTO_UDP:
+        if len(frame) < offset + 8:
+            return None
+        sport, dport = _PORTS.unpack_from(frame, offset)
+        return src, dst, sport, dport, proto, ip_payload_len - 8, 8, -1, 0
+    return None
+
+
+def replay(packets, speed=1.0):
+    '''
+    Локальное воспроизведение захвата: пакеты отдаются с исходными интервалами
+    (ускоренными в speed раз), как при чтении с интерфейса
+    '''
+    start_wall = start_ts = None
+    for packet in packets:
+        ts_us = packet[0]
+        if start_ts is None:
+            start_wall, start_ts = time.monotonic(), ts_us
+        delay = (ts_us - start_ts) / 1_000_000 / speed - (time.monotonic() - start_wall)
+        if delay > 0:
+            time.sleep(delay)
+        yield packet
+
+
+class Flow:
+    '''
+    Состояние двунаправленного потока. Прямое направление задает первый пакет.
+    Хранятся только счетчики, нужные для признаков модели: интервалы между пакетами
+    (мкс) накапливаются онлайн (минимум и дисперсия по Уэлфорду), без списков пакетов
+    '''
+    __slots__ = ("src", "dst", "sport", "dport", "proto", "start", "last", "fwd_last",
+                 "fwd_count", "bwd_count", "flow_iat_min", "fwd_iat_min", "fwd_iat_mean", "fwd_iat_m2",
+                 "bwd_length_min", "init_win_fwd", "init_win_bwd", "min_seg_fwd", "fin_fwd", "fin_bwd")
+
+    def __init__(self, ts_us, src, dst, sport, dport, proto):
+        self.src, self.dst, self.sport, self.dport, self.proto = src, dst, sport, dport, proto
+        self.start = self.last = self.fwd_last = ts_us
+        self.fwd_count = self.bwd_count = 0
+        self.flow_iat_min = self.fwd_iat_min = math.inf
+        self.fwd_iat_mean = self.fwd_iat_m2 = 0.0
+        self.bwd_length_min = math.inf
+        self.init_win_fwd = self.init_win_bwd = -1
+        self.min_seg_fwd = math.inf
+        self.fin_fwd = self.fin_bwd = False
+
+    def add(self, ts_us, forward, payload_len, header_len, window, flags):
+        '''
+        Учитывает пакет. Возвращает True, если поток завершен (RST или FIN в обе стороны)
+        '''
+        if self.fwd_count or self.bwd_count:
+            iat = ts_us - self.last
+            if iat < self.flow_iat_min:
+                self.flow_iat_min = iat
+        self.last = ts_us
+
+        if forward:
+            if self.fwd_count:
+                iat = ts_us - self.fwd_last
+                if iat < self.fwd_iat_min:
+                    self.fwd_iat_min = iat
+                n = self.fwd_count
+                delta = iat - self.fwd_iat_mean
+                self.fwd_iat_mean += delta / n
+                self.fwd_iat_m2 += delta * (iat - self.fwd_iat_mean)
+            else:
+                self.init_win_fwd = window
+            self.fwd_last = ts_us
+            self.fwd_count += 1
+            if header_len < self.min_seg_fwd:
+                self.min_seg_fwd = header_len
+            self.fin_fwd |= bool(flags & TCP_FIN)
+        else:
+            if not self.bwd_count:
+                self.init_win_bwd = window
+            self.bwd_count += 1
+            if payload_len < self.bwd_length_min:
+                self.bwd_length_min = payload_len
+            self.fin_bwd |= bool(flags & TCP_FIN)
+
+        return bool(flags & TCP_RST) or (self.fin_fwd and self.fin_bwd)
+
+    def features(self):
+        '''
+        Признаки потока в терминах CICFlowMeter (интервалы в микросекундах, скорости в пакетах/с)
+        '''
+        duration_s = (self.last - self.start) / 1_000_000
+        fwd_intervals = self.fwd_count - 1
+        return {"Destination Port": self.dport,
+                "Init_Win_bytes_forward": self.init_win_fwd,
+                "Init_Win_bytes_backward": self.init_win_bwd,
+                "Bwd Packets/s": self.bwd_count / duration_s if duration_s > 0 else 0.0,
+                "min_seg_size_forward": self.min_seg_fwd,
+                "Fwd IAT Std": math.sqrt(self.fwd_iat_m2 / (fwd_intervals - 1)) if fwd_intervals > 1 else 0.0,
+                "Flow IAT Min": self.flow_iat_min if self.flow_iat_min != math.inf else 0.0,
+                "Bwd Packet Length Min": self.bwd_length_min if self.bwd_count else 0,
+                "Fwd Packets/s": self.fwd_count / duration_s if duration_s > 0 else 0.0,
+                "Fwd IAT Min": self.fwd_iat_min if fwd_intervals else 0.0}
+
+    def describe(self):
+        '''
+        Идентификатор потока для ответа: адреса, порты, протокол, время начала и число пакетов
+        '''
+        return {"src": socket.inet_ntoa(self.src), "sport": self.sport,
+                "dst": socket.inet_ntoa(self.dst), "dport": self.dport,
+                "proto": self.proto, "start_us": self.start,
+                "packets": self.fwd_count + self.bwd_count}
+
+
+FLOW_FEATURES = tuple(Flow(0, b"\x00" * 4, b"\x00" * 4, 0, 0, PROTO_TCP).features())
+
+
+class FlowMeter:
+    '''
+    Таблица активных двунаправленных потоков с вытеснением по таймаутам:
+
+    * поток завершается по RST, FIN в обе стороны, при неактивности дольше idle_timeout_s
+    или когда с его начала прошло больше active_timeout_s (тогда следующий пакет начинает новый поток)
+    * таблица упорядочена по времени последнего пакета, поэтому просроченные потоки
+    снимаются с ее начала без обхода всей таблицы
+    '''
+    def __init__(self, idle_timeout_s=60, active_timeout_s=120):
+        self.idle_timeout = int(idle_timeout_s * 1_000_000)
+        self.active_timeout = int(active_timeout_s * 1_000_000)
+        self._flows = OrderedDict()
+        self.packets = 0
+        self.skipped = 0
+        self.finished = 0
+        self.peak_flows = 0
+        self._peak_table_bytes = sys.getsizeof(self._flows)
+
+    def add(self, ts_us, parsed):
+        '''
+        Учитывает разобранный пакет (результат parse_frame). Возвращает список завершенных потоков
+        '''
+        src, dst, sport, dport, proto, payload_len, header_len, window, flags = parsed
+        self.packets += 1
+        key = (src, sport, dst, dport, proto) if (src, sport) <= (dst, dport) else (dst, dport, src, sport, proto)
+        finished = self.expire(ts_us)
+
+        flow = self._flows.get(key)
+        if flow is not None and ts_us - flow.start > self.active_timeout:
+            del self._flows[key]
+            finished.append(flow)
+            flow = None
+        if flow is None:
+            flow = self._flows[key] = Flow(ts_us, src, dst, sport, dport, proto)
+            if len(self._flows) > self.peak_flows:
+                self.peak_flows = len(self._flows)
+                self._peak_table_bytes = sys.getsizeof(self._flows)
+        else:
+            self._flows.move_to_end(key)
+
+        if flow.add(ts_us, src == flow.src and sport == flow.sport, payload_len, header_len, window, flags):
+            del self._flows[key]
+            finished.append(flow)
+
+        self.finished += len(finished)
+        return finished
+
+    def expire(self, now_us):
+        '''
+        Снимает с таблицы потоки без пакетов дольше idle_timeout_s
+        '''
+        expired = []
+        while self._flows:
+            flow = next(iter(self._flows.values()))
+            if now_us - flow.last <= self.idle_timeout:
+                break
+            expired.append(self._flows.popitem(last=False)[1])
+        return expired
+
+    def flush(self):
+        '''
+        Завершает все оставшиеся потоки (конец захвата)
+        '''
+        flows = list(self._flows.values())
+        self._flows.clear()
+        self.finished += len(flows)
+        return flows
+
+    def process(self, packets):
+        '''
+        Генератор завершенных потоков по пакетам из read_pcap (или replay)
+        '''
+        for ts_us, linktype, frame in packets:
+            parsed = parse_frame(frame, linktype)
+            if parsed is None:
+                self.skipped += 1
+                continue
+            finished = self.add(ts_us, parsed)
+            if finished:
+                yield from finished
+        yield from self.flush()
+
+    @property
+    def active_flows(self):
+        return len(self._flows)
+
+    def table_bytes(self):
+        '''
+        Оценка пиковой памяти таблицы потоков: сама таблица плюс объекты потоков и ключи
+        '''
+        sample = Flow(0, b"\x00" * 4, b"\x00" * 4, 0, 0, PROTO_TCP)
+        key = (sample.src, 0, sample.dst, 0, PROTO_TCP)
+        per_flow = (sys.getsizeof(sample) + sys.getsizeof(key) + 2 * sys.getsizeof(sample.src)
+                    + sum(sys.getsizeof(getattr(sample, name)) for name in ("flow_iat_min", "fwd_iat_mean", "fwd_iat_m2")))
+        return self._peak_table_bytes + self.peak_flows * per_flow
+
+    def stats(self):
+        return {"packets": self.packets,
+                "skipped_packets": self.skipped,
+                "finished_flows": self.finished,
+                "active_flows": self.active_flows,
+                "peak_flows": self.peak_flows,
+                "peak_table_bytes": self.table_bytes()}
+
+
+def classify_flows(flows, backend, selected_features, batch_size=1024):
+    '''
+    Скорит завершенные потоки батчами по batch_size: признаки переносятся в матрицу float32
+    в порядке selected_features. Отдает пары (потоки батча, матрица вероятностей)
+    '''
+    missing = [col for col in selected_features if col not in FLOW_FEATURES]
+    if missing:
+        raise ValueError(f"Признаки не вычисляются из пакетов: {missing}")
+
+    X = np.empty((batch_size, len(selected_features)), dtype=np.float32)
+    batch = []
+    for flow in flows:
+        features = flow.features()
+        X[len(batch)] = [features[col] for col in selected_features]
+        batch.append(flow)
+        if len(batch) == batch_size:
+            yield batch, backend.predict_proba(X)
+            batch = []
+    if batch:
+        yield batch, backend.predict_proba(X[:len(batch)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Извлечение потоков из pcap и их классификация моделью")
+    parser.add_argument("pcap")
+    parser.add_argument("--replay", type=float, default=None, metavar="SPEED",
+                        help="воспроизводить захват в реальном времени, ускоренном в SPEED раз")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    import api
+    from config import FLOW_BATCH_SIZE, FLOW_IDLE_TIMEOUT_S, FLOW_ACTIVE_TIMEOUT_S
+
+    api.load_model()
+    class_names = api.registry.primary.class_names
+    meter = FlowMeter(FLOW_IDLE_TIMEOUT_S, FLOW_ACTIVE_TIMEOUT_S)
+    counts = {}
+
+    start = time.perf_counter()
+    with open(args.pcap, "rb") as f:
+        packets = read_pcap(f)
+        if args.replay:
+            packets = replay(packets, args.replay)
+        for flows, probs in classify_flows(meter.process(packets), api.registry.primary, api.selected_features,
+                                           args.batch_size or FLOW_BATCH_SIZE):
+            for label in class_names[probs.argmax(axis=1)]:
+                counts[str(label)] = counts.get(str(label), 0) + 1
+    elapsed = time.perf_counter() - start
+
+    stats = meter.stats()
+    print(f"Пакетов: {stats['packets']} (пропущено не IPv4 TCP/UDP: {stats['skipped_packets']}), "
+          f"потоков: {stats['finished_flows']}")
+    print(f"Время: {elapsed:.2f} с, {stats['packets'] / elapsed:.0f} пакетов/с")
+    print(f"Таблица потоков: пик {stats['peak_flows']} потоков, ~{meter.table_bytes() / 2**20:.1f} MB")
+    for label, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"  {label}: {count}")
+
+
+if __name__ == "__main__":
+    # Классификация захвата: python flow_meter.py capture.pcap [--replay 10]
+    main()
@@ -0,0 +1,70 @@
+import zlib
+
+from serialization import dumps
+
+
+class GzipBodyError(ValueError):
+    '''
+    Тело запроса с Content-Encoding: gzip не распаковывается или слишком велико после распаковки
+    '''
+
+
+class GzipBodyTooLargeError(GzipBodyError):
+    '''
+    Тело запроса после распаковки больше max_size
+    '''
+
+
+class GzipRequestMiddleware:
+    '''
+    ASGI-мидлвар: распаковывает тела запросов с Content-Encoding: gzip (большие CSV из интерфейса)
+    потоком, по мере чтения, поэтому распакованный файл целиком в памяти не держится.
+    Обработчики получают обычное тело без Content-Encoding и Content-Length.
+    max_size — предел размера после распаковки (защита от gzip-бомб): каждый кусок распаковывается
+    не больше чем на оставшийся бюджет плюс байт, поэтому превышение обнаруживается без распаковки остатка
+    '''
+    def __init__(self, app, max_size=None):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        encoding = next((value for name, value in scope["headers"] if name == b"content-encoding"), None)
+        if encoding is None or encoding.strip().lower() == b"identity":
+            return await self.app(scope, receive, send)
+        if encoding.strip().lower() != b"gzip":
+            body = dumps({"error": f"Неподдерживаемый Content-Encoding: {encoding.decode('latin-1')}. Ожидается gzip"})
+            await send({"type": "http.response.start", "status": 415,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        scope = dict(scope, headers=[(name, value) for name, value in scope["headers"]
+                                     if name not in (b"content-encoding", b"content-length")])
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        size = 0
+
+        async def receive_decompressed():
+            nonlocal size
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+
+            more_body = message.get("more_body", False)
+            limit = 0 if self.max_size is None else self.max_size - size + 1
+            try:
+                body = decompressor.decompress(message.get("body", b""), limit)
+                if not more_body and not decompressor.unconsumed_tail:
+                    body += decompressor.flush()
+            except zlib.error as e:
+                raise GzipBodyError(f"Тело запроса не распаковывается: {e}") from e
+
+            size += len(body)
+            if self.max_size is not None and size > self.max_size:
+                raise GzipBodyTooLargeError(f"Тело запроса после распаковки больше {self.max_size} байт")
+            return {"type": "http.request", "body": body, "more_body": more_body}
+
+        await self.app(scope, receive_decompressed, send)
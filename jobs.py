@@ -0,0 +1,387 @@
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import wait
+
+import numpy as np
+
+from model_registry import default_spec, load_version_backend, source_mtime
+from validation import to_matrix, validate_matrix
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Файл-метка отмены в каталоге задания: файлы удаляет поток-владелец, а не воркер, принявший DELETE
+CANCEL_MARKER = "cancelled"
+
+# Бэкенд инференса в процессе пула и ключ его версии (описание файлов и время их изменения)
+_worker_backend = None
+_worker_key = None
+
+
+def _load_worker_backend(spec, mtime=None):
+    global _worker_backend, _worker_key
+
+    key = (json.dumps(spec, sort_keys=True), mtime)
+    if key != _worker_key:
+        _worker_backend = None
+        _worker_backend = load_version_backend(spec)[1]
+        _worker_key = key
+    return _worker_backend
+
+
+def init_worker():
+    '''
+    Инициализатор процесса пула: загружает модель из config один раз на процесс.
+    Таблица узлов из хранилища model_store отображается в память и делится между процессами
+    '''
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    spec = default_spec()
+    _load_worker_backend(spec, source_mtime(spec))
+
+
+def score_chunk(X, spec=None, mtime=None):
+    '''
+    Скоринг чанка в процессе пула: индексы предсказанных классов и матрица вероятностей float32.
+    spec и mtime — версия из реестра (model_registry); процесс перезагружает модель,
+    только если версия сменилась
+    '''
+    backend = _worker_backend if spec is None else _load_worker_backend(spec, mtime)
+    probs = np.asarray(backend.predict_proba(X), dtype=np.float32)
+    return probs.argmax(axis=1).astype(np.uint16), probs
+
+
+class JobNotFoundError(KeyError):
+    '''
+    Задания нет (неверный id, удалено или истек срок хранения)
+    '''
+
+
+class JobManager:
+    '''
+    Фоновые задания скоринга больших CSV-файлов.
+
+    Состояние задания хранится на диске в каталоге jobs_dir/<job_id>:
+
+    * input.csv — загруженный файл
+    * status.json — статус, число обработанных строк, доля прочитанного файла
+    и отчет о проверке строк (validation, как у /predict_csv)
+    * <номер чанка>.npz — индексы классов и вероятности по каждому готовому чанку
+
+    Поэтому статус и готовые результаты может отдать любой воркер uvicorn, а не только тот,
+    который принял файл. Чанки скорятся в пуле процессов, event loop при этом остается свободным.
+    Пул создается executor_factory при первом задании.
+
+    Поток задания записывает в статус pid и хост своего процесса и обновляет heartbeat_at
+    не реже раза в heartbeat_s секунд. Задание в статусе queued или running, процесс-владелец
+    которого завершился (например, после перезапуска воркера) или heartbeat которого старше stale_s,
+    при чтении статуса и при очистке помечается failed и удаляется через ttl_s, как завершенное.
+    DELETE оставляет метку отмены, а файлы выполняющегося задания удаляет его поток
+
+    Каждый чанк проверяется validate_fn(X, features, not_number, row_offset) в режиме mask, где features —
+    признаки задания в порядке столбцов X (тот же список, что у to_matrix): ошибочные значения
+    становятся пропусками, поэтому результаты задания совпадают со строками файла 1:1.
+    Без validate_fn проверяются только нечисловые значения, NaN и inf
+    '''
+    def __init__(self, executor_factory, score_fn, jobs_dir, chunk_rows=50_000, max_in_flight=2, ttl_s=3600,
+                 validate_fn=None, max_errors=100, heartbeat_s=10, stale_s=60):
+        self.executor_factory = executor_factory
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.score_fn = score_fn
+        self.validate_fn = validate_fn
+        self.max_errors = max_errors
+        self.jobs_dir = jobs_dir
+        self.chunk_rows = chunk_rows
+        self.max_in_flight = max_in_flight
+        self.ttl_s = ttl_s
+        self.heartbeat_s = heartbeat_s
+        self.stale_s = stale_s
+        self._threads = {}
+
+    @property
+    def executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = self.executor_factory()
+            return self._executor
+
+    @property
+    def running(self):
+        '''
+        Число заданий, выполняемых в этом процессе
+        '''
+        return len(self._threads)
+
+    def shutdown(self):
+        '''
+        Останавливает пул процессов (при следующем задании он создастся заново)
+        '''
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _path(self, job_id, name=""):
+        if not job_id.isalnum():
+            raise JobNotFoundError(job_id)
+        return os.path.join(self.jobs_dir, job_id, name)
+
+    def _cancelled(self, job_id):
+        return os.path.exists(self._path(job_id, CANCEL_MARKER))
+
+    def _write_status(self, job_id, status):
+        path = self._path(job_id, "status.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(status, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def create(self, upload, meta=None):
+        '''
+        Сохраняет загруженный файл (файловый объект) и регистрирует задание в статусе queued.
+        meta — дополнительные поля статуса (например, версия модели и ее классы).
+        Возвращает id задания
+        '''
+        self.cleanup_expired()
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._path(job_id))
+        with open(self._path(job_id, "input.csv"), "wb") as f:
+            shutil.copyfileobj(upload, f, 1 << 20)
+        now = time.time()
+        self._write_status(job_id, {"job_id": job_id,
+                                    "status": JOB_QUEUED,
+                                    "rows_done": 0,
+                                    "chunks_done": 0,
+                                    "chunk_rows": self.chunk_rows,
+                                    "progress": 0.0,
+                                    "created_at": now,
+                                    "finished_at": None,
+                                    "owner_host": socket.gethostname(),
+                                    "owner_pid": os.getpid(),
+                                    "heartbeat_at": now,
+                                    "error": None,
+                                    "validation": {"mode": "mask", "rows_total": 0, "rows_invalid": 0,
+                                                   "invalid_rows": [], "errors": []},
+                                    **(meta or {})})
+        return job_id
+
+    def start(self, job_id, selected_features, score_args=()):
+        '''
+        Запускает задание в фоновом потоке: поток только читает чанки и ждет пул процессов,
+        поэтому не занимает event loop. score_args передаются в score_fn после чанка
+        '''
+        thread = threading.Thread(target=self.run, args=(job_id, selected_features, score_args), daemon=True)
+        self._threads[job_id] = thread
+        thread.start()
+        return thread
+
+    def _read_status(self, job_id):
+        try:
+            with open(self._path(job_id, "status.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            raise JobNotFoundError(job_id)
+
+    def _is_stale(self, status, now):
+        '''
+        Задание не завершено, но его поток уже не выполняется: процесс-владелец на этом хосте
+        завершился или heartbeat не обновлялся дольше stale_s
+        '''
+        if status["status"] not in (JOB_QUEUED, JOB_RUNNING):
+            return False
+        if now - status.get("heartbeat_at", status["created_at"]) > self.stale_s:
+            return True
+        return status.get("owner_host") == socket.gethostname() and not _pid_alive(status.get("owner_pid"))
+
+    def status(self, job_id):
+        '''
+        Статус задания; зависшее задание (_is_stale) помечается failed
+        '''
+        status = self._read_status(job_id)
+        if self._cancelled(job_id):
+            raise JobNotFoundError(job_id)
+        now = time.time()
+        if self._is_stale(status, now):
+            status.update(status=JOB_FAILED, error="Задание прервано: процесс, который его выполнял, остановлен",
+                          finished_at=now)
+            self._write_status(job_id, status)
+        return status
+
+    def run(self, job_id, selected_features, score_args=()):
+        '''
+        Читает файл задания чанками по chunk_rows строк, проверяет их и скорит в пуле процессов
+        (не больше max_in_flight чанков одновременно). Чанки сохраняются по порядку,
+        после каждого обновляется status.json вместе с отчетом о проверке.
+        Если задание удалено (метка отмены), обработка прекращается и поток удаляет файлы задания
+        '''
+        import pandas as pd
+
+        status = self._read_status(job_id)
+        status.update(status=JOB_RUNNING, owner_host=socket.gethostname(), owner_pid=os.getpid())
+
+        def write_status():
+            status["heartbeat_at"] = time.time()
+            self._write_status(job_id, status)
+
+        path = self._path(job_id, "input.csv")
+        file_size = os.path.getsize(path) or 1
+        pending = deque()
+
+        def save_next(progress):
+            future, report = pending.popleft()
+            while not wait([future], timeout=self.heartbeat_s).done:
+                if self._cancelled(job_id):
+                    raise _JobCancelled
+                write_status()
+            pred_idx, probs = future.result()
+            if self._cancelled(job_id):
+                raise _JobCancelled
+            _save_chunk(self._path(job_id, f"{status['chunks_done']:06d}.npz"), pred_idx, probs)
+            status["chunks_done"] += 1
+            status["rows_done"] += len(pred_idx)
+            status["progress"] = progress
+            _merge_report(status["validation"], report, self.max_errors)
+            write_status()
+
+        try:
+            if self._cancelled(job_id):
+                raise _JobCancelled
+            write_status()
+            with open(path, "rb") as f:
+                for chunk in pd.read_csv(f, chunksize=self.chunk_rows):
+                    rows_read = status["rows_done"] + len(pending) * self.chunk_rows
+                    missing = [col for col in selected_features if col not in chunk.columns]
+                    if missing:
+                        raise ValueError(f"Отсутствуют признаки: {missing}")
+                    X, not_number = to_matrix(chunk, selected_features)
+                    if self.validate_fn is None:
+                        X, report = validate_matrix(X, selected_features, mode="mask", max_errors=self.max_errors,
+                                                    not_number=not_number, row_offset=rows_read)
+                    else:
+                        X, report = self.validate_fn(X, selected_features, not_number, rows_read)
+                    pending.append((self.executor.submit(self.score_fn, X, *score_args), report))
+
+                    while len(pending) >= self.max_in_flight:
+                        save_next(min(f.tell() / file_size, 0.99))
+            while pending:
+                save_next(1.0 if len(pending) == 1 else status["progress"])
+
+            status.update(status=JOB_DONE, progress=1.0, finished_at=time.time())
+
+        except _JobCancelled:
+            pass
+
+        except Exception as e:
+            status.update(status=JOB_FAILED, error=str(e), finished_at=time.time())
+
+        finally:
+            for future, _ in pending:
+                future.cancel()
+            self._threads.pop(job_id, None)
+
+        if self._cancelled(job_id):
+            shutil.rmtree(self._path(job_id), ignore_errors=True)
+            return
+        try:
+            write_status()
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def results(self, job_id, offset=0, limit=10_000):
+        '''
+        Готовые результаты задания начиная со строки offset (не больше limit строк).
+        Возвращает индексы классов, матрицу вероятностей и смещение следующей страницы
+        '''
+        status = self.status(job_id)
+        pred_idx, probs = [], []
+        position, rows = offset, 0
+        while rows < limit and position < status["rows_done"]:
+            index, start = divmod(position, status["chunk_rows"])
+            try:
+                with np.load(self._path(job_id, f"{index:06d}.npz")) as data:
+                    chunk_idx = data["pred_idx"][start:start + limit - rows]
+                    pred_idx.append(chunk_idx)
+                    probs.append(data["probs"][start:start + len(chunk_idx)])
+            except FileNotFoundError:
+                raise JobNotFoundError(job_id)
+            position += len(chunk_idx)
+            rows += len(chunk_idx)
+
+        if not pred_idx:
+            return np.empty(0, dtype=np.uint16), None, offset
+        return np.concatenate(pred_idx), np.concatenate(probs), position
+
+    def delete(self, job_id):
+        '''
+        Отменяет задание и удаляет его файлы. Файлы выполняющегося задания (в том числе в другом воркере)
+        удаляет его поток по метке отмены, завершенного или зависшего — удаляются сразу
+        '''
+        status = self.status(job_id)
+        with open(self._path(job_id, CANCEL_MARKER), "w"):
+            pass
+        if status["status"] not in (JOB_QUEUED, JOB_RUNNING):
+            shutil.rmtree(self._path(job_id), ignore_errors=True)
+
+    def cleanup_expired(self):
+        '''
+        Помечает зависшие задания failed и удаляет завершенные задания старше ttl_s
+        (и отмененные, поток которых уже не выполняется). Вызывается при старте воркера и перед новым заданием
+        '''
+        if not os.path.isdir(self.jobs_dir):
+            return
+        now = time.time()
+        for job_id in os.listdir(self.jobs_dir):
+            try:
+                status = self._read_status(job_id)
+                if self._cancelled(job_id):
+                    expired = status["status"] not in (JOB_QUEUED, JOB_RUNNING) or self._is_stale(status, now)
+                else:
+                    finished_at = self.status(job_id)["finished_at"]
+                    expired = finished_at is not None and now - finished_at > self.ttl_s
+            except JobNotFoundError:
+                continue
+            if expired:
+                shutil.rmtree(self._path(job_id), ignore_errors=True)
+
+
+class _JobCancelled(Exception):
+    '''
+    Задание отменено (метка отмены в его каталоге)
+    '''
+
+
+def _pid_alive(pid):
+    if pid is None:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge_report(total, report, max_errors):
+    '''
+    Добавляет отчет о проверке чанка к отчету задания (сообщения — не больше max_errors строк)
+    '''
+    total["rows_total"] += report["rows_total"]
+    total["rows_invalid"] += report["rows_invalid"]
+    total["invalid_rows"] += np.asarray(report["invalid_rows"]).tolist()
+    total["errors"] += report["errors"][:max(max_errors - len(total["errors"]), 0)]
+
+
+def _save_chunk(path, pred_idx, probs):
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, pred_idx=pred_idx, probs=probs)
+    os.replace(tmp_path, path)
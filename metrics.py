@@ -0,0 +1,376 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+# Границы корзин гистограмм: задержки (секунды) и число строк в запросе
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROW_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    '''
+    Базовая метрика с метками: значения для каждого набора меток создаются при первом обращении.
+    labels(...) возвращает дочернюю метрику, которую можно сохранить и обновлять без поиска по меткам
+    '''
+    type_name = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in sorted(self._children.items()):
+            lines += child.render(self.name, self.labelnames, values)
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ("function",)
+
+    def __init__(self):
+        super().__init__()
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        '''
+        Значение считается при отдаче /metrics (например, длина очереди)
+        '''
+        self.function = function
+
+    def render(self, name, labelnames, values):
+        value = self.function() if self.function is not None else self.value
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        '''
+        Контекстный менеджер: наблюдает длительность блока в секундах
+        '''
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        '''
+        Оценка квантиля по корзинам с линейной интерполяцией внутри корзины
+        (как histogram_quantile в Prometheus). None, если наблюдений нет
+        '''
+        with self._lock:
+            counts = list(self.counts)
+        rank = q * sum(counts)
+        if not rank:
+            return None
+        cumulative, lower = 0, 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        return lower
+
+    def render(self, name, labelnames, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(float(bound) for bound in buckets)
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class Registry:
+    '''
+    Набор метрик процесса, отдаваемый в текстовом формате Prometheus (version 0.0.4)
+    '''
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "api_request_duration_seconds", "Полное время обработки запроса, включая отдачу ответа", ("endpoint",)))
+REQUESTS = REGISTRY.register(Counter(
+    "api_requests_total", "Запросы по эндпоинтам и HTTP-статусам", ("endpoint", "status")))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "api_requests_in_flight", "Запросы, обрабатываемые сейчас", ("endpoint",)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "api_stage_duration_seconds", "Время этапов обработки запроса", ("endpoint", "stage")))
+ROWS_PER_REQUEST = REGISTRY.register(Histogram(
+    "api_rows_per_request", "Число строк в запросе (или в микробатче)", ("endpoint",), ROW_BUCKETS))
+ROWS = REGISTRY.register(Counter(
+    "api_rows_total", "Строки, прошедшие через модель (строки в секунду — rate по этому счетчику)", ("endpoint",)))
+INVALID_ROWS = REGISTRY.register(Counter(
+    "api_invalid_rows_total", "Строки батчей, не прошедшие проверку (отброшенные или маскированные)", ("endpoint",)))
+PREDICTIONS = REGISTRY.register(Counter(
+    "api_predictions_total", "Распределение предсказанных классов", ("class",)))
+BATCHER_ROWS = REGISTRY.register(Gauge(
+    "api_batcher_rows_in_flight", "Строки /predict, ожидающие или проходящие скоринг в микробатчере"))
+JOBS_RUNNING = REGISTRY.register(Gauge(
+    "api_jobs_running", "Фоновые задания, выполняемые этим воркером"))
+MODEL_LOAD_SECONDS = REGISTRY.register(Gauge(
+    "model_load_seconds", "Время загрузки и прогрева модели"))
+MODEL_READY = REGISTRY.register(Gauge(
+    "model_ready", "1, если модель загружена и прогрета"))
+MODEL_VERSION_SECONDS = REGISTRY.register(Histogram(
+    "model_version_predict_seconds", "Время вызова модели по версиям из реестра", ("version",)))
+MODEL_VERSION_ROWS = REGISTRY.register(Counter(
+    "model_version_rows_total", "Строки, оцененные каждой версией модели", ("version",)))
+SHADOW_ROWS = REGISTRY.register(Counter(
+    "model_shadow_rows_total", "Строки, повторно оцененные теневой версией", ("primary", "candidate")))
+SHADOW_AGREED = REGISTRY.register(Counter(
+    "model_shadow_agreed_total", "Строки, на которых класс теневой версии совпал с основной",
+    ("primary", "candidate")))
+SHADOW_DROPPED = REGISTRY.register(Counter(
+    "model_shadow_dropped_rows_total", "Строки, не отправленные в теневую версию из-за переполненной очереди"))
+WORKER_INFO = REGISTRY.register(Gauge(
+    "api_worker_info", "Воркер, отдавший метрики (у каждого воркера uvicorn свои счетчики)", ("pid",)))
+WORKER_INFO.labels(str(os.getpid())).set(1)
+
+
+def stage(endpoint, name):
+    '''
+    Контекстный менеджер для замера этапа запроса:
+
+        with stage("predict_csv", "read_csv"):
+            df = pd.read_csv(...)
+    '''
+    return STAGE_SECONDS.labels(endpoint, name).time()
+
+
+def record_predictions(endpoint, pred_idx, class_names):
+    '''
+    Учитывает строки запроса: гистограмма размера, счетчик строк и распределение классов
+    '''
+    rows = len(pred_idx)
+    ROWS_PER_REQUEST.labels(endpoint).observe(rows)
+    ROWS.labels(endpoint).inc(rows)
+    if rows == 1:
+        PREDICTIONS.labels(str(class_names[int(pred_idx[0])])).inc()
+        return
+    for index, count in enumerate(np.bincount(pred_idx, minlength=len(class_names))):
+        if count:
+            PREDICTIONS.labels(str(class_names[index])).inc(int(count))
+
+
+def record_prediction(endpoint, label):
+    '''
+    Учитывает одиночное предсказание (/predict) без гистограммы размера запроса
+    '''
+    ROWS.labels(endpoint).inc()
+    PREDICTIONS.labels(label).inc()
+
+
+class MetricsMiddleware:
+    '''
+    ASGI-мидлвар: запросы в обработке, число запросов по статусам и полное время запроса
+    (для потоковых ответов — до отправки последнего байта).
+    Метка endpoint — имя функции-обработчика, поэтому пути с параметрами (/jobs/{job_id})
+    не размножают метки. Таблица маршрутов строится при первом запросе
+    '''
+    def __init__(self, app):
+        self.app = app
+        self._static = None
+        self._dynamic = None
+        self._children = {}
+
+    def _build_routes(self, routes):
+        static, dynamic = {}, []
+        for route in routes:
+            methods = getattr(route, "methods", None) or ("GET",)
+            for method in methods:
+                if "{" in route.path:
+                    dynamic.append((method, route.path_regex, route.name))
+                else:
+                    static[(method, route.path)] = route.name
+        self._static, self._dynamic = static, dynamic
+
+    def endpoint(self, method, path):
+        name = self._static.get((method, path))
+        if name is not None:
+            return name
+        for route_method, regex, name in self._dynamic:
+            if route_method == method and regex.match(path):
+                return name
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self._static is None:
+            self._build_routes(scope["app"].router.routes)
+
+        key = (scope["method"], scope["path"])
+        children = self._children.get(key)
+        if children is None:
+            endpoint = self.endpoint(*key)
+            children = (endpoint, IN_FLIGHT.labels(endpoint), REQUEST_SECONDS.labels(endpoint))
+            if endpoint != "unmatched" and len(self._children) < 10_000:
+                self._children[key] = children
+        endpoint, in_flight, request_seconds = children
+
+        status = 500
+        start = time.perf_counter()
+        in_flight.inc()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            request_seconds.observe(time.perf_counter() - start)
+            REQUESTS.labels(endpoint, str(status)).inc()
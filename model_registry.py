@@ -0,0 +1,461 @@
+import fcntl
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+from config import (MODEL_BACKEND, MODEL_STORE_BACKEND, AUTO_BACKEND_MAX_ROWS, MODEL_BUNDLE_PATH, MODEL_STORE_PATH,
+                    TREE_TABLE_PATH)
+
+ROUTING_MODES = ("shadow", "split")
+VERSION_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+# Текущая маршрутизация: основная версия, кандидат для сравнения (или None), режим и доля трафика.
+# Заменяется целиком одним присваиванием, поэтому запросы читают ее без блокировок
+Routing = namedtuple("Routing", ["primary", "candidate", "mode", "fraction"])
+
+
+class ModelVersionError(ValueError):
+    '''
+    Версию нельзя загрузить или включить (другая схема признаков, недопустимое изменение состояния)
+    '''
+
+
+class ModelVersionNotFoundError(KeyError):
+    '''
+    Версии нет в реестре
+    '''
+
+
+def default_spec():
+    '''
+    Описание версии из config: бандл, хранилище model_store и таблица узлов
+    '''
+    return {"bundle": MODEL_BUNDLE_PATH, "store": MODEL_STORE_PATH, "tree_table": TREE_TABLE_PATH}
+
+
+def default_state():
+    return {"versions": {"default": default_spec()}, "primary": "default",
+            "candidate": None, "mode": "shadow", "fraction": 1.0}
+
+
+def newest_mtime(paths):
+    return max((os.path.getmtime(path) for path in paths if os.path.exists(path)), default=0.0)
+
+
+def store_mtime(store):
+    '''
+    Время последнего изменения файлов хранилища model_store (0, если хранилища нет)
+    '''
+    if not store or not os.path.isdir(store):
+        return 0.0
+    return newest_mtime([entry.path for entry in os.scandir(store)])
+
+
+def source_mtime(spec):
+    '''
+    Время последнего изменения файлов версии (бандл и файлы хранилища).
+    По нему воркеры замечают, что бандл перезаписан новой моделью
+    '''
+    return max(newest_mtime([spec["bundle"]]), store_mtime(spec.get("store")))
+
+
+def load_version_backend(spec):
+    '''
+    Загружает пайплайн версии и бэкенд инференса: config.MODEL_STORE_BACKEND для версии из хранилища
+    model_store (бустер при "array" не загружается), иначе config.MODEL_BACKEND.
+    Хранилище и таблица узлов из tree_table используются, только если они не старее бандла:
+    после перезаписи бандла (например, train_pipeline.py) версия загружается из него,
+    а не из устаревшего хранилища, экспортированного при старте
+    '''
+    from backends import ArrayTreeBackend, load_backend
+    from model_store import load_pipeline
+
+    store = spec.get("store") or ""
+    if os.path.isdir(store) and os.path.exists(spec["bundle"]) and store_mtime(store) < os.path.getmtime(spec["bundle"]):
+        store = ""
+    backend_name = MODEL_STORE_BACKEND if os.path.isdir(store) else MODEL_BACKEND
+    bundle, tree_table = load_pipeline(store, spec["bundle"], with_booster=backend_name != ArrayTreeBackend.name)
+    tree_table_path = spec.get("tree_table")
+    if (tree_table_path and os.path.exists(tree_table_path) and os.path.exists(spec["bundle"])
+            and os.path.getmtime(tree_table_path) < os.path.getmtime(spec["bundle"])):
+        tree_table_path = None
+    backend = load_backend(backend_name, bundle["model"], tree_table_path, AUTO_BACKEND_MAX_ROWS,
+                           array_backend=tree_table)
+    return bundle, backend
+
+
+class ModelVersion:
+    '''
+    Загруженная и прогретая версия пайплайна.
+
+    predict_proba принимает признаки в порядке схемы API (features реестра) и сама переставляет
+    колонки, если в бандле версии другой порядок selected_features. Время вызова модели
+    и число строк учитываются в метриках с меткой version
+    '''
+    def __init__(self, name, spec, bundle, backend, features, mtime=None):
+        self.name = name
+        self.spec = dict(spec)
+        self.mtime = source_mtime(spec) if mtime is None else mtime
+        self.model = bundle["model"]
+        self.selected_features = list(bundle["selected_features"])
+        self.label_encoder = bundle["label_encoder"]
+        self.backend = backend
+        self.class_names = np.asarray(self.label_encoder.classes_).astype(str)
+        self.class_keys = self.class_names.tolist()
+
+        if set(self.selected_features) != set(features):
+            raise ModelVersionError(f"Признаки версии {name} не совпадают со схемой API: "
+                                    f"{sorted(set(self.selected_features) ^ set(features))}")
+        self.column_index = (None if self.selected_features == list(features)
+                             else np.array([list(features).index(col) for col in self.selected_features]))
+
+        self.prediction_cache = None
+        self.fast_predictor = None
+        self.load_time = None
+        self.loaded_at = time.time()
+        self._seconds = metrics.MODEL_VERSION_SECONDS.labels(name)
+        self._rows = metrics.MODEL_VERSION_ROWS.labels(name)
+
+    def predict_proba(self, X):
+        '''
+        Матрица вероятностей для массива или DataFrame с признаками в порядке схемы API
+        '''
+        if self.column_index is not None:
+            X = X.iloc[:, self.column_index] if hasattr(X, "iloc") else X[:, self.column_index]
+        start = time.perf_counter()
+        probs = self.backend.predict_proba(X)
+        self._seconds.observe(time.perf_counter() - start)
+        self._rows.inc(len(X))
+        return probs
+
+    def describe(self):
+        p50, p99 = self._seconds.quantile(0.5), self._seconds.quantile(0.99)
+        return {"name": self.name,
+                **self.spec,
+                "classes": self.class_keys,
+                "backend": self.backend.name,
+                "load_time_s": round(self.load_time, 4) if self.load_time is not None else None,
+                "loaded_at": self.loaded_at,
+                "rows": self._rows.value,
+                "calls": self._seconds.count,
+                "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+                "p99_ms": round(p99 * 1000, 3) if p99 is not None else None}
+
+
+class ModelRegistry:
+    '''
+    Версии модели воркера и маршрутизация запросов между ними.
+
+    Желаемое состояние (какие версии загружены, какая основная, кандидат и режим сравнения)
+    хранится в JSON-файле state_path, общем для всех воркеров uvicorn, — как задания в jobs.py.
+    Каждый воркер сверяется с ним в фоновом потоке раз в poll_interval_s секунд:
+
+    1. Новые версии и версии, чьи файлы изменились (например, бандл перезаписан после обучения),
+    загружаются и прогреваются в этом потоке, запросы продолжают идти в текущие версии
+    2. Когда все нужные версии готовы, маршрутизация заменяется одним присваиванием
+    3. Если версию загрузить не удалось, ошибка сохраняется в errors, а прежняя маршрутизация остается
+
+    Режимы сравнения с кандидатом:
+
+    * shadow — доля fraction батчей повторно скорится кандидатом в отдельном потоке,
+    ответ клиенту не ждет кандидата; считается доля совпавших классов
+    * split — доля fraction запросов целиком обслуживается кандидатом
+
+    Без файла состояния реестр содержит одну версию default из config
+    '''
+    def __init__(self, state_path, field_names=None, cache_factory=None, poll_interval_s=2.0, shadow_max_pending=8):
+        self.state_path = state_path
+        self.field_names = field_names or {}
+        self.cache_factory = cache_factory
+        self.poll_interval_s = poll_interval_s
+        self.shadow_max_pending = shadow_max_pending
+        self.features = None
+        self.versions = {}
+        self.routing = None
+        self.errors = {}
+        self.comparisons = {}
+        self._sync_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._shadow_executor = None
+        self._shadow_pending = 0
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._watcher = None
+
+    @property
+    def primary(self):
+        routing = self.routing
+        return routing.primary if routing is not None else None
+
+    def read_state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default_state()
+
+    def write_state(self, state):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def update_state(self, change):
+        '''
+        Применяет change(state) к желаемому состоянию, сохраняет его и будит фоновую сверку.
+        change бросает ModelVersionError, если изменение недопустимо.
+        Чтение и запись идут под блокировкой файла <state_path>.lock (fcntl.flock),
+        поэтому одновременные изменения из разных воркеров не затирают друг друга
+        '''
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.state_path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state = self.read_state()
+            change(state)
+            self.write_state(state)
+        self._wake.set()
+        return state
+
+    def add_version(self, name, spec, activate=False):
+        '''
+        Регистрирует версию (или новые файлы существующей) в желаемом состоянии;
+        при activate она станет основной после загрузки
+        '''
+        if not VERSION_NAME.match(name):
+            raise ModelVersionError(f"Недопустимое имя версии: {name}")
+
+        def change(state):
+            state["versions"][name] = spec
+            if activate:
+                _set_primary(state, name)
+        return self.update_state(change)
+
+    def activate(self, name):
+        '''
+        Делает версию основной
+        '''
+        def change(state):
+            _check_version(state, name)
+            _set_primary(state, name)
+        return self.update_state(change)
+
+    def compare(self, name, mode="shadow", fraction=1.0):
+        '''
+        Назначает версию кандидатом для сравнения с основной в режиме shadow или split
+        '''
+        if mode not in ROUTING_MODES:
+            raise ModelVersionError(f"Неизвестный режим: {mode}. Доступны: {list(ROUTING_MODES)}")
+        if not 0 < fraction <= 1:
+            raise ModelVersionError("Доля трафика должна быть в (0, 1]")
+
+        def change(state):
+            _check_version(state, name)
+            if state["primary"] == name:
+                raise ModelVersionError(f"Версия {name} уже основная")
+            state.update(candidate=name, mode=mode, fraction=fraction)
+        return self.update_state(change)
+
+    def stop_compare(self, name):
+        def change(state):
+            _check_version(state, name)
+            if state.get("candidate") != name:
+                raise ModelVersionError(f"Версия {name} не сравнивается с основной")
+            state["candidate"] = None
+        return self.update_state(change)
+
+    def remove(self, name):
+        '''
+        Убирает версию из желаемого состояния; воркеры выгрузят ее при следующей сверке
+        '''
+        def change(state):
+            _check_version(state, name)
+            if state["primary"] == name:
+                raise ModelVersionError(f"Версия {name} основная, сначала включите другую")
+            del state["versions"][name]
+            if state.get("candidate") == name:
+                state["candidate"] = None
+        return self.update_state(change)
+
+    def load(self, name, spec):
+        '''
+        Загружает и прогревает версию. Первая загруженная версия задает схему признаков API
+        '''
+        start = time.perf_counter()
+        mtime = source_mtime(spec)
+        bundle, backend = load_version_backend(spec)
+
+        features = self.features or bundle["selected_features"]
+        cache = self.cache_factory(bundle["selected_features"]) if self.cache_factory else None
+        if cache is not None:
+            from prediction_cache import CachedBackend
+            backend = CachedBackend(backend, cache)
+
+        from model_utils import FastPredictor
+
+        version = ModelVersion(name, spec, bundle, backend, features, mtime)
+        version.prediction_cache = cache
+        # Быстрый путь без pandas: поля InputData переносятся в float32-строку в порядке схемы API
+        version.fast_predictor = FastPredictor(version.model, version.label_encoder, features,
+                                               field_names=[self.field_names.get(col, col) for col in features],
+                                               backend=version)
+        version.fast_predictor.predict_rows(np.zeros((1, len(features)), dtype=np.float32))
+        version.load_time = time.perf_counter() - start
+        metrics.MODEL_LOAD_SECONDS.set(version.load_time)
+
+        if self.features is None:
+            self.features = list(features)
+        return version
+
+    def sync(self):
+        '''
+        Сверяет загруженные версии и маршрутизацию с файлом состояния.
+        Бросает ModelVersionError, если основную версию так и не удалось загрузить
+        '''
+        with self._sync_lock:
+            state = self.read_state()
+            versions = {}
+            # Основная версия загружается первой: она задает схему признаков
+            for name in sorted(state["versions"], key=lambda name: name != state["primary"]):
+                spec = state["versions"][name]
+                current = self.versions.get(name)
+                if current is not None and current.spec == spec and source_mtime(spec) <= current.mtime:
+                    versions[name] = current
+                    continue
+                try:
+                    versions[name] = self.load(name, spec)
+                    self.errors.pop(name, None)
+                except Exception as e:
+                    self.errors[name] = str(e)
+                    if current is not None:
+                        versions[name] = current
+
+            primary = versions.get(state["primary"])
+            if primary is None:
+                if self.routing is None:
+                    raise ModelVersionError(self.errors.get(state["primary"], f"Версия {state['primary']} не найдена"))
+                return
+
+            # Текущая основная версия выгружается только после переключения на новую
+            self.versions = versions
+            self.routing = Routing(primary, versions.get(state.get("candidate")),
+                                   state.get("mode", "shadow"), float(state.get("fraction", 1.0)))
+
+    def start(self):
+        '''
+        Первая сверка (синхронно) и запуск фонового потока, который следит за файлом состояния
+        '''
+        self.sync()
+        if self._watcher is None:
+            self._stopped.clear()
+            self._watcher = threading.Thread(target=self._watch, daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        self._watcher = None
+        if self._shadow_executor is not None:
+            self._shadow_executor.shutdown(wait=False, cancel_futures=True)
+            self._shadow_executor = None
+
+    def _watch(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.poll_interval_s)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.sync()
+            except Exception as e:
+                self.errors["sync"] = str(e)
+
+    def pick(self):
+        '''
+        Версия для очередного запроса: в режиме split кандидат с вероятностью fraction, иначе основная
+        '''
+        routing = self.routing
+        if routing.candidate is not None and routing.mode == "split" and random.random() < routing.fraction:
+            return routing.candidate
+        return routing.primary
+
+    def shadow(self, X, labels, version):
+        '''
+        В режиме shadow отправляет батч (признаки в порядке схемы API) кандидату в фоновый поток
+        и сравнивает его классы с labels основной версии. Ничего не делает в других режимах,
+        если батч скорила не основная версия или очередь сравнения заполнена
+        '''
+        routing = self.routing
+        candidate = routing.candidate
+        if candidate is None or routing.mode != "shadow" or version is not routing.primary:
+            return
+        if routing.fraction < 1 and random.random() >= routing.fraction:
+            return
+
+        with self._stats_lock:
+            if self._shadow_pending >= self.shadow_max_pending:
+                metrics.SHADOW_DROPPED.inc(len(X))
+                return
+            self._shadow_pending += 1
+            if self._shadow_executor is None:
+                self._shadow_executor = ThreadPoolExecutor(1, thread_name_prefix="shadow")
+        self._shadow_executor.submit(self._compare, version, candidate, X, labels)
+
+    def _compare(self, primary, candidate, X, labels):
+        try:
+            probs = candidate.predict_proba(X)
+            agreed = int((candidate.class_names[probs.argmax(axis=1)] == np.asarray(labels).astype(str)).sum())
+            key = (primary.name, candidate.name)
+            metrics.SHADOW_ROWS.labels(*key).inc(len(probs))
+            metrics.SHADOW_AGREED.labels(*key).inc(agreed)
+            with self._stats_lock:
+                rows, total_agreed = self.comparisons.get(key, (0, 0))
+                self.comparisons[key] = (rows + len(probs), total_agreed + agreed)
+        except Exception as e:
+            self.errors[candidate.name] = f"Ошибка теневого скоринга: {str(e)}"
+        finally:
+            with self._stats_lock:
+                self._shadow_pending -= 1
+
+    def describe(self):
+        '''
+        Состояние воркера: маршрутизация, загруженные версии с задержкой, согласие теневой версии,
+        ошибки загрузки и желаемое состояние из файла
+        '''
+        routing = self.routing
+        with self._stats_lock:
+            comparisons = [{"primary": primary, "candidate": candidate, "rows": rows, "agreed": agreed,
+                            "agreement": agreed / rows if rows else None}
+                           for (primary, candidate), (rows, agreed) in self.comparisons.items()]
+        return {"pid": os.getpid(),
+                "primary": routing.primary.name if routing else None,
+                "candidate": routing.candidate.name if routing and routing.candidate else None,
+                "mode": routing.mode if routing else None,
+                "fraction": routing.fraction if routing else None,
+                "versions": [version.describe() for version in self.versions.values()],
+                "comparisons": comparisons,
+                "errors": dict(self.errors),
+                "state": self.read_state()}
+
+
+def _check_version(state, name):
+    if name not in state["versions"]:
+        raise ModelVersionNotFoundError(name)
+
+
+def _set_primary(state, name):
+    state["primary"] = name
+    if state.get("candidate") == name:
+        state["candidate"] = None
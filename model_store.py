@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+from xgboost import XGBClassifier
+
+from backends import ArrayTreeBackend, load_array_backend
+
+STORE_VERSION = 1
+TABLE_ARRAYS = ("feature", "threshold", "default_left", "leaf_value", "tree_class", "base_margin")
+
+
+def export_store(bundle, path):
+    '''
+    Экспортирует бандл (модель, список признаков, энкодер) в каталог,
+    который воркеры могут отображать в память только для чтения:
+
+    * meta.json — версия формата, selected_features, классы энкодера
+    * booster.ubj — бустер XGBoost в бинарном формате (без pickle)
+    * *.npy — таблица узлов для бэкенда array
+
+    Каталог собирается во временной папке и подменяется атомарно,
+    поэтому воркеры никогда не видят недописанное хранилище.
+    Поля бандла, не нужные для инференса (sample_weight), не сохраняются
+    '''
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    model = bundle["model"]
+    model.save_model(os.path.join(tmp_path, "booster.ubj"))
+
+    table = load_array_backend(model)
+    for name in TABLE_ARRAYS:
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(getattr(table, name)))
+
+    meta = {"version": STORE_VERSION,
+            "selected_features": list(bundle["selected_features"]),
+            "classes": [str(cls) for cls in bundle["label_encoder"].classes_]}
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def load_store(path, with_booster=True):
+    '''
+    Загружает хранилище, созданное export_store.
+    Массивы таблицы узлов отображаются в память (mmap_mode="r"), так что все воркеры
+    на машине делят одни и те же страницы page cache вместо собственных копий.
+    Бустер из booster.ubj десериализуется только при with_booster (нужен бэкендам xgboost и auto),
+    иначе в бандле model = None и процесс не держит собственную копию модели.
+
+    Возвращает словарь в формате бандла и готовый ArrayTreeBackend
+    '''
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["version"] != STORE_VERSION:
+        raise ValueError(f"Неподдерживаемая версия хранилища модели: {meta['version']}")
+
+    model = None
+    if with_booster:
+        model = XGBClassifier()
+        model.load_model(os.path.join(path, "booster.ubj"))
+
+    label_encoder = LabelEncoder()
+    label_encoder.classes_ = np.asarray(meta["classes"])
+
+    table = ArrayTreeBackend(**{name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                                for name in TABLE_ARRAYS})
+
+    bundle = {"model": model,
+              "selected_features": meta["selected_features"],
+              "label_encoder": label_encoder}
+    return bundle, table
+
+
+def load_pipeline(store_path, bundle_path, with_booster=True):
+    '''
+    Загружает пайплайн из хранилища store_path, если оно существует, иначе из бандла joblib
+    (with_booster — см. load_store). Возвращает бандл и таблицу узлов из хранилища (или None)
+    '''
+    if os.path.isdir(store_path):
+        return load_store(store_path, with_booster)
+
+    import joblib
+    return joblib.load(bundle_path), None
+
+
+if __name__ == "__main__":
+    # Экспорт хранилища: python model_store.py model/xgb_pipeline_bundle.pkl model/xgb_pipeline_store
+    import joblib
+
+    bundle_path, store_path = sys.argv[1:3]
+    export_store(joblib.load(bundle_path), store_path)
+    print(f"Хранилище модели сохранено в {store_path}")
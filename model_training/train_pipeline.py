@@ -0,0 +1,506 @@
+'''
+Обучение модели по полному CIC-IDS2017 (и большим захватам) без загрузки CSV в память —
+скриптовый вариант model_training.ipynb с теми же шагами и тем же бандлом на выходе:
+
+1. CSV читается чанками в колоночный кэш float32 (в памяти — один чанк): та же очистка,
+что в ноутбуке (inf/NaN, дубликаты, группировка лейблов, удаление Rare). Дубликаты ищутся
+по 64-битному хэшу строки. Повторный запуск по тому же CSV берет готовый кэш
+2. Стратифицированное разделение на обучение и тест (80/20, как в ноутбуке);
+для подбора гиперпараметров из обучения выделяется валидация, чтобы не подбирать их по тесту
+3. Матрицы XGBoost собираются из кэша батчами (QuantileDMatrix, с --external-memory —
+ExtMemQuantileDMatrix со страницами на диске)
+4. Базовая модель на всех признаках и SHAP на ограниченной стратифицированной выборке
+теста (TreeSHAP самого XGBoost, pred_contribs) — рейтинг признаков
+5. Optuna: top-N признаков и гиперпараметры из ноутбука, trials идут параллельно,
+бесперспективные отсекаются по mlogloss на валидации (MedianPruner)
+6. Финальная модель на лучших параметрах, отчет по тесту и бандл
+{model, selected_features, label_encoder, sample_weight}, который загружает api.py.
+Бандл записывается атомарно, поэтому реестр версий API не увидит недописанный файл
+7. Обучающие строки проверяются по FEATURE_BOUNDS из config.py той же validate_matrix,
+что в API: в отчет пишутся наблюдаемые диапазоны выбранных признаков и число строк вне границ
+
+Запуск из корня проекта:
+    python model_training/train_pipeline.py model_training/CIC-IDS2017.csv --output model/xgb_pipeline_bundle.pkl
+'''
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import classification_report, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+from sklearn.utils.class_weight import compute_class_weight
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FEATURE_BOUNDS
+from validation import validate_matrix
+
+CACHE_VERSION = 1
+LABEL_COLUMN = "Label"
+
+# Группировка лейблов CIC-IDS2017 (как prepare_labels в ноутбуке); Rare отбрасывается
+LABEL_GROUPS = {'BENIGN': 'Normal',
+                'Bot': 'Bot',
+                'DDoS': 'DoS',
+                'DoS slowloris': 'DoS',
+                'DoS Slowhttptest': 'DoS',
+                'DoS Hulk': 'DoS',
+                'DoS GoldenEye': 'DoS',
+                'FTP-Patator': 'BruteForce',
+                'SSH-Patator': 'BruteForce',
+                'Heartbleed': 'Rare',
+                'Infiltration': 'Rare',
+                'PortScan': 'Recon',
+                'Web Attack - Brute Force': 'Web',
+                'Web Attack - XSS': 'Web',
+                'Web Attack - Sql Injection': 'Web'}
+DROP_CLASSES = ('Rare',)
+GROUPS = sorted(set(LABEL_GROUPS.values()) - set(DROP_CLASSES))
+
+# Базовая модель на всех признаках (для рейтинга SHAP)
+BASELINE_PARAMS = {'n_estimators': 300,
+                   'max_depth': 6,
+                   'learning_rate': 0.1,
+                   'subsample': 0.8,
+                   'colsample_bytree': 0.8}
+
+
+class FeatureCache:
+    '''
+    Колоночный кэш датасета в каталоге path:
+
+    * X.npy — матрица признаков float32 в порядке столбцов (fortran order), поэтому выборка
+    нескольких признаков читает с диска только их
+    * y.npy — индексы классов (uint8)
+    * meta.json — версия формата, признаки, классы, исходный CSV и счетчики очистки
+
+    Массивы отображаются в память только для чтения
+    '''
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.features = self.meta["features"]
+        self.classes = self.meta["classes"]
+        self.X = np.load(os.path.join(path, "X.npy"), mmap_mode="r")
+        self.y = np.load(os.path.join(path, "y.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.y)
+
+    def take(self, rows, features):
+        '''
+        Матрица float32 строк rows (по возрастанию) и признаков features
+        '''
+        X = np.empty((len(rows), len(features)), dtype=np.float32)
+        for j, feature in enumerate(features):
+            X[:, j] = self.X[rows, self.features.index(feature)]
+        return X
+
+
+def prepare_chunk(chunk):
+    '''
+    Очистка чанка как в ноутбуке: пробелы в названиях столбцов, inf и NaN, группировка лейблов.
+    Возвращает признаки float32, индексы групп в GROUPS и хэши строк (признаки + исходный лейбл)
+    для удаления дубликатов. Строки с NaN/inf, классы DROP_CLASSES и неизвестные лейблы отбрасываются
+    '''
+    chunk.columns = chunk.columns.str.strip()
+    labels = chunk.pop(LABEL_COLUMN)
+    values = chunk.to_numpy(dtype=np.float64)
+
+    valid = np.isfinite(values).all(axis=1) & labels.notna().to_numpy()
+    groups = labels.str.replace('�', '-', regex=False).map(LABEL_GROUPS)
+    keep = valid & groups.isin(GROUPS).to_numpy()
+
+    kept = pd.DataFrame(values[keep])
+    kept[LABEL_COLUMN] = labels[keep].to_numpy()
+    hashes = pd.util.hash_pandas_object(kept, index=False).to_numpy()
+    group_idx = np.searchsorted(GROUPS, groups[keep].to_numpy()).astype(np.uint8)
+    return values[keep].astype(np.float32), group_idx, hashes, int((~valid).sum())
+
+
+def build_cache(csv_path, cache_dir, chunk_rows=500_000):
+    '''
+    Строит кэш FeatureCache по CSV в два прохода:
+
+    1. CSV читается чанками, очищенные строки дописываются в сырые файлы (строки подряд)
+    вместе с хэшами строк
+    2. По хэшам находятся первые вхождения строк (drop_duplicates), оставшиеся строки
+    переписываются в X.npy по столбцам, индексы групп — в индексы LabelEncoder
+
+    Если кэш уже построен по этому же CSV (размер и время изменения совпадают), он переиспользуется
+    '''
+    source = {"path": os.path.abspath(csv_path),
+              "size": os.path.getsize(csv_path),
+              "mtime": os.path.getmtime(csv_path)}
+    try:
+        cache = FeatureCache(cache_dir)
+        if cache.meta["version"] == CACHE_VERSION and cache.meta["source"] == source:
+            return cache
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(cache_dir, exist_ok=True)
+    raw_paths = {name: os.path.join(cache_dir, f"{name}.raw") for name in ("X", "y", "hash")}
+    features, rows_read, invalid, rows_kept = None, 0, 0, 0
+
+    with open(raw_paths["X"], "wb") as fx, open(raw_paths["y"], "wb") as fy, open(raw_paths["hash"], "wb") as fh:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, low_memory=False):
+            rows_read += len(chunk)
+            X, group_idx, hashes, chunk_invalid = prepare_chunk(chunk)
+            if features is None:
+                features = list(chunk.columns)
+            elif list(chunk.columns) != features:
+                raise ValueError(f"Столбцы чанка со строки {rows_read - len(chunk) + 1} отличаются от заголовка")
+            invalid += chunk_invalid
+            rows_kept += len(X)
+            fx.write(X.tobytes())
+            fy.write(group_idx.tobytes())
+            fh.write(hashes.tobytes())
+
+    hashes = np.fromfile(raw_paths["hash"], dtype=np.uint64)
+    _, first = np.unique(hashes, return_index=True)
+    rows = np.sort(first)
+    del hashes, first
+
+    group_idx = np.fromfile(raw_paths["y"], dtype=np.uint8)[rows]
+    present = np.unique(group_idx)
+    classes = [GROUPS[i] for i in present]
+    remap = np.zeros(len(GROUPS), dtype=np.uint8)
+    remap[present] = np.arange(len(present))
+    np.save(os.path.join(cache_dir, "y.npy"), remap[group_idx])
+
+    raw_X = np.memmap(raw_paths["X"], dtype=np.float32, mode="r").reshape(-1, len(features))
+    X = np.lib.format.open_memmap(os.path.join(cache_dir, "X.npy"), mode="w+", dtype=np.float32,
+                                  shape=(len(rows), len(features)), fortran_order=True)
+    for start in range(0, len(rows), chunk_rows):
+        X[start:start + chunk_rows] = raw_X[rows[start:start + chunk_rows]]
+    X.flush()
+    del X, raw_X
+    for path in raw_paths.values():
+        os.remove(path)
+
+    meta = {"version": CACHE_VERSION,
+            "source": source,
+            "features": features,
+            "classes": classes,
+            "rows_read": rows_read,
+            "rows_invalid": invalid,
+            "rows_dropped_classes": rows_read - invalid - rows_kept,
+            "rows_duplicates": rows_kept - len(rows),
+            "rows": len(rows)}
+    with open(os.path.join(cache_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return FeatureCache(cache_dir)
+
+
+class CacheIter(xgb.DataIter):
+    '''
+    Подает строки кэша в XGBoost батчами по batch_rows: только нужные признаки, метки
+    и веса классов. Вся матрица float32 в памяти не собирается
+    '''
+    def __init__(self, cache, rows, features, batch_rows, class_weights=None, cache_prefix=None):
+        self.cache = cache
+        self.rows = np.sort(rows)
+        self.features = list(features)
+        self.batch_rows = batch_rows
+        self.class_weights = class_weights
+        self._start = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._start >= len(self.rows):
+            return False
+        rows = self.rows[self._start:self._start + self.batch_rows]
+        self._start += self.batch_rows
+        y = self.cache.y[rows]
+        input_data(data=self.cache.take(rows, self.features), label=y, feature_names=self.features,
+                   weight=None if self.class_weights is None else self.class_weights[y])
+        return True
+
+    def reset(self):
+        self._start = 0
+
+
+class MatrixFactory:
+    '''
+    Собирает квантованные матрицы XGBoost из кэша. При external_memory страницы хранятся
+    в work_dir (ExtMemQuantileDMatrix), иначе квантованные данные держатся в памяти (QuantileDMatrix)
+    '''
+    def __init__(self, cache, class_weights, work_dir, batch_rows=500_000, max_bin=256, external_memory=False):
+        self.cache = cache
+        self.class_weights = class_weights
+        self.work_dir = work_dir
+        self.batch_rows = batch_rows
+        self.max_bin = max_bin
+        self.external_memory = external_memory
+
+    def build(self, rows, features, ref=None, name="train"):
+        if self.external_memory:
+            prefix = os.path.join(self.work_dir, f"{name}-{os.getpid()}-{time.monotonic_ns()}")
+            it = CacheIter(self.cache, rows, features, self.batch_rows, self.class_weights, cache_prefix=prefix)
+            return xgb.ExtMemQuantileDMatrix(it, max_bin=self.max_bin, ref=ref)
+        it = CacheIter(self.cache, rows, features, self.batch_rows, self.class_weights)
+        return xgb.QuantileDMatrix(it, max_bin=self.max_bin, ref=ref)
+
+
+def booster_params(params, num_class, max_bin, seed, nthread):
+    '''
+    Параметры xgb.train из параметров XGBClassifier (n_estimators задается отдельно числом раундов)
+    '''
+    return {**{key: value for key, value in params.items() if key != 'n_estimators'},
+            'objective': 'multi:softprob',
+            'num_class': num_class,
+            'eval_metric': 'mlogloss',
+            'tree_method': 'hist',
+            'max_bin': max_bin,
+            'seed': seed,
+            'nthread': nthread}
+
+
+def macro_f1(booster, dmatrix, y):
+    return float(f1_score(y, booster.predict(dmatrix).argmax(axis=1), average='macro'))
+
+
+def shap_ranking(booster, cache, rows, n_samples, seed):
+    '''
+    Рейтинг признаков по среднему абсолютному SHAP на стратифицированной выборке
+    не больше n_samples строк (TreeSHAP XGBoost, без фонового набора данных)
+    '''
+    if n_samples < len(rows):
+        rows, _ = train_test_split(rows, train_size=n_samples, stratify=cache.y[rows], random_state=seed)
+    rows = np.sort(rows)
+    sample = xgb.DMatrix(cache.take(rows, cache.features), feature_names=cache.features)
+    contribs = booster.predict(sample, pred_contribs=True)
+    mean_abs_shap = np.abs(contribs[..., :-1]).mean(axis=(0, 1))
+    return (pd.DataFrame({'feature': cache.features, 'mean_abs_shap': mean_abs_shap})
+            .sort_values(by='mean_abs_shap', ascending=False)
+            .reset_index(drop=True))
+
+
+class PruningCallback(xgb.callback.TrainingCallback):
+    '''
+    Передает в Optuna -mlogloss на валидации после каждого раунда
+    и останавливает trial, если pruner считает его бесперспективным
+    '''
+    def __init__(self, trial):
+        self.trial = trial
+
+    def after_iteration(self, model, epoch, evals_log):
+        import optuna
+
+        self.trial.report(-evals_log['valid']['mlogloss'][-1], epoch)
+        if self.trial.should_prune():
+            raise optuna.TrialPruned(f"Trial отсечен на раунде {epoch}")
+        return False
+
+
+def suggest_params(trial, min_features, max_features):
+    '''
+    Пространство поиска из ноутбука
+    '''
+    return {'n_features': trial.suggest_int('n_features', min_features, max_features),
+            'n_estimators': trial.suggest_int('n_estimators', 50, 100),
+            'max_depth': trial.suggest_int('max_depth', 3, 6),
+            'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
+            'subsample': trial.suggest_float('subsample', 0.6, 1.0),
+            'colsample_bytree': trial.suggest_float('colsample_bytree', 0.6, 1.0),
+            'gamma': trial.suggest_float('gamma', 0, 5),
+            'min_child_weight': trial.suggest_int('min_child_weight', 1, 10)}
+
+
+def tune(cache, factory, ranking, fit_rows, valid_rows, args):
+    '''
+    Подбор числа признаков и гиперпараметров: args.jobs trials параллельно (XGBoost отпускает GIL),
+    у каждого trial args.threads потоков и свои матрицы по его top-N признакам
+    '''
+    import optuna
+
+    num_class = len(cache.classes)
+    y_valid = cache.y[np.sort(valid_rows)]
+
+    def objective(trial):
+        params = suggest_params(trial, args.min_features, args.max_features)
+        features = ranking.head(params.pop('n_features'))['feature'].tolist()
+        dtrain = factory.build(fit_rows, features, name=f"trial{trial.number}")
+        dvalid = factory.build(valid_rows, features, ref=dtrain, name=f"trial{trial.number}-valid")
+        booster = xgb.train(booster_params(params, num_class, args.max_bin, args.seed, args.threads),
+                            dtrain, params['n_estimators'], evals=[(dvalid, 'valid')],
+                            callbacks=[PruningCallback(trial)], verbose_eval=False)
+        return macro_f1(booster, dvalid, y_valid)
+
+    study = optuna.create_study(direction='maximize',
+                                sampler=optuna.samplers.TPESampler(seed=args.seed),
+                                pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=10),
+                                storage=args.storage,
+                                study_name=args.study_name,
+                                load_if_exists=args.storage is not None)
+    study.optimize(objective, n_trials=args.trials, n_jobs=args.jobs, timeout=args.timeout,
+                   show_progress_bar=args.progress)
+    return study
+
+
+def to_classifier(booster):
+    '''
+    XGBClassifier из бустера xgb.train (как load_store в model_store.py)
+    '''
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    return model
+
+
+def save_bundle(bundle, path):
+    '''
+    Атомарная запись бандла: воркеры API следят за временем изменения файла
+    и не должны прочитать его недописанным
+    '''
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def check_bounds(cache, features, bounds=FEATURE_BOUNDS, batch_rows=500_000, max_errors=10):
+    '''
+    Наблюдаемые диапазоны признаков features по всему кэшу и проверка строк по bounds
+    (validate_matrix, как в API) батчами по batch_rows строк
+
+    Возвращает {"feature_ranges": {признак: [минимум, максимум]}, "rows_out_of_bounds": число строк,
+    которые API отклонил бы, "errors": первые max_errors сообщений validate_matrix}
+    '''
+    low = np.full(len(features), np.inf)
+    high = np.full(len(features), -np.inf)
+    rows_invalid, errors = 0, []
+    for start in range(0, len(cache), batch_rows):
+        X = cache.take(np.arange(start, min(start + batch_rows, len(cache))), features)
+        low = np.minimum(low, X.min(axis=0, initial=np.inf))
+        high = np.maximum(high, X.max(axis=0, initial=-np.inf))
+        _, report = validate_matrix(X, features, bounds, mode="mask", max_errors=max_errors - len(errors),
+                                    row_offset=start)
+        rows_invalid += report["rows_invalid"]
+        errors.extend(report["errors"])
+    return {"feature_ranges": {feature: [float(low[j]), float(high[j])] for j, feature in enumerate(features)},
+            "rows_out_of_bounds": rows_invalid,
+            "errors": errors}
+
+
+def run(args):
+    started = time.perf_counter()
+    cache = build_cache(args.csv, args.cache_dir, args.chunk_rows)
+    print(f"Кэш: {len(cache)} строк, {len(cache.features)} признаков, классы {cache.classes} "
+          f"({time.perf_counter() - started:.1f} s)")
+
+    # Разделение по индексам строк, данные не копируются
+    all_rows = np.arange(len(cache))
+    train_rows, test_rows = train_test_split(all_rows, stratify=cache.y, test_size=0.2, random_state=args.seed)
+    fit_rows, valid_rows = train_test_split(train_rows, stratify=cache.y[train_rows], test_size=args.valid_size,
+                                            random_state=args.seed)
+    train_rows, test_rows = np.sort(train_rows), np.sort(test_rows)
+
+    y_train = cache.y[train_rows]
+    class_weights = compute_class_weight(class_weight='balanced', classes=np.arange(len(cache.classes)), y=y_train)
+    factory = MatrixFactory(cache, class_weights, os.path.join(args.cache_dir, "xgb"), args.batch_rows,
+                            args.max_bin, args.external_memory)
+    os.makedirs(factory.work_dir, exist_ok=True)
+    num_class = len(cache.classes)
+    nthread = os.cpu_count() or 1
+
+    # Базовая модель на всех признаках и рейтинг SHAP
+    dtrain = factory.build(train_rows, cache.features)
+    baseline = xgb.train(booster_params(BASELINE_PARAMS, num_class, args.max_bin, args.seed, nthread),
+                         dtrain, BASELINE_PARAMS['n_estimators'])
+    del dtrain
+    ranking = shap_ranking(baseline, cache, test_rows, args.shap_samples, args.seed)
+    print("Топ-20 признаков по SHAP:")
+    print(ranking.head(20).to_string())
+
+    study = tune(cache, factory, ranking, fit_rows, valid_rows, args)
+    print('Лучшие параметры:', study.best_params)
+    print('Лучший macro-F1 (валидация):', study.best_value)
+
+    # Финальная модель на всей обучающей выборке
+    best_params = dict(study.best_params)
+    selected_features = ranking.head(best_params.pop('n_features'))['feature'].tolist()
+    dtrain = factory.build(train_rows, selected_features)
+    dtest = factory.build(test_rows, selected_features, ref=dtrain, name="test")
+    booster = xgb.train(booster_params(best_params, num_class, args.max_bin, args.seed, nthread),
+                        dtrain, best_params['n_estimators'])
+
+    y_test = cache.y[test_rows]
+    report = classification_report(y_test, booster.predict(dtest).argmax(axis=1), labels=np.arange(num_class),
+                                    target_names=cache.classes, output_dict=True, zero_division=0)
+    print(f"Macro-F1 (best_model): {report['macro avg']['f1-score']:.3f}")
+    for label in cache.classes:
+        print(f"{label}: F1 = {report[label]['f1-score']:.3f}")
+
+    bounds = check_bounds(cache, selected_features, batch_rows=args.batch_rows)
+    if bounds["rows_out_of_bounds"]:
+        print(f"Внимание: {bounds['rows_out_of_bounds']} обучающих строк вне FEATURE_BOUNDS, "
+              f"API их отклонит: {bounds['errors'][:3]}")
+
+    label_encoder = LabelEncoder()
+    label_encoder.classes_ = np.asarray(cache.classes)
+    save_bundle({'model': to_classifier(booster),
+                 'selected_features': selected_features,
+                 'label_encoder': label_encoder,
+                 'sample_weight': class_weights[y_train].astype(np.float32)}, args.output)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"rows": len(cache),
+                       "classes": cache.classes,
+                       "selected_features": selected_features,
+                       "best_params": study.best_params,
+                       "best_valid_macro_f1": study.best_value,
+                       "trials": len(study.trials),
+                       "pruned_trials": sum(trial.state.name == "PRUNED" for trial in study.trials),
+                       "test_report": report,
+                       "shap_ranking": ranking.to_dict("records"),
+                       "feature_ranges": bounds["feature_ranges"],
+                       "rows_out_of_bounds": bounds["rows_out_of_bounds"],
+                       "bounds_errors": bounds["errors"],
+                       "seconds": time.perf_counter() - started}, f, ensure_ascii=False, indent=2)
+
+    print(f"Бандл сохранен в {args.output} ({time.perf_counter() - started:.1f} s)")
+    return study, report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", help="CSV в формате CIC-IDS2017 (признаки CICFlowMeter и столбец Label)")
+    parser.add_argument("--output", default="model/xgb_pipeline_bundle.pkl")
+    parser.add_argument("--report", help="JSON с параметрами, отчетом по тесту и рейтингом SHAP")
+    parser.add_argument("--cache-dir", default="model_training/cache")
+    parser.add_argument("--chunk-rows", type=int, default=500_000, help="строк в чанке при чтении CSV")
+    parser.add_argument("--batch-rows", type=int, default=500_000, help="строк в батче при сборке матриц XGBoost")
+    parser.add_argument("--external-memory", action="store_true",
+                        help="хранить квантованные матрицы на диске (ExtMemQuantileDMatrix)")
+    parser.add_argument("--max-bin", type=int, default=256)
+    parser.add_argument("--valid-size", type=float, default=0.1, help="доля обучающей выборки для валидации trials")
+    parser.add_argument("--shap-samples", type=int, default=5000, help="размер выборки для SHAP")
+    parser.add_argument("--min-features", type=int, default=5)
+    parser.add_argument("--max-features", type=int, default=10)
+    parser.add_argument("--trials", type=int, default=100)
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 1) // 4),
+                        help="trials, выполняемых параллельно")
+    parser.add_argument("--threads", type=int, default=None, help="потоков XGBoost на trial")
+    parser.add_argument("--timeout", type=float, default=None, help="ограничение времени подбора, с")
+    parser.add_argument("--storage", help="хранилище Optuna (например, sqlite:///optuna.db) для продолжения подбора")
+    parser.add_argument("--study-name", default="xgb_pipeline")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--progress", action="store_true", help="индикатор прогресса Optuna")
+    args = parser.parse_args(argv)
+    if args.threads is None:
+        args.threads = max(1, (os.cpu_count() or 1) // args.jobs)
+    return args
+
+
+if __name__ == "__main__":
+    run(parse_args())
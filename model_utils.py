@@ -1,28 +1,139 @@
-import pandas as pd
+import threading
+from typing import TYPE_CHECKING
 
+import numpy as np
 
-def predict_from_df(df: pd.DataFrame, model, label_encoder, selected_features):
+from backends import XGBoostBackend
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def predict_probs(model, X):
+    '''
+    Единственный проход бустера по данным.
+    Возвращает матрицу вероятностей размера (число строк, число классов).
+    '''
+    return np.asarray(model.predict_proba(X))
+
+
+def decode_probs(probs, label_encoder):
+    '''
+    Получает из матрицы вероятностей индексы классов (argmax),
+    строковые лейблы и уверенности без повторного вызова модели.
+    '''
+    pred_idx = probs.argmax(axis=1)
+    labels = label_encoder.inverse_transform(pred_idx)
+    confidences = probs[np.arange(len(pred_idx)), pred_idx]
+    return labels, confidences
+
+
+def build_results(labels, probs, confidences, class_names):
+    '''
+    Формирует список словарей с предсказанием, уверенностью
+    и вероятностями по каждому классу.
+    Числа переводятся в Python-объекты одним вызовом tolist для всей матрицы
+    '''
+    class_names = [str(cls) for cls in class_names]
+    labels = np.asarray(labels).astype(str).tolist()
+    return [{"prediction": label,
+             "confidence": conf,
+             "probabilities": dict(zip(class_names, prob))}
+            for label, prob, conf in zip(labels, np.asarray(probs, dtype=np.float64).tolist(),
+                                         np.asarray(confidences, dtype=np.float64).tolist())]
+
+
+def build_columnar(labels, probs, confidences, class_names):
+    '''
+    Колоночный формат ответа: списки классов, предсказаний и уверенностей
+    и матрица вероятностей (строки — объекты, столбцы — классы в порядке classes).
+    Массивы NumPy остаются как есть, сериализатор пишет их напрямую
+    '''
+    return {"classes": [str(cls) for cls in class_names],
+            "predictions": np.asarray(labels).astype(str).tolist(),
+            "confidence": np.ascontiguousarray(confidences, dtype=np.float32),
+            "probabilities": np.ascontiguousarray(probs, dtype=np.float32)}
+
+
+def predict_from_df(df: 'pd.DataFrame', model, label_encoder, selected_features):
     '''
     Делает предсказание для DataFrame с правильными колонками.
     Возвращает кортеж с лейблами, вероятностями, уверенностями.
     '''
     df = df[selected_features]
-    preds = model.predict(df)
-    probs = model.predict_proba(df)
-    labels = label_encoder.inverse_transform(preds)
-    confidences = probs.max(axis=1)
+    probs = predict_probs(model, df)
+    labels, confidences = decode_probs(probs, label_encoder)
     return labels, probs, confidences
 
 
 def predict_single(features: dict, model, label_encoder, selected_features):
     '''
-    Делает предсказание для одного объекта (словарь признаков).
+    Делает предсказание для одного объекта (словарь признаков) без DataFrame.
     Возвращает лейбл, вероятность, уверенность.
     '''
-    df = pd.DataFrame([features])
-    df = df[selected_features]
-    probs = model.predict_proba(df)[0]
-    pred_index = probs.argmax()
-    pred_label = label_encoder.inverse_transform([pred_index])[0]
-    confidence = probs[pred_index]
-    return pred_label, probs, confidence
\ No newline at end of file
+    row = np.array([[features[col] for col in selected_features]], dtype=np.float32)
+    probs = predict_probs(model, row)
+    labels, confidences = decode_probs(probs, label_encoder)
+    return labels[0], probs[0], confidences[0]
+
+
+class FastPredictor:
+    '''
+    Быстрый путь скоринга без pandas:
+
+    1. Предсказание идет через бэкенд инференса (по умолчанию нативный бустер XGBoost)
+    2. Названия классов заранее собираются в массив индекс -> лейбл
+    3. Для одного объекта используется заранее выделенная float32-строка (своя для каждого потока)
+
+    field_names — имена полей входных данных в порядке selected_features
+    '''
+    def __init__(self, model, label_encoder, selected_features, field_names=None, backend=None):
+        self.backend = backend or XGBoostBackend(model)
+        self.class_names = np.asarray(label_encoder.classes_).astype(str)
+        self.class_keys = self.class_names.tolist()
+        self.selected_features = list(selected_features)
+        self.field_names = list(field_names or selected_features)
+        self._local = threading.local()
+
+    def _row_buffer(self):
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = self._local.row = np.empty((1, len(self.field_names)), dtype=np.float32)
+        return row
+
+    def predict_probs(self, X):
+        '''
+        Матрица вероятностей для float32-массива признаков в порядке selected_features
+        '''
+        return self.backend.predict_proba(X)
+
+    def predict_rows(self, X):
+        '''
+        Предсказания для батча строк. Возвращает список словарей,
+        как build_results
+        '''
+        probs = self.predict_probs(X)
+        pred_idx = probs.argmax(axis=1)
+        return build_results(self.class_names[pred_idx], probs,
+                             probs[np.arange(len(pred_idx)), pred_idx], self.class_keys)
+
+    def predict_one(self, data):
+        '''
+        Предсказание для одного объекта: атрибуты data (например, InputData)
+        переносятся в заранее выделенную строку. Возвращает лейбл, вероятности, уверенность
+        '''
+        row = self._row_buffer()
+        for i, name in enumerate(self.field_names):
+            row[0, i] = getattr(data, name)
+        probs = self.predict_probs(row)[0]
+        pred_index = int(probs.argmax())
+        return self.class_keys[pred_index], probs, float(probs[pred_index])
+
+    def result_one(self, data):
+        '''
+        То же, что predict_one, но в формате ответа API
+        '''
+        label, probs, confidence = self.predict_one(data)
+        return {"prediction": label,
+                "confidence": confidence,
+                "probabilities": dict(zip(self.class_keys, probs.tolist()))}
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    '''
+    Ограниченный LRU-кэш вероятностей с TTL.
+
+    Ключ — строка признаков в порядке selected_features. Для признаков из quantization
+    значение перед построением ключа округляется до шага (например, скорости пакетов
+    до 10 пакетов/с), поэтому почти одинаковые потоки из сканов и DoS-флудов попадают в одну запись.
+    Остальные признаки сравниваются точно.
+
+    Счетчики hits / misses / evictions / expirations / batch_duplicates показывают,
+    сколько строк не пришлось отправлять в модель
+    '''
+    def __init__(self, selected_features, max_size=100_000, ttl_s=300, quantization=None):
+        quantization = quantization or {}
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.steps = np.array([quantization.get(col, 0) for col in selected_features], dtype=np.float64)
+        self._quantized = self.steps > 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.duplicates = 0
+
+    def keys(self, X):
+        '''
+        Ключи кэша для матрицы признаков: байты квантованной строки
+        '''
+        Q = np.array(X, dtype=np.float64)
+        if self._quantized.any():
+            Q[:, self._quantized] = np.round(Q[:, self._quantized] / self.steps[self._quantized])
+        Q += 0.0  # -0.0 и 0.0 дают один ключ
+        return [row.tobytes() for row in Q]
+
+    def get(self, key):
+        '''
+        Вероятности по ключу или None (промах, истекший TTL)
+        '''
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, probs = entry
+            if expires_at < now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return probs
+
+    def put(self, key, probs):
+        expires_at = time.monotonic() + self.ttl_s
+        with self._lock:
+            self._entries[key] = (expires_at, probs)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_duplicates(self, count):
+        '''
+        Учитывает строки, схлопнутые внутри батча до скоринга
+        '''
+        with self._lock:
+            self.duplicates += count
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "batch_duplicates": self.duplicates,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+class CachedBackend:
+    '''
+    Обертка над бэкендом инференса с кэшем предсказаний:
+
+    1. Одинаковые (после квантования) строки внутри батча схлопываются до одной
+    2. Уникальные строки ищутся в кэше
+    3. Промахи скорятся одним вызовом исходного бэкенда и кладутся в кэш
+    4. Вероятности раскладываются обратно по всем строкам батча
+    '''
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if not len(X):
+            return self.backend.predict_proba(X)
+        keys = self.cache.keys(X)
+
+        unique = {}
+        inverse = np.empty(len(keys), dtype=np.int64)
+        first_rows = []
+        for i, key in enumerate(keys):
+            index = unique.get(key)
+            if index is None:
+                index = unique[key] = len(first_rows)
+                first_rows.append(i)
+            inverse[i] = index
+
+        self.cache.record_duplicates(len(keys) - len(unique))
+        unique_keys = list(unique)
+        cached = [self.cache.get(key) for key in unique_keys]
+        missing = [i for i, probs in enumerate(cached) if probs is None]
+
+        if missing:
+            scored = self.backend.predict_proba(X[[first_rows[i] for i in missing]])
+            for i, probs in zip(missing, scored):
+                cached[i] = probs
+                self.cache.put(unique_keys[i], probs.copy())
+
+        return np.asarray(cached)[inverse]
@@ -0,0 +1,93 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+
+class SamplingProfiler:
+    '''
+    Сэмплирующий профилировщик для включения по запросу на работающем сервере.
+
+    Фоновый поток раз в interval_s снимает стеки всех потоков процесса (sys._current_frames)
+    и считает, сколько раз встретился каждый стек. Пока профилировщик выключен,
+    он ничего не стоит: потока нет. Результат — свернутые стеки (формат flamegraph.pl / speedscope):
+    строка "корень;...;лист число_сэмплов" на каждый стек
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = collections.Counter()
+        self.samples = 0
+        self.interval_s = None
+        self.started_at = None
+        self.stopped_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_s=0.005, duration_s=30):
+        '''
+        Начинает новую запись (старые стеки сбрасываются). Запись остановится сама через duration_s
+        '''
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Профилировщик уже запущен")
+            self._stacks = collections.Counter()
+            self.samples = 0
+            self.interval_s = interval_s
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval_s, duration_s),
+                                            name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        '''
+        Останавливает запись и возвращает свернутые стеки
+        '''
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        return self.folded()
+
+    def _run(self, interval_s, duration_s):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + duration_s
+        while not self._stop.wait(interval_s) and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+        self.stopped_at = time.time()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def top(self, limit=20):
+        '''
+        Функции, чаще всего оказывавшиеся на вершине стека (собственное время), с долей сэмплов
+        '''
+        leaves = collections.Counter()
+        for stack, count in list(self._stacks.items()):
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [{"function": name, "samples": count, "share": round(count / total, 4)}
+                for name, count in leaves.most_common(limit)]
+
+    def status(self):
+        return {"running": self.running,
+                "interval_s": self.interval_s,
+                "samples": self.samples,
+                "started_at": self.started_at,
+                "stopped_at": self.stopped_at}
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+# Уровни уверенности по CONFIDENCE_THRESHOLDS: ниже low, ниже medium, остальное
+CONFIDENCE_LEVELS = ("Низкая", "Средняя", "Высокая")
+
+
+def merge_columnar(pages):
+    '''
+    Склеивает страницы колоночных результатов API (shape=columnar) в один объект
+    с массивами NumPy вместо списков
+    '''
+    pages = [page for page in pages if page["predictions"]]
+    if not pages:
+        return None
+    n_classes = len(pages[0]["classes"])
+    return {"classes": pages[0]["classes"],
+            "predictions": np.concatenate([np.asarray(page["predictions"], dtype=object) for page in pages]),
+            "confidence": np.concatenate([np.asarray(page["confidence"], dtype=np.float32) for page in pages]),
+            "probabilities": np.concatenate([np.asarray(page["probabilities"], dtype=np.float32).reshape(-1, n_classes)
+                                             for page in pages])}
+
+
+def scored_rows(n_rows, validation=None):
+    '''
+    Индексы строк файла, для которых есть результаты: при отклонении строк с ошибками
+    (validation.mode = reject) это все строки, кроме validation.invalid_rows
+    '''
+    if not validation or validation.get("mode") != "reject" or not validation["invalid_rows"]:
+        return np.arange(n_rows)
+    keep = np.ones(validation["rows_total"], dtype=bool)
+    keep[np.asarray(validation["invalid_rows"])] = False
+    return np.flatnonzero(keep)
+
+
+def confidence_levels(confidence, thresholds):
+    '''
+    Уровень уверенности для каждой строки: "Низкая" ниже thresholds["low"],
+    "Средняя" ниже thresholds["medium"], иначе "Высокая"
+    '''
+    codes = np.searchsorted([thresholds["low"], thresholds["medium"]], confidence, side="right")
+    return pd.Categorical.from_codes(codes, categories=CONFIDENCE_LEVELS)
+
+
+def results_frame(columnar, validation=None, thresholds=None):
+    '''
+    Таблица результатов из колоночного ответа: номер строки файла (с 1), класс, уверенность,
+    уровень уверенности и вероятности по классам. Строится из массивов целиком, без цикла по строкам
+    '''
+    confidence = np.asarray(columnar["confidence"], dtype=np.float32)
+    df = pd.DataFrame({"Строка": scored_rows(len(confidence), validation) + 1,
+                       "Класс": pd.Categorical(columnar["predictions"], categories=columnar["classes"]),
+                       "Уверенность": confidence})
+    if thresholds is not None:
+        df["Уровень"] = confidence_levels(confidence, thresholds)
+    probabilities = pd.DataFrame(np.asarray(columnar["probabilities"], dtype=np.float32),
+                                 columns=columnar["classes"])
+    return pd.concat([df, probabilities], axis=1)
+
+
+def class_summary(df):
+    '''
+    Распределение классов: число строк, доля и средняя уверенность по каждому классу
+    '''
+    summary = df.groupby("Класс", observed=False)["Уверенность"].agg(["size", "mean"])
+    summary.columns = ["Строк", "Средняя уверенность"]
+    summary.insert(1, "Доля", summary["Строк"] / max(len(df), 1))
+    return summary.sort_values("Строк", ascending=False)
+
+
+def confidence_histogram(confidence, thresholds, bins=20):
+    '''
+    Гистограмма уверенности на [0, 1]: строки — левые границы интервалов,
+    столбцы — уровни уверенности (для столбчатой диаграммы с накоплением)
+    '''
+    confidence = np.asarray(confidence, dtype=np.float32)
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    levels = np.asarray(confidence_levels(confidence, thresholds).codes)
+    histogram = pd.DataFrame({level: np.histogram(confidence[levels == code], edges)[0]
+                              for code, level in enumerate(CONFIDENCE_LEVELS)},
+                             index=[f"{edge:.2f}" for edge in edges[:-1]])
+    histogram.index.name = "Уверенность"
+    return histogram
+
+
+def page(df, number, size):
+    '''
+    Страница number (с 1) таблицы по size строк
+    '''
+    start = (number - 1) * size
+    return df.iloc[start:start + size]
@@ -0,0 +1,37 @@
+import json
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Объект типа {type(obj).__name__} не сериализуется в JSON")
+
+
+def dumps(content):
+    '''
+    Сериализует ответ в JSON-байты: через orjson (массивы NumPy пишутся напрямую из памяти),
+    а если orjson не установлен — через стандартный json
+    '''
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    '''
+    JSON-ответ через dumps. Возвращаемый из обработчика объект Response
+    FastAPI не прогоняет через jsonable_encoder, поэтому большие результаты
+    не обходятся рекурсивно на Python
+    '''
+    def render(self, content):
+        return dumps(content)
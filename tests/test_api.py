@@ -2,10 +2,23 @@ import pytest
 from fastapi.testclient import TestClient
 import sys
 import os
+import io
+import json
+import struct
+import time
+import numpy as np
+import pandas as pd
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import api
 from api import app
+from concurrent.futures import ThreadPoolExecutor
+from jobs import JobManager
+from model_registry import default_state
+from flow_meter import write_pcap, build_frame, TCP_FIN
+from batch_formats import (MATRIX_CONTENT_TYPE, MATRIX_MAGIC, PREDICTIONS_CONTENT_TYPE, encode_matrix,
+                           decode_predictions)
 
 client = TestClient(app)
 # Ручной ввод (корректный запрос)
@@ -28,6 +41,24 @@ def test_predict_valid():
     assert "confidence" in data
     assert "probabilities" in data
 
+# Ручной ввод (быстрый путь без батчинга дает тот же ответ)
+def test_predict_unbatched_matches_batched(monkeypatch):
+    payload = {
+        "Destination_Port": 80,
+        "Init_Win_bytes_forward": 4096,
+        "Init_Win_bytes_backward": 4096,
+        "Bwd_Packets_s": 1200.0,
+        "min_seg_size_forward": 20,
+        "Fwd_IAT_Std": 3000.0,
+        "Flow_IAT_Min": 800.0,
+        "Bwd_Packet_Length_Min": 50,
+        "Fwd_Packets_s": 1800.0,
+        "Fwd_IAT_Min": 900.0}
+    batched = client.post("/predict", json=payload).json()
+    monkeypatch.setattr(api.batcher, "max_batch_size", 1)
+    unbatched = client.post("/predict", json=payload).json()
+    assert unbatched == batched
+
 # Ручной ввод (отсутствуют данные)
 def test_predict_missing_field():
     payload = {"Destination_Port": 443}  # остальные поля отсутствуют
@@ -63,6 +94,25 @@ def test_predict_csv_valid():
         assert "confidence" in row
         assert "probabilities" in row
 
+# Загрузка CSV (колоночный формат совпадает с форматом по строкам)
+def test_predict_csv_columnar():
+    with open("data/example.csv", "rb") as f:
+        contents = f.read()
+    rows = client.post("/predict_csv", files={"file": ("example.csv", contents, "text/csv")}).json()["results"]
+    response = client.post("/predict_csv?shape=columnar", files={"file": ("example.csv", contents, "text/csv")})
+    assert response.status_code == 200
+    columnar = response.json()["results"]
+    assert columnar["predictions"] == [row["prediction"] for row in rows]
+    assert columnar["confidence"] == pytest.approx([row["confidence"] for row in rows])
+    for probs, row in zip(columnar["probabilities"], rows):
+        assert dict(zip(columnar["classes"], probs)) == pytest.approx(row["probabilities"])
+
+# Загрузка CSV (неизвестный формат ответа)
+def test_predict_csv_wrong_shape():
+    with open("data/example.csv", "rb") as f:
+        response = client.post("/predict_csv?shape=table", files={"file": ("example.csv", f, "text/csv")})
+    assert response.status_code == 422
+
 # Загрузка CSV (пустой файл)
 def test_predict_csv_empty():
     response = client.post("/predict_csv", files={"file": ("empty.csv", b"", "text/csv")})
@@ -102,6 +152,63 @@ def test_predict_csv_missing_column():
     assert "error" in data
     assert "признаки" in data["error"] or "columns" in data["error"].lower()
 
+# Загрузка CSV (строки с NaN, inf, текстом и значениями вне границ отбрасываются по отдельности)
+def mixed_csv():
+    df = pd.read_csv("data/example.csv")
+    df = pd.concat([df, df, df], ignore_index=True).astype(object)
+    df.loc[1, "Flow IAT Min"] = np.nan
+    df.loc[2, "Bwd Packets/s"] = np.inf
+    df.loc[3, "Destination Port"] = "http"
+    df.loc[4, "Init_Win_bytes_forward"] = 70000
+    return df.to_csv(index=False).encode()
+
+def test_predict_csv_rejects_invalid_rows():
+    contents = mixed_csv()
+    response = client.post("/predict_csv", files={"file": ("mixed.csv", contents, "text/csv")})
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["results"]) == 2
+    validation = data["validation"]
+    assert validation["rows_invalid"] == 4
+    assert validation["invalid_rows"] == [1, 2, 3, 4]
+    assert validation["errors"][2] == {"row": 3, "errors": {"Destination Port": "не число"}}
+    assert "больше максимума" in validation["errors"][3]["errors"]["Init_Win_bytes_forward"]
+
+    with open("data/example.csv", "rb") as f:
+        expected = client.post("/predict_csv", files={"file": ("example.csv", f, "text/csv")}).json()["results"]
+    assert data["results"] == [expected[0], expected[1]]
+
+# Загрузка CSV (режим mask: ошибочные значения становятся пропусками, строки скорятся)
+def test_predict_csv_masks_invalid_values(monkeypatch):
+    monkeypatch.setattr(api, "VALIDATION_MODE", "mask")
+    response = client.post("/predict_csv?shape=columnar", files={"file": ("mixed.csv", mixed_csv(), "text/csv")})
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["results"]["predictions"]) == 6
+    assert data["validation"]["invalid_rows"] == [1, 2, 3, 4]
+
+# Потоковая загрузка CSV (отчет о проверке перед результатами чанка, индексы от начала файла)
+def test_predict_csv_stream_reports_invalid_rows(monkeypatch):
+    monkeypatch.setattr(api, "CSV_CHUNK_ROWS", 4)
+    response = client.post("/predict_csv_stream", files={"file": ("mixed.csv", mixed_csv(), "text/csv")})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["validation"]["invalid_rows"] for line in lines if "validation" in line] == [[1, 2, 3], [4]]
+    assert sum("prediction" in line for line in lines) == 2
+
+# Бинарный батч (строка с inf отбрасывается, число строк с ошибками в заголовке)
+def test_predict_batch_rejects_invalid_rows():
+    df = pd.read_csv("data/example.csv")
+    X = df.to_numpy(dtype=np.float32)
+    X[0, 0] = np.inf
+    body = encode_matrix(X, list(df.columns))
+    response = client.post("/predict_batch", content=body,
+                           headers={"Content-Type": MATRIX_CONTENT_TYPE, "Accept": PREDICTIONS_CONTENT_TYPE})
+    assert response.status_code == 200
+    assert response.headers["X-Invalid-Rows"] == "1"
+    pred_idx, probs, classes = decode_predictions(response.content)
+    assert probs.shape == (1, len(classes))
+
 # Загрузка CSV (неправильное расширение файла)
 def test_predict_csv_wrong_extension():
     response = client.post("/predict_csv", files={"file": ("test.txt", b"not,a,csv", "text/plain")})
@@ -109,3 +216,296 @@ def test_predict_csv_wrong_extension():
     data = response.json()
     assert "error" in data
     assert "расширение" in data["error"].lower() or "ожидается" in data["error"].lower()
+
+# Потоковая загрузка CSV (корректный запрос, NDJSON)
+def test_predict_csv_stream_valid():
+    with open("data/example.csv", "rb") as f:
+        response = client.post("/predict_csv_stream", files={"file": ("example.csv", f, "text/csv")})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 2
+    for row in rows:
+        assert "prediction" in row
+        assert "confidence" in row
+        assert "probabilities" in row
+
+# Потоковая загрузка CSV (результаты не зависят от размера чанка)
+def test_predict_csv_stream_matches_predict_csv(monkeypatch):
+    monkeypatch.setattr(api, "CSV_CHUNK_ROWS", 1)
+    with open("data/example.csv", "rb") as f:
+        contents = f.read()
+    stream = client.post("/predict_csv_stream", files={"file": ("example.csv", contents, "text/csv")})
+    batch = client.post("/predict_csv", files={"file": ("example.csv", contents, "text/csv")})
+    rows = [json.loads(line) for line in stream.text.splitlines()]
+    assert rows == batch.json()["results"]
+
+# Потоковая загрузка CSV (колоночный формат: одна строка на чанк)
+def test_predict_csv_stream_columnar(monkeypatch):
+    monkeypatch.setattr(api, "CSV_CHUNK_ROWS", 1)
+    with open("data/example.csv", "rb") as f:
+        response = client.post("/predict_csv_stream?shape=columnar", files={"file": ("example.csv", f, "text/csv")})
+    assert response.status_code == 200
+    chunks = [json.loads(line) for line in response.text.splitlines()]
+    assert len(chunks) == 2
+    for chunk in chunks:
+        assert len(chunk["predictions"]) == len(chunk["confidence"]) == len(chunk["probabilities"]) == 1
+        assert len(chunk["probabilities"][0]) == len(chunk["classes"])
+
+# Потоковая загрузка CSV (пустой файл)
+def test_predict_csv_stream_empty():
+    response = client.post("/predict_csv_stream", files={"file": ("empty.csv", b"", "text/csv")})
+    assert response.status_code == 400
+    assert "error" in response.json()
+
+# Потоковая загрузка CSV (отсутствует один признак)
+def test_predict_csv_stream_missing_column():
+    with open("data/example_no_last_column.csv", "rb") as f:
+        response = client.post("/predict_csv_stream", files={"file": ("example_no_last_column.csv", f, "text/csv")})
+    assert response.status_code == 400
+    assert "признаки" in response.json()["error"]
+
+# Проверка живости
+def test_health():
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+# Проверка готовности: модель загружается и прогревается в фазе старта
+def test_ready_after_startup():
+    with TestClient(app) as started_client:
+        for _ in range(300):
+            response = started_client.get("/ready")
+            if response.status_code == 200:
+                break
+            time.sleep(0.1)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ready"
+    assert data["load_time_s"] >= 0
+
+# Проверка готовности: пока модель не загружена, воркер не готов
+def test_ready_while_loading(monkeypatch):
+    monkeypatch.setattr(api.registry, "routing", None)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "loading"
+
+# Бинарный батч (матрица float32 с заголовком, бинарный ответ)
+def test_predict_batch_matrix_binary():
+    df = pd.read_csv("data/example.csv")
+    body = encode_matrix(df.to_numpy(), list(df.columns))
+    response = client.post("/predict_batch", content=body,
+                           headers={"Content-Type": MATRIX_CONTENT_TYPE, "Accept": PREDICTIONS_CONTENT_TYPE})
+    assert response.status_code == 200
+    pred_idx, probs, classes = decode_predictions(response.content)
+    assert probs.shape == (2, len(classes))
+
+    with open("data/example.csv", "rb") as f:
+        expected = client.post("/predict_csv", files={"file": ("example.csv", f, "text/csv")}).json()["results"]
+    assert [classes[i] for i in pred_idx] == [row["prediction"] for row in expected]
+
+# Бинарный батч (Parquet, колонки в другом порядке, JSON-ответ)
+def test_predict_batch_parquet_json():
+    df = pd.read_csv("data/example.csv")
+    df = df[df.columns[::-1]]
+    buffer = io.BytesIO()
+    df.to_parquet(buffer)
+    response = client.post("/predict_batch", content=buffer.getvalue(),
+                           headers={"Content-Type": "application/vnd.apache.parquet"})
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 2
+
+# Бинарный батч (отсутствует признак)
+def test_predict_batch_missing_column():
+    body = encode_matrix(np.zeros((1, 2)), ["Destination Port", "Fwd IAT Min"])
+    response = client.post("/predict_batch", content=body, headers={"Content-Type": MATRIX_CONTENT_TYPE})
+    assert response.status_code == 400
+    assert "признаки" in response.json()["error"]
+
+# Бинарный батч (заголовок — не JSON-объект)
+def test_predict_batch_header_not_object():
+    body = MATRIX_MAGIC + struct.pack("<I", 6) + b"[1, 2]"
+    response = client.post("/predict_batch", content=body, headers={"Content-Type": MATRIX_CONTENT_TYPE})
+    assert response.status_code == 400
+    assert "JSON-объектом" in response.json()["error"]
+
+# Бинарный батч (неподдерживаемый Content-Type)
+def test_predict_batch_wrong_content_type():
+    response = client.post("/predict_batch", content=b"a,b", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 415
+    assert "error" in response.json()
+
+# Бинарный батч (ответ в Arrow IPC)
+def test_predict_batch_arrow_response():
+    import pyarrow as pa
+    df = pd.read_csv("data/example.csv")
+    response = client.post("/predict_batch", content=encode_matrix(df.to_numpy(), list(df.columns)),
+                           headers={"Content-Type": MATRIX_CONTENT_TYPE,
+                                    "Accept": "application/vnd.apache.arrow.stream"})
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    classes = json.loads(table.schema.metadata[b"classes"])
+    assert table.num_rows == 2
+    assert table.column_names == ["label_index"] + classes
+
+# Захват трафика (по строке на поток и счетчики в конце)
+def test_predict_pcap():
+    packets = []
+    for i in range(3):
+        forward = ("10.0.0.1", "10.0.0.2", 40000 + i, 443)
+        backward = ("10.0.0.2", "10.0.0.1", 443, 40000 + i)
+        packets += [(i * 1000, build_frame(*forward, window=8192)),
+                    (i * 1000 + 100, build_frame(*backward, window=4096, payload_len=60, flags=TCP_FIN)),
+                    (i * 1000 + 200, build_frame(*forward, flags=TCP_FIN))]
+    buffer = io.BytesIO()
+    write_pcap(buffer, packets)
+    response = client.post("/predict_pcap", files={"file": ("capture.pcap", buffer.getvalue(),
+                                                            "application/vnd.tcpdump.pcap")})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["flow"]["sport"] for line in lines[:-1]] == [40000, 40001, 40002]
+    for line in lines[:-1]:
+        assert line["flow"]["packets"] == 3
+        assert line["prediction"] in line["probabilities"]
+    assert lines[-1]["stats"]["packets"] == 9
+
+# Захват трафика (не pcap)
+def test_predict_pcap_wrong_format():
+    response = client.post("/predict_pcap", files={"file": ("capture.pcap", b"Destination Port\n443\n",
+                                                            "application/vnd.tcpdump.pcap")})
+    assert response.status_code == 400
+    assert "error" in response.json()
+
+# Фоновое задание (прогресс и результаты по страницам совпадают с /predict_csv)
+def test_job_matches_predict_csv(monkeypatch, tmp_path):
+    def score_in_thread(X, *version):
+        probs = api.registry.primary.predict_proba(X).astype(np.float32)
+        return probs.argmax(axis=1), probs
+
+    manager = JobManager(lambda: ThreadPoolExecutor(1), score_in_thread, str(tmp_path), chunk_rows=1)
+    monkeypatch.setattr(api, "job_manager", manager)
+    with open("data/example.csv", "rb") as f:
+        contents = f.read()
+
+    response = client.post("/jobs", files={"file": ("example.csv", contents, "text/csv")})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    deadline = time.monotonic() + 10
+    while client.get(f"/jobs/{job_id}").json()["status"] != "done":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    first = client.get(f"/jobs/{job_id}/results", params={"limit": 1}).json()
+    assert first["next_offset"] == 1
+    rest = client.get(f"/jobs/{job_id}/results", params={"offset": 1}).json()
+    batch = client.post("/predict_csv", files={"file": ("example.csv", contents, "text/csv")}).json()
+    assert first["results"] + rest["results"] == batch["results"]
+
+    assert client.delete(f"/jobs/{job_id}").status_code == 200
+    assert client.get(f"/jobs/{job_id}").status_code == 404
+
+# Фоновое задание (строки с ошибками маскируются, как в /predict_csv в режиме mask)
+def test_job_reports_invalid_rows(monkeypatch, tmp_path):
+    def score_in_thread(X, *version):
+        probs = api.registry.primary.predict_proba(X).astype(np.float32)
+        return probs.argmax(axis=1), probs
+
+    manager = JobManager(lambda: ThreadPoolExecutor(1), score_in_thread, str(tmp_path), chunk_rows=4,
+                         validate_fn=api.validate_job_rows)
+    monkeypatch.setattr(api, "job_manager", manager)
+    response = client.post("/jobs", files={"file": ("mixed.csv", mixed_csv(), "text/csv")})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    deadline = time.monotonic() + 10
+    while client.get(f"/jobs/{job_id}").json()["status"] != "done":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    status = client.get(f"/jobs/{job_id}").json()
+    assert status["rows_done"] == 6
+    assert status["validation"]["invalid_rows"] == [1, 2, 3, 4]
+    assert status["validation"]["errors"][2] == {"row": 3, "errors": {"Destination Port": "не число"}}
+
+    monkeypatch.setattr(api, "VALIDATION_MODE", "mask")
+    batch = client.post("/predict_csv", files={"file": ("mixed.csv", mixed_csv(), "text/csv")}).json()
+    results = client.get(f"/jobs/{job_id}/results").json()["results"]
+    assert results == batch["results"]
+
+# Фоновое задание (отсутствует признак)
+def test_job_missing_column():
+    with open("data/example_no_last_column.csv", "rb") as f:
+        response = client.post("/jobs", files={"file": ("example.csv", f, "text/csv")})
+    assert response.status_code == 400
+    assert "error" in response.json()
+
+# Метрики Prometheus (этапы /predict_csv, строки и классы)
+def test_metrics():
+    with open("data/example.csv", "rb") as f:
+        client.post("/predict_csv", files={"file": ("example.csv", f, "text/csv")})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    for stage in ("upload_read", "read_csv", "feature_check", "astype", "validate", "predict", "decode", "build_response", "serialize"):
+        assert f'api_stage_duration_seconds_count{{endpoint="predict_csv",stage="{stage}"}}' in text
+    assert 'api_requests_total{endpoint="predict_csv",status="200"}' in text
+    assert 'api_rows_total{endpoint="predict_csv"}' in text
+    assert "api_predictions_total{class=" in text
+    assert "model_load_seconds " in text
+
+# Профилировщик (выключен по умолчанию, включается по запросу)
+def test_profiler_toggle(monkeypatch):
+    assert client.post("/profiler/start").status_code == 404
+    monkeypatch.setattr(api, "PROFILER_ENABLED", True)
+    response = client.post("/profiler/start", params={"interval_ms": 1, "duration_s": 5})
+    assert response.status_code == 200
+    assert response.json()["running"]
+    assert client.post("/profiler/start").status_code == 409
+    with open("data/example.csv", "rb") as f:
+        client.post("/predict_csv", files={"file": ("example.csv", f, "text/csv")})
+    response = client.post("/profiler/stop")
+    assert response.status_code == 200
+    assert client.get("/profiler").json()["running"] is False
+
+@pytest.fixture
+def isolated_registry(monkeypatch, tmp_path):
+    '''
+    Реестр версий с файлом состояния во временном каталоге; после теста возвращаем версию из config
+    '''
+    api.load_model()
+    monkeypatch.setattr(api.registry, "state_path", str(tmp_path / "registry.json"))
+    yield api.registry
+    api.registry.write_state(default_state())
+    api.registry.sync()
+
+# Реестр версий (регистрация, сравнение в режиме split, переключение основной версии)
+def test_models_registry(isolated_registry):
+    payload = {"Destination_Port": 443, "Init_Win_bytes_forward": 8192, "Init_Win_bytes_backward": 8192,
+               "Bwd_Packets_s": 1500.0, "min_seg_size_forward": 40, "Fwd_IAT_Std": 5000.0,
+               "Flow_IAT_Min": 1000.0, "Bwd_Packet_Length_Min": 60, "Fwd_Packets_s": 2000.0, "Fwd_IAT_Min": 1000.0}
+    assert client.post("/models/v2", params={"bundle": "xgb_pipeline_bundle.pkl"}).status_code == 202
+    assert client.post("/models/v3", params={"bundle": "../config.py"}).status_code == 400
+    assert client.post("/models/v2/compare", params={"mode": "split", "fraction": 1}).status_code == 202
+    isolated_registry.sync()
+
+    with open("data/example.csv", "rb") as f:
+        response = client.post("/predict_csv", files={"file": ("example.csv", f, "text/csv")})
+    assert response.status_code == 200
+    assert response.headers["X-Model-Version"] == "v2"
+    assert "prediction" in client.post("/predict", json=payload).json()
+
+    models = client.get("/models").json()
+    assert {version["name"] for version in models["versions"]} == {"default", "v2"}
+    assert (models["primary"], models["candidate"], models["mode"]) == ("default", "v2", "split")
+
+    assert client.delete("/models/default").status_code == 409
+    assert client.post("/models/missing/activate").status_code == 404
+    assert client.post("/models/v2/activate").status_code == 202
+    isolated_registry.sync()
+    assert client.get("/ready").json()["model_version"] == "v2"
+    assert client.delete("/models/default").status_code == 202
+    isolated_registry.sync()
+    assert [version["name"] for version in client.get("/models").json()["versions"]] == ["v2"]
@@ -0,0 +1,256 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import requests
+from fastapi.testclient import TestClient
+from urllib3 import encode_multipart_formdata
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import api
+from api import app
+from api_client import ApiClient
+from batch_formats import MATRIX_CONTENT_TYPE, PREDICTIONS_CONTENT_TYPE, encode_matrix
+from gzip_request import GzipRequestMiddleware, GzipBodyTooLargeError
+from metrics import REQUESTS
+import pytest
+
+# Задержка на установку соединения в заглушке (как TCP/TLS-рукопожатие до удаленного API)
+CONNECT_DELAY_S = 0.02
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    '''
+    Заглушка API: keep-alive (HTTP/1.1), счетчик соединений, /flaky отвечает 503 первые два раза,
+    /gateway всегда отвечает 502, /slow отвечает через секунду, POST возвращает размер распакованного тела
+    '''
+    protocol_version = "HTTP/1.1"
+    # TCP_NODELAY, как у uvicorn: заголовки и тело уходят отдельными пакетами без задержки Нейгла
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        time.sleep(CONNECT_DELAY_S)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, content):
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def failed(self):
+        '''
+        Записывает запрос и отвечает ошибкой для /flaky и /gateway
+        '''
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path))
+            calls = self.server.requests.count((self.command, self.path))
+        if self.path == "/flaky" and calls <= 2:
+            self.reply(503, {"error": "Сервер перегружен"})
+            return True
+        if self.path == "/gateway":
+            self.reply(502, {"error": "Bad Gateway"})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.failed():
+            return
+        if self.path == "/slow":
+            time.sleep(1)
+        self.reply(200, {"status": "ok"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.failed():
+            return
+        encoding = self.headers.get("Content-Encoding")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        self.reply(200, {"encoding": encoding, "size": len(body), "content_type": self.headers["Content-Type"]})
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_pool_reuses_connections(stub):
+    '''
+    Функция для проверки пула соединений:
+
+    1. 20 запросов через requests.get без сессии (как раньше в app.py)
+    2. 20 запросов через ApiClient
+
+    Ожидаем 20 соединений против одного и заметно меньшую задержку у клиента с пулом:
+    без пула каждый запрос ждет CONNECT_DELAY_S, с пулом — только первый
+    '''
+    server, url = stub
+    start = time.perf_counter()
+    for _ in range(20):
+        assert requests.get(url + "/ok", timeout=5).status_code == 200
+    plain_s = time.perf_counter() - start
+    plain_connections = server.connections
+
+    client = ApiClient(url)
+    start = time.perf_counter()
+    for _ in range(20):
+        assert client.get("/ok").status_code == 200
+    pooled_s = time.perf_counter() - start
+    client.close()
+
+    assert plain_connections == 20
+    assert server.connections - plain_connections == 1
+    assert pooled_s < plain_s * 0.75
+
+
+def test_retry_and_timeout(stub):
+    '''
+    Функция для проверки повторов и таймаутов:
+
+    1. /flaky дважды отвечает 503 — клиент повторяет GET и POST с задержкой и получает 200
+    2. /gateway отвечает 502 — GET повторяется, POST нет (мог уже выполниться за прокси)
+    3. /slow отвечает дольше таймаута чтения — ReadTimeout без повторов
+
+    Ожидаем по три запроса к /flaky, четыре GET и один POST к /gateway и один запрос к /slow
+    '''
+    server, url = stub
+    client = ApiClient(url, retries=3, backoff_s=0.01, read_timeout_s=0.2)
+    assert client.get("/flaky").status_code == 200
+    assert server.requests.count(("GET", "/flaky")) == 3
+    assert client.post("/flaky", data=b"x").status_code == 200
+    assert server.requests.count(("POST", "/flaky")) == 3
+
+    assert client.get("/gateway").status_code == 502
+    assert server.requests.count(("GET", "/gateway")) == 4
+    assert client.post("/gateway", data=b"x").status_code == 502
+    assert server.requests.count(("POST", "/gateway")) == 1
+
+    with pytest.raises(requests.ReadTimeout):
+        client.get("/slow")
+    assert server.requests.count(("GET", "/slow")) == 1
+    client.close()
+
+
+def test_large_upload_is_gzipped(stub):
+    server, url = stub
+    client = ApiClient(url, gzip_min_bytes=1024)
+    data = b"Destination Port,Fwd IAT Min\n" + b"443,1000.0\n" * 10_000
+
+    small = client.post_file("/upload", "small.csv", data[:100]).json()
+    large = client.post_file("/upload", "large.csv", data).json()
+    client.close()
+
+    assert small["encoding"] is None
+    assert large["encoding"] == "gzip"
+    assert large["content_type"].startswith("multipart/form-data; boundary=")
+    assert large["size"] > len(data)
+
+
+def test_api_accepts_gzipped_csv():
+    '''
+    Функция для проверки распаковки на стороне API:
+
+    1. Отправляем example.csv в /predict_csv обычным multipart и сжатым gzip
+    2. Отправляем битый gzip и неподдерживаемый Content-Encoding
+
+    Ожидаем одинаковые результаты, 400 и 415
+    '''
+    client = TestClient(app)
+    with open("data/example.csv", "rb") as f:
+        contents = f.read()
+    body, content_type = encode_multipart_formdata({"file": ("example.csv", contents, "text/csv")})
+
+    plain = client.post("/predict_csv", content=body, headers={"Content-Type": content_type})
+    compressed = client.post("/predict_csv", content=gzip.compress(body),
+                             headers={"Content-Type": content_type, "Content-Encoding": "gzip"})
+    assert plain.status_code == compressed.status_code == 200
+    assert compressed.json()["results"] == plain.json()["results"]
+
+    broken = client.post("/predict_csv", content=b"not gzip",
+                         headers={"Content-Type": content_type, "Content-Encoding": "gzip"})
+    assert broken.status_code == 400
+
+    unsupported = client.post("/predict_csv", content=body, headers={"Content-Type": content_type,
+                                                                     "Content-Encoding": "br"})
+    assert unsupported.status_code == 415
+    assert "gzip" in unsupported.json()["error"]
+
+
+def test_gzip_bomb_is_not_inflated():
+    '''
+    Функция для проверки защиты от gzip-бомбы: 64 МБ нулей одним сжатым куском, предел 1 КБ.
+    Ожидаем GzipBodyTooLargeError, при этом распаковывается не больше предела плюс байт
+    '''
+    bomb = gzip.compress(bytes(64 << 20))
+    received = []
+
+    async def inner(scope, receive, send):
+        received.append(await receive())
+
+    async def receive():
+        return {"type": "http.request", "body": bomb, "more_body": False}
+
+    middleware = GzipRequestMiddleware(inner, max_size=1024)
+    scope = {"type": "http", "headers": [(b"content-encoding", b"gzip")]}
+    tracemalloc.start()
+    try:
+        with pytest.raises(GzipBodyTooLargeError):
+            asyncio.run(middleware(scope, receive, None))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert received == []
+    assert peak < 8 << 20
+
+
+def test_predict_batch_gzip_errors(monkeypatch):
+    '''
+    Функция для проверки ошибок распаковки в /predict_batch (тело читается в обработчике):
+
+    1. Отправляем битый gzip
+    2. Ограничиваем размер после распаковки 1 КБ и отправляем сжатую матрицу больше предела
+    3. Отправляем неподдерживаемый Content-Encoding
+
+    Ожидаем 400, 413 и 415, причем ответ 415 учтен в метриках запросов
+    '''
+    client = TestClient(app)
+    headers = {"Content-Type": MATRIX_CONTENT_TYPE, "Accept": PREDICTIONS_CONTENT_TYPE, "Content-Encoding": "gzip"}
+    broken = client.post("/predict_batch", content=b"not gzip", headers=headers)
+    assert broken.status_code == 400
+    assert "не распаковывается" in broken.json()["error"]
+
+    middleware = next(m for m in app.user_middleware if m.cls is GzipRequestMiddleware)
+    monkeypatch.setattr(middleware, "kwargs", {"max_size": 1024})
+    monkeypatch.setattr(app, "middleware_stack", None)
+    X = np.zeros((1000, len(api.selected_features)), dtype=np.float32)
+    body = gzip.compress(encode_matrix(X, api.selected_features))
+    too_large = TestClient(app).post("/predict_batch", content=body, headers=headers)
+    assert too_large.status_code == 413
+    assert "1024" in too_large.json()["error"]
+
+    before = REQUESTS.labels("predict_batch", "415").value
+    unsupported = client.post("/predict_batch", content=body, headers={**headers, "Content-Encoding": "br"})
+    assert unsupported.status_code == 415
+    assert REQUESTS.labels("predict_batch", "415").value == before + 1
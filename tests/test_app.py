@@ -11,8 +11,8 @@ def test_predict_from_df():
     '''
     Функция для проверки model_utils.predict_from_df:
 
-    1. Создаем фейковую модель (predict возвращает массив меток [0, 1],
-    predict_proba возвращает вероятности классов [[0.2, 0.8], [0.9, 0.1]])
+    1. Создаем фейковую модель (predict_proba возвращает вероятности
+    классов [[0.8, 0.2], [0.1, 0.9]], метки получаются через argmax)
     2. Создаем фейковый энкодер (0 - 'Normal', 1 - 'Malicious')
     3. Создаем тестовый DataFrame с 2 признаками ('f1', 'f2')
     4. Вызываем функцию model_utils.predict_from_df
@@ -20,8 +20,7 @@ def test_predict_from_df():
     Возвращаем метки, уверенность модели 
     '''
     fake_model = Mock()
-    fake_model.predict.return_value = np.array([0, 1])
-    fake_model.predict_proba.return_value = np.array([[0.2, 0.8], [0.9, 0.1]])
+    fake_model.predict_proba.return_value = np.array([[0.8, 0.2], [0.1, 0.9]])
 
     fake_encoder = Mock()
     fake_encoder.inverse_transform.side_effect = lambda x: ['Normal' if i == 0 else 'Malicious' for i in x]
@@ -34,6 +33,8 @@ def test_predict_from_df():
     assert list(labels) == ['Normal', 'Malicious']
     assert confidences[0] == 0.8
     assert confidences[1] == 0.9
+    fake_model.predict.assert_not_called()
+    fake_model.predict_proba.assert_called_once()
 
 
 def test_predict_single():
@@ -78,3 +79,35 @@ def test_missing_feature_raises_keyerror():
 
     with pytest.raises(KeyError):
         _ = df[selected_features]
+
+
+def test_fast_predictor_matches_predict_from_df():
+    '''
+    Функция для проверки model_utils.FastPredictor:
+
+    1. Обучаем маленькую модель XGBoost на 3 классах
+    2. Делаем предсказание через predict_from_df (pandas) и через FastPredictor (без pandas)
+
+    Ожидаем одинаковые лейблы и вероятности
+    '''
+    from types import SimpleNamespace
+    from xgboost import XGBClassifier
+    from sklearn.preprocessing import LabelEncoder
+
+    rng = np.random.default_rng(0)
+    selected_features = ['f1', 'f2', 'f3']
+    df = pd.DataFrame(rng.uniform(0, 100, size=(300, 3)), columns=selected_features)
+    encoder = LabelEncoder()
+    y = encoder.fit_transform(np.array(['DoS', 'Normal', 'Recon'])[(df['f1'] // 34).astype(int)])
+    model = XGBClassifier(n_estimators=10, max_depth=3).fit(df, y)
+
+    labels, probs, confidences = model_utils.predict_from_df(df, model, encoder, selected_features)
+
+    fast = model_utils.FastPredictor(model, encoder, selected_features, field_names=['a', 'b', 'c'])
+    results = fast.predict_rows(df.to_numpy())
+    assert [r["prediction"] for r in results] == list(labels)
+    assert np.allclose([r["confidence"] for r in results], confidences)
+
+    label, fast_probs, confidence = fast.predict_one(SimpleNamespace(a=df.iloc[0, 0], b=df.iloc[0, 1], c=df.iloc[0, 2]))
+    assert label == labels[0]
+    assert np.allclose(fast_probs, probs[0])
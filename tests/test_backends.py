@@ -0,0 +1,99 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from xgboost import XGBClassifier
+from sklearn.preprocessing import LabelEncoder
+from backends import XGBoostBackend, ArrayTreeBackend, AutoBackend, load_backend
+from model_store import export_store, load_store
+
+
+@pytest.fixture(scope="module")
+def trained():
+    '''
+    Маленькая модель XGBoost (multi:softprob, 4 класса) и данные с пропусками
+    '''
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 100, size=(2000, 5)), columns=[f"f{i}" for i in range(5)])
+    y = (X["f0"] // 25).astype(int).to_numpy()
+    X.iloc[::11, 1] = np.nan
+    model = XGBClassifier(n_estimators=30, max_depth=6, learning_rate=0.3, subsample=0.8).fit(X, y)
+    return model, X.to_numpy(dtype=np.float32)
+
+
+def test_array_backend_matches_xgboost(trained):
+    '''
+    Функция для проверки паритета бэкендов:
+    вероятности таблицы узлов совпадают с нативным бустером (в пределах float32)
+    '''
+    model, X = trained
+    expected = XGBoostBackend(model).predict_proba(X)
+    actual = ArrayTreeBackend.from_booster(model.get_booster()).predict_proba(X)
+
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+    assert (actual.argmax(axis=1) == expected.argmax(axis=1)).all()
+
+
+def test_array_backend_save_load(trained, tmp_path):
+    '''
+    Функция для проверки экспорта таблицы узлов в .npz и обратной загрузки
+    '''
+    model, X = trained
+    path = tmp_path / "table.npz"
+    backend = load_backend("array", model, str(path))
+    assert path.exists()
+
+    loaded = load_backend("array", model, str(path))
+    np.testing.assert_array_equal(loaded.predict_proba(X), backend.predict_proba(X))
+
+
+def test_auto_backend_dispatch(trained):
+    '''
+    Функция для проверки выбора бэкенда по размеру батча
+    '''
+    model, X = trained
+    backend = load_backend("auto", model, auto_max_rows=4)
+    assert isinstance(backend, AutoBackend)
+    np.testing.assert_allclose(backend.predict_proba(X[:4]), backend.array_backend.predict_proba(X[:4]))
+    np.testing.assert_allclose(backend.predict_proba(X), backend.xgboost_backend.predict_proba(X))
+
+
+def test_unknown_backend_raises(trained):
+    model, _ = trained
+    with pytest.raises(ValueError):
+        load_backend("treelite", model)
+
+
+def test_model_store_roundtrip(trained, tmp_path):
+    '''
+    Функция для проверки хранилища модели для нескольких воркеров:
+
+    1. Экспортируем бандл в каталог
+    2. Загружаем его обратно
+
+    Ожидаем таблицу узлов, отображенную в память, те же признаки, классы и вероятности
+    '''
+    model, X = trained
+    encoder = LabelEncoder().fit(['BruteForce', 'DoS', 'Normal', 'Recon'])
+    bundle = {'model': model,
+              'selected_features': [f"f{i}" for i in range(5)],
+              'label_encoder': encoder,
+              'sample_weight': np.ones(10)}
+    path = str(tmp_path / "store")
+
+    export_store(bundle, path)
+    export_store(bundle, path)  # повторный экспорт подменяет каталог целиком
+    loaded, table = load_store(path)
+
+    assert isinstance(table.threshold, np.memmap)
+    assert loaded['selected_features'] == bundle['selected_features']
+    assert list(loaded['label_encoder'].inverse_transform([0, 3])) == ['BruteForce', 'Recon']
+    assert 'sample_weight' not in loaded
+    expected = XGBoostBackend(model).predict_proba(X)
+    np.testing.assert_allclose(table.predict_proba(X), expected, atol=1e-6)
+    np.testing.assert_allclose(XGBoostBackend(loaded['model']).predict_proba(X), expected)
+    assert load_store(path, with_booster=False)[0]['model'] is None
+    assert sorted(os.listdir(tmp_path)) == ["store"]
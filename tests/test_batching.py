@@ -0,0 +1,77 @@
+import asyncio
+from unittest.mock import Mock
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from batching import MicroBatcher, QueueFullError
+
+
+def test_concurrent_requests_scored_in_one_batch():
+    '''
+    Функция для проверки MicroBatcher:
+
+    1. Создаем фейковую функцию скоринга (возвращает сумму признаков каждой строки)
+    2. Одновременно отправляем 5 строк при max_batch_size=5
+
+    Ожидаем один вызов модели на 5 строк и результаты в исходном порядке
+    '''
+    score_fn = Mock(side_effect=lambda rows: list(rows.sum(axis=1)))
+    batcher = MicroBatcher(score_fn, max_batch_size=5, max_wait_us=1_000_000)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit([i, i]) for i in range(5)))
+
+    results = asyncio.run(run())
+
+    assert results == [0, 2, 4, 6, 8]
+    score_fn.assert_called_once()
+    assert score_fn.call_args[0][0].shape == (5, 2)
+    assert score_fn.call_args[0][0].dtype == np.float32
+    assert batcher.in_flight == 0
+
+
+def test_partial_batch_flushed_after_max_wait():
+    '''
+    Функция для проверки отправки неполного батча по таймауту
+    '''
+    score_fn = Mock(side_effect=lambda rows: list(rows[:, 0]))
+    batcher = MicroBatcher(score_fn, max_batch_size=100, max_wait_us=1000)
+
+    async def run():
+        return await asyncio.gather(batcher.submit([1.0]), batcher.submit([2.0]))
+
+    assert asyncio.run(run()) == [1.0, 2.0]
+    score_fn.assert_called_once()
+
+
+def test_queue_full_raises():
+    '''
+    Функция для проверки ограничения глубины очереди
+    '''
+    batcher = MicroBatcher(lambda rows: list(rows[:, 0]), max_batch_size=100, max_wait_us=10_000, max_queue_depth=2)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit([i]) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert results[:2] == [0, 1]
+    assert isinstance(results[2], QueueFullError)
+
+
+def test_score_error_propagates_to_all_requests():
+    '''
+    Функция для проверки ошибки модели: каждый запрос батча получает исключение
+    '''
+    def failing(rows):
+        raise ValueError("model failed")
+
+    batcher = MicroBatcher(failing, max_batch_size=2, max_wait_us=1_000_000)
+
+    async def run():
+        return await asyncio.gather(batcher.submit([1]), batcher.submit([2]), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(r, ValueError) for r in results)
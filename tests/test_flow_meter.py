@@ -0,0 +1,118 @@
+import io
+from unittest.mock import Mock
+import numpy as np
+import pytest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from flow_meter import (FlowMeter, PcapFormatError, read_pcap, write_pcap, build_frame, classify_flows,
+                        PROTO_UDP, TCP_FIN, TCP_RST)
+
+
+def make_pcap(packets):
+    buffer = io.BytesIO()
+    write_pcap(buffer, packets)
+    buffer.seek(0)
+    return buffer
+
+
+def test_tcp_flow_features():
+    '''
+    Функция для проверки признаков потока:
+
+    1. Собираем TCP-поток: три пакета клиента (10.0.0.1:40000 -> 10.0.0.2:443)
+    и два пакета сервера, последний обмен закрывается FIN с обеих сторон
+    2. Прогоняем захват через FlowMeter
+
+    Ожидаем один поток с признаками, посчитанными вручную (интервалы в микросекундах)
+    '''
+    client = ("10.0.0.1", "10.0.0.2", 40000, 443)
+    server = ("10.0.0.2", "10.0.0.1", 443, 40000)
+    packets = [(1_000_000, build_frame(*client, window=8192, tcp_header_len=40)),
+               (1_000_100, build_frame(*server, window=4096, payload_len=60)),
+               (1_000_400, build_frame(*client, payload_len=100, tcp_header_len=32)),
+               (1_000_450, build_frame(*server, payload_len=200, flags=TCP_FIN)),
+               (1_001_000, build_frame(*client, flags=TCP_FIN, tcp_header_len=32))]
+
+    meter = FlowMeter()
+    flows = list(meter.process(read_pcap(make_pcap(packets))))
+
+    assert len(flows) == 1
+    assert meter.stats()["finished_flows"] == 1
+    features = flows[0].features()
+    assert features["Destination Port"] == 443
+    assert features["Init_Win_bytes_forward"] == 8192
+    assert features["Init_Win_bytes_backward"] == 4096
+    assert features["min_seg_size_forward"] == 32
+    assert features["Bwd Packet Length Min"] == 60
+    assert features["Flow IAT Min"] == 50
+    assert features["Fwd IAT Min"] == 400
+    assert features["Fwd IAT Std"] == pytest.approx(np.std([400, 600], ddof=1))
+    assert features["Fwd Packets/s"] == pytest.approx(3 / 0.001)
+    assert features["Bwd Packets/s"] == pytest.approx(2 / 0.001)
+
+
+def test_flows_end_on_rst_and_timeouts():
+    '''
+    Функция для проверки завершения потоков:
+
+    1. Поток A закрывается RST
+    2. Поток B (UDP) простаивает дольше idle_timeout_s, его следующий пакет начинает новый поток
+    3. Поток C длится дольше active_timeout_s
+
+    Ожидаем, что каждый поток завершится в момент срабатывания условия, а остаток снимет flush
+    '''
+    meter = FlowMeter(idle_timeout_s=10, active_timeout_s=30)
+    a = build_frame("10.0.0.1", "10.0.0.2", 1000, 80)
+    a_rst = build_frame("10.0.0.2", "10.0.0.1", 80, 1000, flags=TCP_RST)
+    b = build_frame("10.0.0.3", "10.0.0.4", 53000, 53, proto=PROTO_UDP, payload_len=30)
+    c = build_frame("10.0.0.5", "10.0.0.6", 2000, 22)
+    packets = [(0, 1, a), (0, 1, b), (0, 1, c), (1, 1, a_rst)]
+    packets += [(s * 1_000_000, 1, c) for s in range(5, 41, 5)]
+    packets += [(41_000_000, 1, b)]
+
+    flows = list(meter.process(packets))
+    finished = [(flow.dport, flow.fwd_count + flow.bwd_count) for flow in flows]
+
+    assert finished == [(80, 2), (53, 1), (22, 7), (22, 2), (53, 1)]
+    assert flows[1].features()["Init_Win_bytes_forward"] == -1
+    assert meter.stats()["active_flows"] == 0
+    assert meter.stats()["peak_flows"] == 3
+
+
+def test_non_ip_packets_skipped():
+    arp = b"\x00" * 12 + b"\x08\x06" + b"\x00" * 28
+    meter = FlowMeter()
+    flows = list(meter.process([(0, 1, arp), (1, 1, build_frame("10.0.0.1", "10.0.0.2", 1, 2))]))
+    assert len(flows) == 1
+    assert meter.stats()["skipped_packets"] == 1
+
+
+def test_read_pcap_rejects_other_formats():
+    with pytest.raises(PcapFormatError):
+        read_pcap(io.BytesIO(b"\x0a\x0d\x0d\x0a" + b"\x00" * 40))
+    with pytest.raises(PcapFormatError):
+        read_pcap(io.BytesIO(b"not a pcap file at all, really"))
+
+
+def test_classify_flows_in_batches():
+    '''
+    Функция для проверки батчей classify_flows:
+
+    1. Создаем 5 потоков и фейковый бэкенд, возвращающий Destination Port первым столбцом
+    2. Скорим батчами по 2
+
+    Ожидаем батчи 2, 2, 1 и признаки в порядке selected_features
+    '''
+    meter = FlowMeter()
+    packets = [(i, 1, build_frame("10.0.0.1", "10.0.0.2", 1000 + i, 8000 + i)) for i in range(5)]
+    backend = Mock()
+    backend.predict_proba.side_effect = lambda X: X[:, :2].copy()
+
+    batches = list(classify_flows(meter.process(packets), backend, ["Destination Port", "Fwd Packets/s"], batch_size=2))
+
+    assert [len(flows) for flows, _ in batches] == [2, 2, 1]
+    assert np.concatenate([probs[:, 0] for _, probs in batches]).tolist() == [8000, 8001, 8002, 8003, 8004]
+
+    with pytest.raises(ValueError):
+        next(classify_flows([], backend, ["Total Fwd Packets"]))
@@ -0,0 +1,206 @@
+import json
+import multiprocessing
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from jobs import JobManager, JobNotFoundError, init_worker, score_chunk, JOB_DONE, JOB_FAILED
+from validation import validate_matrix
+import pytest
+
+FEATURES = ["a", "b"]
+
+
+def fake_score(X):
+    '''
+    Фейковый скоринг: вероятность второго класса равна признаку a / 100
+    '''
+    probs = np.stack([1 - X[:, 0] / 100, X[:, 0] / 100], axis=1).astype(np.float32)
+    return probs.argmax(axis=1).astype(np.uint16), probs
+
+
+def wait_finished(manager, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while manager.status(job_id)["finished_at"] is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return manager.status(job_id)
+
+
+def write_csv(path, rows):
+    pd.DataFrame({"a": np.arange(rows) % 100, "b": np.zeros(rows)}).to_csv(path, index=False)
+
+
+def test_job_scored_in_chunks(tmp_path):
+    '''
+    Функция для проверки JobManager:
+
+    1. Создаем задание по CSV из 25 строк с чанками по 10 строк
+    2. Дожидаемся завершения
+    3. Читаем результаты страницами по 7 строк
+
+    Ожидаем 3 чанка, все 25 строк по порядку и исходный файл удален
+    '''
+    write_csv(tmp_path / "input.csv", 25)
+    manager = JobManager(lambda: ThreadPoolExecutor(2), fake_score, str(tmp_path / "jobs"), chunk_rows=10)
+    with open(tmp_path / "input.csv", "rb") as f:
+        job_id = manager.create(f)
+    manager.start(job_id, FEATURES)
+
+    status = wait_finished(manager, job_id)
+    assert status["status"] == JOB_DONE
+    assert status["rows_done"] == 25
+    assert status["chunks_done"] == 3
+    assert status["progress"] == 1.0
+    assert not os.path.exists(tmp_path / "jobs" / job_id / "input.csv")
+
+    probs, offset = [], 0
+    while offset < status["rows_done"]:
+        _, page, offset = manager.results(job_id, offset, 7)
+        probs.append(page[:, 1])
+    assert np.concatenate(probs) == pytest.approx((np.arange(25) % 100) / 100)
+    manager.shutdown()
+
+
+def test_job_masks_bad_values(tmp_path):
+    '''
+    Функция для проверки строк с ошибками в задании:
+
+    1. CSV из 5 строк с текстом в строке 2 и пропуском в строке 4, чанки по 2 строки
+    2. Проверка чанков без validate_fn и с границами через validate_fn (b не больше 1),
+    в том числе с другим порядком признаков задания
+
+    Ожидаем все 5 строк в результатах, пропуски вместо ошибочных значений
+    и индексы строк с ошибками в статусе, как у /predict_csv
+    '''
+    pd.DataFrame({"a": [1, 2, "x", 4, None], "b": [0, 0, 0, 5, 0]}).to_csv(tmp_path / "input.csv", index=False)
+    scored = []
+
+    def score(X):
+        scored.append(X)
+        return fake_score(np.nan_to_num(X))
+
+    def validate(X, features, not_number, row_offset):
+        return validate_matrix(X, features, {"b": (0, 1)}, "mask", 1, not_number, row_offset)
+
+    for validate_fn, invalid_rows, features in ((None, [2, 4], FEATURES), (validate, [2, 3, 4], FEATURES[::-1]),
+                                                (validate, [2, 3, 4], FEATURES)):
+        manager = JobManager(lambda: ThreadPoolExecutor(1), score, str(tmp_path / "jobs"), chunk_rows=2,
+                             validate_fn=validate_fn)
+        with open(tmp_path / "input.csv", "rb") as f:
+            job_id = manager.create(f)
+        manager.start(job_id, features)
+
+        status = wait_finished(manager, job_id)
+        assert status["status"] == JOB_DONE
+        assert status["rows_done"] == 5
+        validation = status["validation"]
+        assert validation["mode"] == "mask" and validation["rows_total"] == 5
+        assert validation["invalid_rows"] == invalid_rows
+        assert validation["errors"][0] == {"row": 2, "errors": {"a": "не число"}}
+        manager.shutdown()
+
+    X = np.concatenate(scored[-3:])
+    assert np.isnan(X[[2, 4], 0]).all() and np.isnan(X[3, 1])
+    assert len(validation["errors"]) == 2
+
+
+def test_job_delete(tmp_path):
+    write_csv(tmp_path / "input.csv", 5)
+    manager = JobManager(lambda: ThreadPoolExecutor(1), fake_score, str(tmp_path / "jobs"))
+    with open(tmp_path / "input.csv", "rb") as f:
+        job_id = manager.create(f)
+    manager.delete(job_id)
+    with pytest.raises(JobNotFoundError):
+        manager.status(job_id)
+    with pytest.raises(JobNotFoundError):
+        manager.status("../input")
+
+
+def test_delete_from_another_worker(tmp_path):
+    '''
+    Функция для проверки отмены из другого воркера:
+
+    1. Задание выполняется в manager, скоринг чанка ждет события
+    2. DELETE приходит в другой JobManager с тем же каталогом (другой воркер uvicorn)
+
+    Ожидаем 404 сразу после DELETE, файлы на месте, пока поток-владелец занят,
+    и удаление каталога самим потоком после чанка
+    '''
+    write_csv(tmp_path / "input.csv", 5)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_score(X):
+        started.set()
+        release.wait(10)
+        return fake_score(X)
+
+    manager = JobManager(lambda: ThreadPoolExecutor(1), slow_score, str(tmp_path / "jobs"), heartbeat_s=0.01)
+    other = JobManager(lambda: ThreadPoolExecutor(1), fake_score, str(tmp_path / "jobs"))
+    with open(tmp_path / "input.csv", "rb") as f:
+        job_id = manager.create(f)
+    thread = manager.start(job_id, FEATURES)
+    assert started.wait(10)
+
+    other.delete(job_id)
+    with pytest.raises(JobNotFoundError):
+        other.status(job_id)
+    assert os.path.exists(tmp_path / "jobs" / job_id / "input.csv")
+
+    release.set()
+    thread.join(10)
+    assert not os.path.exists(tmp_path / "jobs" / job_id)
+    assert manager.running == 0
+
+
+def test_stale_jobs_fail_and_expire(tmp_path):
+    '''
+    Функция для проверки заданий, прерванных перезапуском воркера:
+
+    1. Задание в статусе running, процесс-владелец которого завершился
+    2. Задание в статусе queued с живым владельцем, но без heartbeat дольше stale_s
+    3. Очистка после ttl_s
+
+    Ожидаем, что оба задания помечены failed с временем завершения и удалены очисткой
+    '''
+    write_csv(tmp_path / "input.csv", 5)
+    manager = JobManager(lambda: ThreadPoolExecutor(1), fake_score, str(tmp_path / "jobs"), ttl_s=0, stale_s=30)
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+
+    job_ids = []
+    for update in ({"status": "running", "owner_pid": dead.pid}, {"heartbeat_at": time.time() - 60}):
+        with open(tmp_path / "input.csv", "rb") as f:
+            job_id = manager.create(f)
+        path = tmp_path / "jobs" / job_id / "status.json"
+        path.write_text(json.dumps({**json.loads(path.read_text(encoding="utf-8")), **update}), encoding="utf-8")
+        job_ids.append(job_id)
+
+    for job_id in job_ids:
+        status = manager.status(job_id)
+        assert status["status"] == JOB_FAILED and status["finished_at"] is not None
+        assert "прервано" in status["error"]
+
+    time.sleep(0.01)
+    manager.cleanup_expired()
+    assert os.listdir(tmp_path / "jobs") == []
+
+
+def test_process_pool_worker():
+    '''
+    Функция для проверки процесса пула: init_worker загружает модель в отдельном процессе (spawn),
+    score_chunk возвращает индексы классов и вероятности, согласованные между собой
+    '''
+    executor = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"), initializer=init_worker)
+    try:
+        X = pd.read_csv("data/example.csv").to_numpy(dtype=np.float32)
+        pred_idx, probs = executor.submit(score_chunk, X).result(timeout=120)
+    finally:
+        executor.shutdown()
+    assert pred_idx.tolist() == probs.argmax(axis=1).tolist()
+    assert probs.sum(axis=1) == pytest.approx(np.ones(len(X)), abs=1e-5)
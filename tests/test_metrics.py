@@ -0,0 +1,91 @@
+import threading
+import pytest
+import time
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from metrics import Registry, Counter, Gauge, Histogram
+from profiler import SamplingProfiler
+
+
+def test_registry_renders_prometheus_text():
+    '''
+    Функция для проверки текстового формата:
+
+    1. Регистрируем счетчик с меткой, gauge с функцией и гистограмму
+    2. Обновляем значения и рендерим
+
+    Ожидаем HELP/TYPE, экранированные метки, накопительные корзины, _sum и _count
+    '''
+    registry = Registry()
+    counter = registry.register(Counter("rows_total", "Строки", ("class",)))
+    gauge = registry.register(Gauge("queue", "Очередь"))
+    histogram = registry.register(Histogram("latency_seconds", "Задержка", ("endpoint",), buckets=(0.1, 1.0)))
+
+    counter.labels('Dos "Hulk"').inc(3)
+    gauge.set_function(lambda: 7)
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.labels("predict").observe(value)
+
+    text = registry.render().decode()
+    assert "# TYPE rows_total counter" in text
+    assert 'rows_total{class="Dos \\"Hulk\\""} 3' in text
+    assert "queue 7" in text
+    assert 'latency_seconds_bucket{endpoint="predict",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{endpoint="predict",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{endpoint="predict",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{endpoint="predict"} 6.05' in text
+    assert 'latency_seconds_count{endpoint="predict"} 4' in text
+
+
+def test_histogram_timer():
+    histogram = Histogram("stage_seconds", "Этап", buckets=(0.001, 10.0))
+    with histogram.time():
+        time.sleep(0.01)
+    text = "\n".join(histogram.render())
+    assert 'stage_seconds_bucket{le="0.001"} 0' in text
+    assert 'stage_seconds_bucket{le="10.0"} 1' in text
+
+
+def test_histogram_quantile():
+    histogram = Histogram("latency_seconds", "Задержка", buckets=(0.1, 1.0, 10.0))
+    assert histogram.labels().quantile(0.5) is None
+    for value in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+    child = histogram.labels()
+    assert child.count == 4
+    assert child.quantile(0.5) == pytest.approx(0.1)
+    assert 1.0 < child.quantile(0.99) <= 10.0
+
+
+def test_sampling_profiler_sees_busy_thread():
+    '''
+    Функция для проверки SamplingProfiler:
+
+    1. Запускаем поток, который крутится в функции busy_loop
+    2. Профилируем 0.2 с с интервалом 1 мс
+
+    Ожидаем сэмплы со стеком, где есть busy_loop, в свернутом формате "стек число"
+    '''
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    thread = threading.Thread(target=busy_loop)
+    thread.start()
+    profiler = SamplingProfiler()
+    try:
+        profiler.start(interval_s=0.001, duration_s=10)
+        time.sleep(0.2)
+        folded = profiler.stop()
+    finally:
+        stop.set()
+        thread.join()
+
+    assert profiler.samples > 0
+    assert not profiler.running
+    busy = [line for line in folded.splitlines() if "busy_loop" in line]
+    assert busy
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in busy)
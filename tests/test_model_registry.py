@@ -0,0 +1,191 @@
+import os
+import shutil
+import threading
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import sys
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from config import MODEL_BUNDLE_PATH
+from model_registry import ModelRegistry, ModelVersionError, ModelVersionNotFoundError
+import pytest
+
+
+@pytest.fixture
+def registry(tmp_path):
+    '''
+    Реестр с файлом состояния во временном каталоге и копией бандла v1
+    '''
+    bundle_path = str(tmp_path / "v1.pkl")
+    shutil.copy(MODEL_BUNDLE_PATH, bundle_path)
+    registry = ModelRegistry(str(tmp_path / "registry.json"))
+    registry.write_state({"versions": {"v1": {"bundle": bundle_path, "store": None}}, "primary": "v1",
+                          "candidate": None, "mode": "shadow", "fraction": 1.0})
+    registry.sync()
+    yield registry
+    registry.stop()
+
+
+def example_X(registry):
+    return pd.read_csv("data/example.csv")[registry.features].to_numpy(dtype=np.float32)
+
+
+def wait_compared(registry, rows, timeout=10):
+    deadline = time.monotonic() + timeout
+    while sum(compared for compared, _ in registry.comparisons.values()) < rows:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_reload_when_bundle_rewritten(registry):
+    '''
+    Функция для проверки горячей перезагрузки:
+
+    1. Запоминаем загруженную версию v1
+    2. Сверка без изменений файлов версию не перезагружает
+    3. "Перезаписываем" бандл (новое время изменения) и сверяемся снова
+
+    Ожидаем новый объект версии с тем же именем, который скорит так же
+    '''
+    before = registry.primary
+    registry.sync()
+    assert registry.primary is before
+
+    bundle_path = before.spec["bundle"]
+    os.utime(bundle_path, (time.time() + 10, time.time() + 10))
+    registry.sync()
+    assert registry.primary is not before
+    assert registry.primary.name == "v1"
+
+    X = example_X(registry)
+    np.testing.assert_allclose(registry.primary.predict_proba(X), before.predict_proba(X), rtol=1e-6)
+
+
+def test_reload_ignores_stale_store(registry, tmp_path):
+    '''
+    Функция для проверки перезагрузки версии с хранилищем model_store:
+
+    1. Экспортируем хранилище из бандла v1 и переключаем v1 на него
+    2. Перезаписываем бандл другой моделью (первые 5 деревьев), хранилище остается старым
+    3. Сверяемся
+
+    Ожидаем, что версия загружена из нового бандла, а не из устаревшего хранилища
+    '''
+    from model_store import export_store
+    from xgboost import XGBClassifier
+
+    bundle_path = registry.primary.spec["bundle"]
+    bundle = joblib.load(bundle_path)
+    store_path = str(tmp_path / "v1_store")
+    export_store(bundle, store_path)
+    registry.add_version("v1", {"bundle": bundle_path, "store": store_path})
+    registry.sync()
+    assert registry.primary.backend.name == "array" and registry.primary.model is None
+    X = example_X(registry)
+    before = registry.primary.predict_proba(X)
+
+    model = XGBClassifier()
+    model.load_model(bytearray(bundle["model"].get_booster()[:5].save_raw("ubj")))
+    bundle["model"] = model
+    joblib.dump(bundle, bundle_path)
+    os.utime(bundle_path, (time.time() + 10, time.time() + 10))
+    registry.sync()
+
+    after = registry.primary.predict_proba(X)
+    np.testing.assert_allclose(after, model.predict_proba(X), rtol=1e-5)
+    assert not np.allclose(after, before)
+
+
+def test_incompatible_version_keeps_routing(registry, tmp_path):
+    '''
+    Функция для проверки версии с другой схемой признаков:
+
+    1. Сохраняем бандл без одного признака как версию v2 и делаем ее основной
+    2. Сверяемся
+
+    Ожидаем ошибку загрузки v2 в errors и прежнюю основную версию v1
+    '''
+    bundle = joblib.load(MODEL_BUNDLE_PATH)
+    bundle["selected_features"] = bundle["selected_features"][:-1]
+    joblib.dump(bundle, tmp_path / "v2.pkl")
+
+    registry.add_version("v2", {"bundle": str(tmp_path / "v2.pkl"), "store": None}, activate=True)
+    registry.sync()
+    assert registry.primary.name == "v1"
+    assert "схемой API" in registry.errors["v2"]
+
+
+def test_shadow_and_split(registry, tmp_path):
+    '''
+    Функция для проверки сравнения версий:
+
+    1. Добавляем v2 (тот же бандл) кандидатом в теневом режиме
+    2. Отправляем батч основной версии в shadow и ждем фонового сравнения
+    3. Переключаем в split с долей 1
+
+    Ожидаем полное совпадение классов и то, что pick выбирает кандидата
+    '''
+    shutil.copy(MODEL_BUNDLE_PATH, tmp_path / "v2.pkl")
+    registry.add_version("v2", {"bundle": str(tmp_path / "v2.pkl"), "store": None})
+    registry.compare("v2", "shadow")
+    registry.sync()
+    assert registry.routing.candidate.name == "v2"
+    assert registry.pick() is registry.primary
+
+    X = example_X(registry)
+    primary = registry.primary
+    labels = primary.class_names[primary.predict_proba(X).argmax(axis=1)]
+    registry.shadow(X, labels, primary)
+    wait_compared(registry, len(X))
+    assert registry.comparisons[("v1", "v2")] == (len(X), len(X))
+    comparison = registry.describe()["comparisons"][0]
+    assert comparison["agreement"] == 1.0
+
+    registry.compare("v2", "split", 1.0)
+    registry.sync()
+    assert registry.pick().name == "v2"
+    registry.shadow(X, labels, primary)
+    assert registry.comparisons[("v1", "v2")] == (len(X), len(X))
+
+    versions = {version["name"]: version for version in registry.describe()["versions"]}
+    assert versions["v1"]["rows"] >= len(X)
+    assert versions["v1"]["p50_ms"] is not None
+
+
+def test_state_changes_validated(registry):
+    with pytest.raises(ModelVersionNotFoundError):
+        registry.activate("missing")
+    with pytest.raises(ModelVersionError):
+        registry.remove("v1")
+    with pytest.raises(ModelVersionError):
+        registry.compare("v1", "shadow")
+    with pytest.raises(ModelVersionError):
+        registry.add_version("../v3", {"bundle": MODEL_BUNDLE_PATH, "store": None})
+
+
+def test_concurrent_state_updates(registry, tmp_path):
+    '''
+    Функция для проверки блокировки файла состояния:
+
+    1. Два экземпляра реестра с общим файлом состояния (как два воркера uvicorn)
+    2. Из 8 потоков одновременно регистрируем по 5 версий через оба экземпляра
+
+    Ожидаем, что ни одно изменение не потеряно
+    '''
+    other = ModelRegistry(registry.state_path)
+    bundle_path = registry.primary.spec["bundle"]
+
+    def add(worker):
+        for i in range(5):
+            target = registry if worker % 2 else other
+            target.add_version(f"w{worker}-{i}", {"bundle": bundle_path, "store": None})
+
+    threads = [threading.Thread(target=add, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    versions = registry.read_state()["versions"]
+    assert {f"w{worker}-{i}" for worker in range(8) for i in range(5)} <= set(versions)
@@ -0,0 +1,77 @@
+import numpy as np
+from unittest.mock import Mock
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from prediction_cache import PredictionCache, CachedBackend
+
+
+def fake_backend():
+    '''
+    Фейковый бэкенд: вероятность первого класса равна сумме признаков строки
+    '''
+    backend = Mock()
+    backend.predict_proba.side_effect = lambda X: np.column_stack([X.sum(axis=1), np.zeros(len(X))])
+    return backend
+
+
+def test_batch_duplicates_scored_once():
+    '''
+    Функция для проверки схлопывания одинаковых строк внутри батча:
+    в модель уходят только 2 уникальные строки из 4, ответы раскладываются по всем строкам
+    '''
+    backend = fake_backend()
+    cached = CachedBackend(backend, PredictionCache(['f1', 'f2']))
+    X = np.array([[1, 2], [3, 4], [1, 2], [1, 2]], dtype=np.float32)
+
+    probs = cached.predict_proba(X)
+
+    assert list(probs[:, 0]) == [3, 7, 3, 3]
+    assert len(backend.predict_proba.call_args[0][0]) == 2
+    assert cached.cache.stats()["batch_duplicates"] == 2
+
+
+def test_hits_across_calls_and_quantization():
+    '''
+    Функция для проверки попаданий в кэш между запросами:
+    f2 квантуется с шагом 10, поэтому 101 и 99 дают один ключ
+    '''
+    backend = fake_backend()
+    cached = CachedBackend(backend, PredictionCache(['f1', 'f2'], quantization={'f2': 10}))
+
+    first = cached.predict_proba(np.array([[1, 101]]))
+    second = cached.predict_proba(np.array([[1, 99]]))
+
+    assert backend.predict_proba.call_count == 1
+    assert first[0, 0] == second[0, 0] == 102
+    stats = cached.cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_lru_eviction():
+    '''
+    Функция для проверки вытеснения самой давно использованной записи
+    '''
+    cache = PredictionCache(['f1'], max_size=2)
+    a, b, c = cache.keys(np.array([[1], [2], [3]]))
+    cache.put(a, np.array([1.0]))
+    cache.put(b, np.array([2.0]))
+    assert cache.get(a) is not None
+    cache.put(c, np.array([3.0]))
+
+    assert cache.get(b) is None
+    assert cache.get(a) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiration():
+    '''
+    Функция для проверки истечения записи по TTL
+    '''
+    cache = PredictionCache(['f1'], ttl_s=-1)
+    key, = cache.keys(np.array([[1]]))
+    cache.put(key, np.array([1.0]))
+
+    assert cache.get(key) is None
+    assert cache.stats()["expirations"] == 1
@@ -0,0 +1,61 @@
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from config import CONFIDENCE_THRESHOLDS
+from results_view import merge_columnar, results_frame, class_summary, confidence_histogram, page
+
+CLASSES = ["DoS", "Normal"]
+
+
+def columnar(predictions, confidence):
+    return {"classes": CLASSES,
+            "predictions": predictions,
+            "confidence": confidence,
+            "probabilities": [[1 - c, c] if p == "Normal" else [c, 1 - c] for p, c in zip(predictions, confidence)]}
+
+
+def test_results_frame_from_pages():
+    '''
+    Функция для проверки таблицы результатов:
+
+    1. Склеиваем две страницы колоночных результатов (и пустую) из /jobs
+    2. Строим таблицу с отчетом о проверке, где строка 1 (с 0) отклонена
+
+    Ожидаем номера строк файла без отклоненной, уровни уверенности по CONFIDENCE_THRESHOLDS
+    и вероятности по классам в отдельных столбцах
+    '''
+    pages = [columnar(["Normal", "DoS"], [0.9, 0.5]), columnar([], []), columnar(["Normal"], [0.7])]
+    merged = merge_columnar(pages)
+    validation = {"mode": "reject", "rows_total": 4, "rows_invalid": 1, "invalid_rows": [1], "errors": []}
+    df = results_frame(merged, validation, CONFIDENCE_THRESHOLDS)
+
+    assert df["Строка"].tolist() == [1, 3, 4]
+    assert df["Класс"].tolist() == ["Normal", "DoS", "Normal"]
+    assert df["Уровень"].tolist() == ["Высокая", "Низкая", "Средняя"]
+    np.testing.assert_allclose(df["DoS"], [0.1, 0.5, 0.3], rtol=1e-6)
+    assert merge_columnar([columnar([], [])]) is None
+
+
+def test_summary_histogram_and_pages():
+    '''
+    Функция для проверки сводки:
+
+    Ожидаем число строк и долю по классам (включая класс без строк), гистограмму,
+    где каждая строка попала ровно в один интервал своего уровня, и страницы таблицы
+    '''
+    confidence = np.linspace(0.3, 1.0, 250)
+    predictions = ["Normal"] * 250
+    df = results_frame(columnar(predictions, confidence), thresholds=CONFIDENCE_THRESHOLDS)
+
+    summary = class_summary(df)
+    assert summary.loc["Normal", "Строк"] == 250 and summary.loc["DoS", "Строк"] == 0
+    assert summary.loc["Normal", "Доля"] == 1.0
+
+    histogram = confidence_histogram(df["Уверенность"], CONFIDENCE_THRESHOLDS, bins=20)
+    assert histogram.shape == (20, 3)
+    assert histogram.to_numpy().sum() == 250
+    assert histogram["Низкая"].sum() == (confidence < CONFIDENCE_THRESHOLDS["low"]).sum()
+    assert histogram.loc["0.95", "Высокая"] > 0 and histogram.loc["0.95", "Низкая"] == 0
+
+    assert page(df, 3, 100)["Строка"].tolist() == list(range(201, 251))
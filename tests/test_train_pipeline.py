@@ -0,0 +1,142 @@
+import json
+import numpy as np
+import pandas as pd
+import joblib
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), "model_training")))
+from backends import XGBoostBackend
+from config import FEATURE_BOUNDS
+from train_pipeline import LABEL_GROUPS, build_cache, check_bounds, parse_args, run
+import pytest
+
+COLUMNS = [" Destination Port", " Flow Duration", "Bwd Packets/s", " Fwd IAT Min", "Init_Win_bytes_forward",
+           " Total Fwd Packets"]
+LABELS = ["BENIGN", "DDoS", "PortScan", "Web Attack � XSS", "Heartbleed"]
+
+
+def write_dataset(path, rows=600, seed=0):
+    '''
+    CSV в формате CIC-IDS2017: пробелы в названиях столбцов, inf и NaN, дубликаты,
+    лейбл с '�' и редкий класс. Класс определяется первым признаком, чтобы модель могла его выучить
+    '''
+    rng = np.random.default_rng(seed)
+    label_idx = rng.integers(0, len(LABELS), rows)
+    data = {col: rng.normal(size=rows).round(2) for col in COLUMNS}
+    data[COLUMNS[0]] = label_idx * 10 + rng.integers(0, 3, rows)
+    data["Init_Win_bytes_forward"] = rng.integers(-1, 65536, rows)
+    df = pd.DataFrame(data)
+    df[" Label"] = np.array(LABELS)[label_idx]
+    df.loc[3, "Bwd Packets/s"] = np.inf
+    df.loc[5, " Flow Duration"] = np.nan
+    df = pd.concat([df, df.iloc[10:20], df.iloc[[0]]], ignore_index=True)
+    df.to_csv(path, index=False)
+    return df
+
+
+def notebook_clean(df):
+    '''
+    Очистка из model_training.ipynb в памяти (эталон для кэша)
+    '''
+    df = df.replace([np.inf, -np.inf], np.nan).dropna().drop_duplicates()
+    df.columns = df.columns.str.strip()
+    df['Label'] = df['Label'].str.replace('�', '-', regex=False)
+    groups = df['Label'].map(LABEL_GROUPS)
+    df = df[groups.notna() & (groups != 'Rare')]
+    return df.drop('Label', axis=1), df['Label'].map(LABEL_GROUPS)
+
+
+def test_cache_matches_notebook_cleaning(tmp_path):
+    '''
+    Функция для проверки кэша признаков:
+
+    1. Пишем CSV с inf, NaN, дубликатами (в том числе в разных чанках) и редким классом
+    2. Строим кэш чанками по 7 строк
+    3. Повторный вызов по тому же CSV
+
+    Ожидаем те же строки, признаки и классы, что у очистки из ноутбука, и переиспользование кэша
+    '''
+    df = write_dataset(tmp_path / "data.csv")
+    expected_X, expected_labels = notebook_clean(df)
+
+    cache = build_cache(str(tmp_path / "data.csv"), str(tmp_path / "cache"), chunk_rows=7)
+    assert cache.features == list(expected_X.columns)
+    assert cache.classes == sorted(expected_labels.unique())
+    assert cache.X.dtype == np.float32 and cache.X.flags.f_contiguous
+    np.testing.assert_allclose(cache.X, expected_X.to_numpy(dtype=np.float32))
+    assert [cache.classes[i] for i in cache.y] == expected_labels.tolist()
+    assert cache.meta["rows_invalid"] == 2
+    assert cache.meta["rows_duplicates"] > 0
+
+    mtime = os.path.getmtime(tmp_path / "cache" / "X.npy")
+    assert build_cache(str(tmp_path / "data.csv"), str(tmp_path / "cache"), chunk_rows=7).meta == cache.meta
+    assert os.path.getmtime(tmp_path / "cache" / "X.npy") == mtime
+    assert not any(name.endswith(".raw") for name in os.listdir(tmp_path / "cache"))
+
+
+def test_training_rows_pass_feature_bounds(tmp_path):
+    '''
+    Функция для проверки FEATURE_BOUNDS на обучающих данных:
+
+    1. Пишем CSV с признаками API и крайними значениями, которые встречаются в CIC-IDS2017:
+    отрицательные интервалы, Init_Win_bytes_* = -1, отрицательный min_seg_size_forward,
+    длины пакетов больше MTU (TSO/GRO)
+    2. Строим кэш и проверяем строки так же, как API
+
+    Ожидаем, что ни одна строка не выходит за границы, диапазоны совпадают с данными,
+    а прежняя граница Flow IAT Min >= 0 отклонила бы строки с отрицательным интервалом
+    '''
+    features = list(FEATURE_BOUNDS)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({" " + feature: rng.integers(0, 1000, 200) for feature in features})
+    edge = {"Flow IAT Min": -13, "Fwd IAT Min": -12, "Init_Win_bytes_forward": -1, "Init_Win_bytes_backward": -1,
+            "min_seg_size_forward": -536870727, "Bwd Packet Length Min": 2920, "Fwd Packets/s": 3000000.0,
+            "Bwd Packets/s": 0.0, "Destination Port": 65535}
+    for i, (feature, value) in enumerate(edge.items()):
+        df.loc[i, " " + feature] = value
+    df[" Label"] = "BENIGN"
+    df.to_csv(tmp_path / "data.csv", index=False)
+
+    cache = build_cache(str(tmp_path / "data.csv"), str(tmp_path / "cache"), chunk_rows=50)
+    result = check_bounds(cache, features, batch_rows=64)
+    assert result["rows_out_of_bounds"] == 0 and result["errors"] == []
+    assert result["feature_ranges"]["min_seg_size_forward"][0] == np.float32(-536870727)
+    assert result["feature_ranges"]["Bwd Packet Length Min"][1] == 2920
+    assert check_bounds(cache, ["Flow IAT Min"], {"Flow IAT Min": (0.0, None)})["rows_out_of_bounds"] == 1
+
+
+@pytest.mark.parametrize("external_memory", [False, True])
+def test_pipeline_writes_api_bundle(tmp_path, external_memory):
+    '''
+    Функция для проверки обучения:
+
+    1. Запускаем пайплайн на маленьком датасете: 4 trials по 2 параллельно, SHAP на 50 строках
+    2. Загружаем бандл
+
+    Ожидаем контракт бандла api.py, признаки из кэша и осмысленное качество на тесте
+    '''
+    write_dataset(tmp_path / "data.csv", rows=2000)
+    output = tmp_path / "bundle.pkl"
+    argv = [str(tmp_path / "data.csv"), "--output", str(output), "--report", str(tmp_path / "report.json"),
+            "--cache-dir", str(tmp_path / "cache"), "--chunk-rows", "500", "--batch-rows", "300",
+            "--trials", "4", "--jobs", "2", "--shap-samples", "50", "--min-features", "2", "--max-features", "4"]
+    if external_memory:
+        argv.append("--external-memory")
+    study, report = run(parse_args(argv))
+
+    bundle = joblib.load(output)
+    assert set(bundle) == {'model', 'selected_features', 'label_encoder', 'sample_weight'}
+    assert 2 <= len(bundle['selected_features']) <= 4
+    assert "Destination Port" in bundle['selected_features']
+    assert list(bundle['label_encoder'].classes_) == ['DoS', 'Normal', 'Recon', 'Web']
+    assert len(study.trials) == 4
+    assert report['macro avg']['f1-score'] > 0.9
+
+    X = np.array([[0, 0, 0, 0]], dtype=np.float32)[:, :len(bundle['selected_features'])]
+    probs = XGBoostBackend(bundle['model']).predict_proba(X)
+    assert probs.shape == (1, 4)
+    with open(tmp_path / "report.json", encoding="utf-8") as f:
+        saved = json.load(f)
+    assert set(saved["feature_ranges"]) == set(bundle['selected_features'])
+    assert saved["rows_out_of_bounds"] == 0
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from config import FEATURE_BOUNDS
+from flow_meter import FlowMeter, build_frame, PROTO_UDP
+from validation import to_matrix, validate_matrix
+import pytest
+
+FEATURES = ["port", "rate"]
+BOUNDS = {"port": (0, 65535), "rate": (0.0, 1000.0)}
+
+
+def frame():
+    '''
+    Строки: корректная, NaN, inf, текст, порт вне границ, дробный порт, корректная
+    '''
+    return pd.DataFrame({"port": ["80", "443", "22", "x", "70000", "8.5", "53"],
+                         "rate": [1.0, np.nan, np.inf, 5.0, 5.0, 5.0, 1000.0]})
+
+
+def test_reject_drops_invalid_rows():
+    '''
+    Функция для проверки режима reject:
+
+    1. Разбираем DataFrame с текстом в числовом столбце
+    2. Проверяем матрицу с границами и сдвигом индексов строк 10
+
+    Ожидаем только корректные строки во float32-матрице и сообщение для каждой строки с ошибкой
+    '''
+    X, not_number = to_matrix(frame(), FEATURES)
+    X, report = validate_matrix(X, FEATURES, BOUNDS, "reject", not_number=not_number, row_offset=10)
+
+    assert X.dtype == np.float32 and X.flags.c_contiguous
+    np.testing.assert_array_equal(X, [[80, 1], [53, 1000]])
+    assert report["rows_total"] == 7 and report["rows_invalid"] == 5
+    assert report["invalid_rows"].tolist() == [11, 12, 13, 14, 15]
+    errors = {error["row"]: error["errors"] for error in report["errors"]}
+    assert errors[11] == {"rate": "пропущенное значение"}
+    assert errors[12] == {"rate": "бесконечное значение"}
+    assert errors[13] == {"port": "не число"}
+    assert errors[14] == {"port": "70000 больше максимума 65535"}
+    assert errors[15] == {"port": "8.5 не целое число"}
+
+
+def test_mask_keeps_rows_aligned():
+    '''
+    Функция для проверки режима mask и ограничения отчета:
+
+    Ожидаем все строки, NaN вместо ошибочных значений и сообщения только для первых двух строк с ошибками
+    '''
+    X, not_number = to_matrix(frame(), FEATURES)
+    X, report = validate_matrix(X, FEATURES, BOUNDS, "mask", max_errors=2, not_number=not_number)
+
+    assert X.shape == (7, 2)
+    assert np.isnan(X[[1, 2], 1]).all() and np.isnan(X[[3, 4, 5], 0]).all()
+    assert X[0].tolist() == [80, 1] and X[3, 1] == 5
+    assert report["rows_invalid"] == 5
+    assert [error["row"] for error in report["errors"]] == [1, 2]
+
+
+def test_numeric_columns_without_bounds():
+    X = np.array([[1.0, -5.0], [2.0, 3.0]], dtype=np.float32)
+    checked, report = validate_matrix(X, FEATURES)
+    np.testing.assert_array_equal(checked, X)
+    assert report["rows_invalid"] == 0 and report["errors"] == []
+
+    with pytest.raises(ValueError):
+        validate_matrix(X, FEATURES, mode="drop")
+
+
+def test_flow_meter_values_accepted():
+    '''
+    Функция для проверки FEATURE_BOUNDS на значениях CICFlowMeter:
+
+    1. Собираем признаки потоков flow_meter.py: UDP (Init_Win_bytes_* = -1)
+    и TCP с пакетами через 1 мкс (скорость больше миллиона пакетов в секунду)
+    2. Проверяем их в режиме reject
+
+    Ожидаем, что ни одна строка не отклонена
+    '''
+    udp = build_frame("10.0.0.3", "10.0.0.4", 53000, 53, proto=PROTO_UDP, payload_len=30)
+    tcp = build_frame("10.0.0.1", "10.0.0.2", 1000, 80)
+    flows = list(FlowMeter().process([(0, 1, udp), (0, 1, tcp), (1, 1, tcp), (2, 1, tcp)]))
+    features = list(FEATURE_BOUNDS)
+    df = pd.DataFrame([flow.features() for flow in flows])[features]
+    assert (df["Init_Win_bytes_forward"] == -1).any() and df["Fwd Packets/s"].max() > 1_000_000
+
+    X, report = validate_matrix(df.to_numpy(dtype=np.float64), features, FEATURE_BOUNDS, "reject")
+    assert report["rows_invalid"] == 0 and len(X) == len(flows)
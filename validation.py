@@ -0,0 +1,124 @@
+import numpy as np
+
+# Режимы обработки строк с ошибками: reject — строка не скорится, mask — ошибочные значения
+# заменяются пропуском (NaN, для XGBoost это missing) и строка скорится
+VALIDATION_MODES = ("reject", "mask")
+
+
+def to_matrix(df, features):
+    '''
+    Собирает матрицу float64 (строки, признаки в порядке features) из столбцов DataFrame
+    без исключений на нечисловых значениях: числовые столбцы копируются как есть,
+    остальные разбираются pd.to_numeric(errors="coerce") целиком.
+    Возвращает матрицу и маску значений, которые не удалось разобрать как число (None, если таких нет)
+    '''
+    import pandas as pd
+
+    X = np.empty((len(df), len(features)), dtype=np.float64, order="F")
+    not_number = None
+    for j, col in enumerate(features):
+        values = df[col]
+        if values.dtype.kind in "biuf":
+            X[:, j] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            continue
+
+        parsed = pd.to_numeric(values, errors="coerce")
+        X[:, j] = parsed.to_numpy(dtype=np.float64, na_value=np.nan)
+        unparsed = parsed.isna().to_numpy() & values.notna().to_numpy()
+        if unparsed.any():
+            if not_number is None:
+                not_number = np.zeros(X.shape, dtype=bool, order="F")
+            not_number[:, j] = unparsed
+    return X, not_number
+
+
+def _bounds(features, bounds, dtype):
+    '''
+    Нижние и верхние границы по признакам (без границ или None — ±inf) и индексы целочисленных признаков.
+    Признак целочисленный, если его границы заданы целыми числами (как min_value у st.number_input)
+    '''
+    low = np.full(len(features), -np.inf, dtype=dtype)
+    high = np.full(len(features), np.inf, dtype=dtype)
+    integer = []
+    for j, feature in enumerate(features):
+        if feature not in bounds:
+            continue
+        feature_low, feature_high = bounds[feature]
+        if feature_low is not None:
+            low[j] = feature_low
+        if feature_high is not None:
+            high[j] = feature_high
+        given = [value for value in bounds[feature] if value is not None]
+        if given and all(isinstance(value, int) for value in given):
+            integer.append(j)
+    return low, high, integer
+
+
+def _describe(value, not_number, low, high):
+    if not_number:
+        return "не число"
+    if np.isnan(value):
+        return "пропущенное значение"
+    if np.isinf(value):
+        return "бесконечное значение"
+    if value < low:
+        return f"{value:g} меньше минимума {low:g}"
+    if value > high:
+        return f"{value:g} больше максимума {high:g}"
+    return f"{value:g} не целое число"
+
+
+def validate_matrix(X, features, bounds=None, mode="reject", max_errors=100, not_number=None, row_offset=0):
+    '''
+    Векторная проверка батча признаков одним проходом по всей матрице:
+
+    1. Значения, которые не разобраны как число (маска not_number из to_matrix)
+    2. NaN и ±inf
+    3. Границы признаков bounds ({признак: (минимум, максимум)}) и целочисленность
+    для признаков с целыми границами
+
+    Строки с ошибками отбрасываются (mode="reject") или ошибочные значения в них
+    заменяются на NaN (mode="mask"). Сообщения собираются только для первых max_errors
+    таких строк, поэтому отчет не растет с размером батча.
+
+    Возвращает float32-матрицу для модели и отчет: rows_total, rows_invalid,
+    invalid_rows (индексы строк с ошибками со сдвигом row_offset; при reject это ровно
+    строки, которых нет в результатах) и errors — [{"row": индекс, "errors": {признак: сообщение}}]
+    '''
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Неизвестный режим проверки: {mode}. Ожидается один из {list(VALIDATION_MODES)}")
+
+    low, high, integer = _bounds(features, bounds or {}, X.dtype)
+    invalid = ~np.isfinite(X)
+    invalid |= X < low
+    invalid |= X > high
+    if integer:
+        values = X[:, integer]
+        invalid[:, integer] |= values != np.floor(values)
+    if not_number is not None:
+        invalid |= not_number
+
+    invalid_rows = np.flatnonzero(invalid.any(axis=1))
+    errors = []
+    for row in invalid_rows[:max_errors].tolist():
+        errors.append({"row": row + row_offset,
+                       "errors": {features[j]: _describe(X[row, j], not_number is not None and not_number[row, j],
+                                                         low[j], high[j])
+                                  for j in np.flatnonzero(invalid[row]).tolist()}})
+
+    if not len(invalid_rows):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+    elif mode == "reject":
+        keep = np.ones(len(X), dtype=bool)
+        keep[invalid_rows] = False
+        X = np.ascontiguousarray(X[keep], dtype=np.float32)
+    else:
+        X = np.array(X, dtype=np.float32, order="C")
+        X[invalid] = np.nan
+
+    report = {"mode": mode,
+              "rows_total": len(invalid),
+              "rows_invalid": len(invalid_rows),
+              "invalid_rows": invalid_rows + row_offset,
+              "errors": errors}
+    return X, report